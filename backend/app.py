@@ -2,19 +2,38 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import json
 import os
-from multi_converter import convert_format
-from token_counter import count_tokens_for_formats, get_recommended_format
-from format_detector import detect_format
+from multi_converter import convert_detected, encode_document
+from float_precision import precision_report
+from token_counter import count_tokens_for_formats, encoder_metrics, get_recommended_format, warm_up
+from format_detector import detect
 from bedrock_analyzer import load_file_content, invoke_bedrock
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
+# Load the tokenizer while the app starts (app.run, flask run or a WSGI
+# server) rather than in the first request
+warm_up(background=True)
+
+def _valid_precision(precision):
+    """Check a request's precision: an int or an object mapping keys to ints"""
+    def is_int(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+    if isinstance(precision, dict):
+        return all(is_int(value) for value in precision.values())
+    return is_int(precision)
+
+
 @app.route('/api/convert', methods=['POST'])
 def convert_formats():
     """
     Convert content from one format to all other formats.
-    Accepts: { "content": "...", "from_format": "json|toon|csv|yaml" }
+    Accepts: { "content": "...", "from_format": "json|toon|csv|yaml", "precision": 2, "precision_report": true,
+               "key_aliases": true, "dedupe": true }
+    ("precision" is optional: digits to round floats to, or {"key": digits, "*": digits};
+    "precision_report" also encodes the unrounded document to report what rounding saved;
+    "key_aliases" lets TOON alias long repeated keys when that saves tokens;
+    "dedupe" writes repeated subtrees once as TOON references / YAML anchors)
     Returns: { 
         "success": true, 
         "json": "...", 
@@ -36,6 +55,11 @@ def convert_formats():
             "detected_format": "json",
             "expected_format": "csv",
             "message": "Detected JSON format. Did you mean to paste this in the JSON box?"
+        },
+        "precision_report": {
+            "toon": {"bytes_before": 900, "bytes_after": 610, "bytes_saved": 290,
+                     "tokens_before": 400, "tokens_after": 260, "tokens_saved": 140},
+            ...
         }
     }
     """
@@ -54,8 +78,17 @@ def convert_formats():
         if from_format not in ['json', 'toon', 'csv', 'yaml']:
             return jsonify({'error': f'Invalid format: {from_format}. Must be json, toon, csv, or yaml'}), 400
         
-        # Detect the actual format of the content FIRST
-        detected_format = detect_format(content)
+        precision = data.get('precision')
+        if precision is not None and not _valid_precision(precision):
+            return jsonify({'error': 'Invalid precision: expected an integer or an object of integers'}), 400
+        key_aliases = bool(data.get('key_aliases', False))
+        dedupe = bool(data.get('dedupe', False))
+        report_precision = bool(data.get('precision_report', False))
+        
+        # Detect the actual format of the content FIRST; JSON and YAML are
+        # parsed by the detection and not again for the conversion
+        detection = detect(content)
+        detected_format = detection.format
         format_warning = None
         format_labels = {
             'json': 'JSON',
@@ -71,21 +104,18 @@ def convert_formats():
                 'expected_format': from_format,
                 'message': f'Detected {format_labels.get(detected_format, detected_format.upper())} format. Did you mean to paste this in the {format_labels.get(detected_format, detected_format.upper())} box?'
             }
-            
-            # Try to convert using the detected format instead
-            # This allows conversion to work even if pasted in wrong box
-            try:
-                results = convert_format(content, detected_format, 'all')
-            except Exception as e:
-                # If detected format conversion fails, try original format
-                try:
-                    results = convert_format(content, from_format, 'all')
-                except Exception:
-                    # If both fail, raise the original error but include warning
-                    raise ValueError(f'Could not convert content. {str(e)}')
-        else:
-            # Convert to all formats using the specified format
-            results = convert_format(content, from_format, 'all')
+        
+        # Try the detected format first, then the specified one, so
+        # conversion works even if pasted in the wrong box
+        try:
+            results, _, document = convert_detected(
+                content, detection, from_format, 'all', precision, key_aliases, dedupe
+            )
+        except ValueError as e:
+            if format_warning:
+                # If both fail, raise the detected format's error but include warning
+                raise ValueError(f'Could not convert content. {str(e)}')
+            raise
         
         # Count tokens for all formats
         token_counts = count_tokens_for_formats(results)
@@ -103,6 +133,12 @@ def convert_formats():
         if format_warning:
             response['format_warning'] = format_warning
         
+        if precision is not None and report_precision:
+            # Encoding the unrounded document again costs as much as the conversion
+            response['precision_report'] = precision_report(
+                encode_document(document, 'all', key_aliases=key_aliases, dedupe=dedupe), results, token_counts
+            )
+        
         return jsonify(response)
     
     except ValueError as e:
@@ -175,7 +211,8 @@ def analyze_file():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok'})
+    # Tokenizer encodings loaded so far, with their load times
+    return jsonify({'status': 'ok', 'tokenizers': encoder_metrics()})
 
 @app.route('/analyze')
 def analyze_page():
@@ -1,14 +1,17 @@
 """
 Bedrock analysis module - extracted from test.py for use in Flask app
 """
-import ast
+import io
 import json
 import boto3
 from botocore.exceptions import ClientError
-from typing import Tuple, Any, Dict, List
+from typing import Tuple, Any, Dict, Iterator, List
+
+from toon_cells import parse_literal, split_top_level
+from toon_decoder import ToonSource, iter_toon_rows, parse_dotted_leaves
 
 try:
-    import tiktoken
+    from token_counter import FALLBACK_ENCODING, get_encoding
     HAS_TIKTOKEN = True
 except ImportError:
     HAS_TIKTOKEN = False
@@ -30,89 +33,15 @@ MAX_TOKENS = 1000
 MAX_INPUT_TOKENS = 180000
 
 
-def _split_top_level_csv(line: str) -> List[str]:
-    """Split a line on commas, but only at top level (not inside {...}, [...], or quotes)."""
-    parts = []
-    buf = []
-    depth_curly = 0
-    depth_square = 0
-    in_single = False
-    in_double = False
-
-    for ch in line:
-        if ch == "'" and not in_double:
-            in_single = not in_single
-        elif ch == '"' and not in_single:
-            in_double = not in_double
-        elif not in_single and not in_double:
-            if ch == "{":
-                depth_curly += 1
-            elif ch == "}":
-                depth_curly = max(0, depth_curly - 1)
-            elif ch == "[":
-                depth_square += 1
-            elif ch == "]":
-                depth_square = max(0, depth_square - 1)
-
-        if (
-            ch == ","
-            and not in_single
-            and not in_double
-            and depth_curly == 0
-            and depth_square == 0
-        ):
-            parts.append("".join(buf).strip())
-            buf = []
-        else:
-            buf.append(ch)
-
-    if buf:
-        parts.append("".join(buf).strip())
-    return parts
-
-
-def load_toon_file(path: str) -> List[Dict[str, Any]]:
-    """Parse TOON file format."""
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        content = f.read()
-        lines = content.splitlines()
-
-    lines = [ln for ln in lines if ln.strip()]
-    if not lines:
-        raise ValueError("TOON file is empty.")
-
-    header = lines[0].strip()
-    if "{" not in header or "}" not in header:
-        raise ValueError("Unrecognized TOON header format.")
-    
-    fields_blob = header.split("{", 1)[1].rsplit("}", 1)[0]
-    fields = [f.strip() for f in fields_blob.split(",") if f.strip()]
-    if not fields:
-        raise ValueError("No fields found in TOON header.")
-
-    rows = []
-    for ln in lines[1:]:
-        ln = ln.strip()
-        if not ln:
-            continue
-        if ln.endswith(","):
-            ln = ln[:-1]
-        
-        cols = _split_top_level_csv(ln)
-        if len(cols) != len(fields):
-            raise ValueError(
-                f"TOON row has {len(cols)} columns but header has {len(fields)} fields."
-            )
-
-        obj = {}
-        for k, v in zip(fields, cols):
-            obj[k] = v
-
-        # Convert known structured fields
+def iter_toon_file(source: ToonSource) -> Iterator[Dict[str, Any]]:
+    """Stream rows from a TOON file (path, text stream or lines) one at a time."""
+    for obj in iter_toon_rows(source, split=split_top_level, parse=str, strict=True):
+        # Convert known structured fields; dotted metrics.* columns arrive nested, with string leaves
+        parse_dotted_leaves(obj)
         if "metrics" in obj and isinstance(obj["metrics"], str):
-            obj["metrics"] = ast.literal_eval(obj["metrics"])
+            obj["metrics"] = parse_literal(obj["metrics"])
         if "tags" in obj and isinstance(obj["tags"], str):
-            obj["tags"] = ast.literal_eval(obj["tags"])
+            obj["tags"] = parse_literal(obj["tags"])
         if "uptime_seconds" in obj:
             try:
                 obj["uptime_seconds"] = int(obj["uptime_seconds"])
@@ -124,9 +53,12 @@ def load_toon_file(path: str) -> List[Dict[str, Any]]:
             except Exception:
                 pass
 
-        rows.append(obj)
+        yield obj
 
-    return rows
+
+def load_toon_file(path: str) -> List[Dict[str, Any]]:
+    """Parse TOON file format."""
+    return list(iter_toon_file(path))
 
 
 def load_file_content(file_content: str, filename: str) -> Tuple[Any, str, str]:
@@ -136,15 +68,7 @@ def load_file_content(file_content: str, filename: str) -> Tuple[Any, str, str]:
     if filename.lower().endswith(".toon"):
         # For TOON, use raw content directly
         # Also parse for validation
-        import tempfile
-        import os
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.toon', delete=False, encoding='utf-8') as f:
-            f.write(file_content)
-            temp_path = f.name
-        try:
-            parsed_data = load_toon_file(temp_path)
-        finally:
-            os.unlink(temp_path)
+        parsed_data = list(iter_toon_file(io.StringIO(file_content, newline=None)))
         return parsed_data, "toon", file_content
     else:
         # For JSON, parse and return raw
@@ -156,8 +80,7 @@ def estimate_tokens(text: str) -> int:
     """Estimate token count for text."""
     if HAS_TIKTOKEN:
         try:
-            encoding = tiktoken.get_encoding("cl100k_base")
-            return len(encoding.encode(text))
+            return len(get_encoding(FALLBACK_ENCODING).encode(text))
         except Exception:
             pass
     
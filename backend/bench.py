@@ -0,0 +1,832 @@
+"""
+Micro-benchmarks for the converter hot paths.
+
+Usage:
+    python bench.py splitter
+    python bench.py literals
+    python bench.py columns
+    python bench.py paths
+    python bench.py flatten
+    python bench.py nested
+    python bench.py dotted
+    python bench.py union
+    python bench.py inline
+    python bench.py tabular
+    python bench.py precision
+    python bench.py aliases
+    python bench.py dedupe
+    python bench.py transcode
+    python bench.py csv
+    python bench.py yaml
+    python bench.py emit
+    python bench.py detect
+    python bench.py tokens
+    python bench.py all --repeat 3
+"""
+import argparse
+import os
+import time
+from typing import Callable, List
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LARGE_TOON = os.path.join(BASE_DIR, '..', 'llm', 'server_metrics_large.toon')
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    """Return the fastest wall-clock time of ``repeat`` runs of ``fn``"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label: str, seconds: float, items: int, unit: str = 'rows') -> None:
+    print(f"  {label:<28} {seconds * 1000:9.2f} ms  {items / seconds:14,.0f} {unit}/s")
+
+
+def load_large_toon_rows() -> List[str]:
+    """Return the stripped data rows of the bundled large TOON file"""
+    with open(LARGE_TOON, 'r', encoding='utf-8') as f:
+        return [ln.strip() for ln in f.read().splitlines()[1:] if ln.strip()]
+
+
+def _legacy_split_top_level_csv(line: str) -> List[str]:
+    """The per-character splitter previously copied into each TOON loader"""
+    parts = []
+    buf = []
+    depth_curly = 0
+    depth_square = 0
+    depth_paren = 0
+    in_single = False
+    in_double = False
+
+    for ch in line:
+        if ch == "'" and not in_double:
+            in_single = not in_single
+        elif ch == '"' and not in_single:
+            in_double = not in_double
+        elif not in_single and not in_double:
+            if ch == "{":
+                depth_curly += 1
+            elif ch == "}":
+                depth_curly = max(0, depth_curly - 1)
+            elif ch == "[":
+                depth_square += 1
+            elif ch == "]":
+                depth_square = max(0, depth_square - 1)
+            elif ch == "(":
+                depth_paren += 1
+            elif ch == ")":
+                depth_paren = max(0, depth_paren - 1)
+
+        if (
+            ch == ","
+            and not in_single
+            and not in_double
+            and depth_curly == 0
+            and depth_square == 0
+            and depth_paren == 0
+        ):
+            parts.append("".join(buf).strip())
+            buf = []
+        else:
+            buf.append(ch)
+
+    if buf:
+        parts.append("".join(buf).strip())
+    return parts
+
+
+def bench_splitter(repeat: int) -> None:
+    """Top-level row splitting on server_metrics_large.toon"""
+    from toon_cells import split_top_level
+
+    rows = load_large_toon_rows()
+    assert [split_top_level(r) for r in rows] == [_legacy_split_top_level_csv(r) for r in rows]
+
+    legacy = best_of(lambda: [_legacy_split_top_level_csv(r) for r in rows], repeat)
+    shared = best_of(lambda: [split_top_level(r) for r in rows], repeat)
+    report('character loop (legacy)', legacy, len(rows))
+    report('split_top_level', shared, len(rows))
+    print(f"  speed-up: {legacy / shared:.1f}x")
+
+
+def bench_literals(repeat: int) -> None:
+    """Decoding the metrics / tags cells of server_metrics_large.toon"""
+    import ast
+    from toon_cells import _decode_literal, parse_literal, split_top_level
+    from toon_decoder import parse_header
+
+    with open(LARGE_TOON, 'r', encoding='utf-8') as f:
+        _, fields = parse_header(f.readline())
+    columns = [fields.index('metrics'), fields.index('tags')]
+    cells = [cells[i] for cells in map(split_top_level, load_large_toon_rows()) for i in columns]
+    assert [parse_literal(c) for c in cells] == [ast.literal_eval(c) for c in cells]
+
+    def cold():
+        _decode_literal.cache_clear()
+        [parse_literal(c) for c in cells]
+
+    legacy = best_of(lambda: [ast.literal_eval(c) for c in cells], repeat)
+    uncached = best_of(cold, repeat)
+    report('ast.literal_eval', legacy, len(cells), 'cells')
+    report('parse_literal (cold cache)', uncached, len(cells), 'cells')
+    print(f"  speed-up: {legacy / uncached:.1f}x  (cache hits: {_decode_literal.cache_info().hits})")
+
+
+def wide_table(rows: int, width: int = 12) -> List[dict]:
+    """Synthetic records with int, float, bool and string columns"""
+    return [
+        {
+            **{f"id{j}": i * width + j for j in range(width // 4)},
+            **{f"load{j}": round((i * 7 + j) % 1000 / 7, 3) for j in range(width // 4)},
+            **{f"flag{j}": (i + j) % 3 == 0 for j in range(width // 4)},
+            **{f"name{j}": f"node-{i % 97}-{j}" for j in range(width - 3 * (width // 4))},
+        }
+        for i in range(rows)
+    ]
+
+
+def bench_columns(repeat: int) -> None:
+    """Per-cell parsing vs per-column types on a 100k x 12 table (TOON and CSV)"""
+    import csv
+    import io
+    import multi_converter
+    from multi_converter import csv_to_json, json_to_csv, json_to_toon, parse_csv_value, toon_to_json
+    from column_types import decode_rows
+    from toon_decoder import ToonReader, parse_value
+
+    data = wide_table(100_000)
+    toon_text = json_to_toon(data)
+    typed_text = io.StringIO()
+    multi_converter.write_toon(data, typed_text, typed_header=True)
+    typed_text = typed_text.getvalue()
+    csv_text = json_to_csv(data)
+
+    def per_cell_toon():
+        return list(ToonReader(io.StringIO(toon_text)))
+
+    def per_cell_csv():
+        return [{k: parse_csv_value(v) for k, v in row.items()} for row in csv.DictReader(io.StringIO(csv_text))]
+
+    assert toon_to_json(toon_text) == toon_to_json(typed_text) == per_cell_toon() == data
+    assert csv_to_json(csv_text) == per_cell_csv()
+
+    reader = ToonReader(io.StringIO(toon_text))
+    fields, rows = reader.fields, list(reader.iter_cells())
+    cells = len(data) * len(data[0])
+    print("  cell conversion only:")
+    report('parse_value per cell', best_of(lambda: [dict(zip(fields, map(parse_value, r))) for r in rows], repeat), cells, 'cells')
+    report('decode_rows (inferred)', best_of(lambda: decode_rows(fields, rows, None, parse_value), repeat), cells, 'cells')
+    print("  end to end:")
+    report('TOON per-cell parse_value', best_of(per_cell_toon, repeat), cells, 'cells')
+    report('TOON inferred column types', best_of(lambda: toon_to_json(toon_text), repeat), cells, 'cells')
+    report('TOON typed header', best_of(lambda: toon_to_json(typed_text), repeat), cells, 'cells')
+    report('CSV per-cell parse_csv_value', best_of(per_cell_csv, repeat), cells, 'cells')
+    report('CSV inferred column types', best_of(lambda: csv_to_json(csv_text), repeat), cells, 'cells')
+
+
+def _legacy_set_nested_value(obj, path, value):
+    """The per-line path walk previously inlined in toon_to_json"""
+    parts = []
+    i = 0
+    while i < len(path):
+        if path[i] == '[':
+            i += 1
+            idx_end = path.index(']', i)
+            parts.append(('array', int(path[i:idx_end])))
+            i = idx_end + 1
+        elif path[i] == '.':
+            i += 1
+        else:
+            key_end = i
+            while key_end < len(path) and path[key_end] not in '.[':
+                key_end += 1
+            parts.append(('key', path[i:key_end]))
+            i = key_end
+
+    current = obj
+    for i, (part_type, part_value) in enumerate(parts[:-1]):
+        nxt = [] if parts[i + 1][0] == 'array' else {}
+        if part_type == 'key':
+            if part_value not in current:
+                current[part_value] = nxt
+            current = current[part_value]
+        else:
+            while len(current) <= part_value:
+                current.append([] if parts[i + 1][0] == 'array' else {})
+            current = current[part_value]
+    last_type, last_value = parts[-1]
+    if last_type == 'key':
+        current[last_value] = value
+    else:
+        while len(current) <= last_value:
+            current.append(None)
+        current[last_value] = value
+
+
+def deep_document(depth: int, leaves: int = 3) -> dict:
+    """A chain of ``depth`` nested objects, each with a few leaves and a short list"""
+    root = node = {}
+    for level in range(depth):
+        for j in range(leaves):
+            node[f"v{j}"] = level * leaves + j
+        node["tags"] = [f"t{level}", "x"]
+        node["child"] = node = {}
+    return root
+
+
+def bench_paths(repeat: int) -> None:
+    """Path-notation decoding: cursor + segment cache vs walking every line from the root"""
+    import json
+    from multi_converter import json_to_toon
+    from toon_decoder import iter_toon
+    from toon_paths import PathAssembler
+
+    with open(os.path.join(BASE_DIR, '..', 'testfiles', 'server_configs_huge.json'), encoding='utf-8') as f:
+        documents = {
+            'server_configs_huge.json': {'servers': json.load(f)},
+            'depth 200': deep_document(200),
+            'depth 500': deep_document(500),
+        }
+
+    for label, data in documents.items():
+        events = list(iter_toon(json_to_toon(data).splitlines()))
+
+        def full_walk():
+            result = {}
+            for path, value in events:
+                _legacy_set_nested_value(result, path, value)
+            return result
+
+        def cursor():
+            assembler = PathAssembler()
+            for path, value in events:
+                assembler.add(path, value)
+            return assembler.result
+
+        assert cursor() == full_walk()
+        print(f"  {label} ({len(events):,} lines)")
+        report('walk from root per line', best_of(full_walk, repeat), len(events), 'lines')
+        report('PathAssembler', best_of(cursor, repeat), len(events), 'lines')
+
+
+def _legacy_flatten_to_paths(obj, prefix=""):
+    """The recursive flattener previously inlined in json_to_toon"""
+    items = []
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            current_path = f"{prefix}.{key}" if prefix else key
+            if isinstance(value, (dict, list)):
+                items.extend(_legacy_flatten_to_paths(value, current_path))
+            else:
+                items.append((current_path, value))
+    else:
+        for i, item in enumerate(obj):
+            current_path = f"{prefix}[{i}]" if prefix else f"[{i}]"
+            if isinstance(item, (dict, list)):
+                items.extend(_legacy_flatten_to_paths(item, current_path))
+            else:
+                items.append((current_path, item))
+    return items
+
+
+def deep_chain(depth: int) -> dict:
+    """``depth`` nested objects with one leaf and a one-letter child key per level"""
+    root = node = {"v": 0}
+    for level in range(1, depth):
+        node["c"] = node = {"v": level}
+    return root
+
+
+def bench_flatten(repeat: int) -> None:
+    """Path-mode json_to_toon: explicit-stack flattener vs the recursive one"""
+    from multi_converter import json_to_toon, toon_to_json
+    from toon_encoder import format_value
+
+    def legacy(data):
+        return "\n".join(f"{path}:{format_value(value)}" for path, value in _legacy_flatten_to_paths(data))
+
+    documents = [(f"depth {d:,}", deep_chain(d)) for d in (500, 1_000, 2_000, 4_000)]
+    documents.append(("100k keys", {f"key_{i}": i for i in range(100_000)}))
+    documents.append(("100k keys x 2 levels", {f"g{i}": {f"k{j}": j for j in range(100)} for i in range(1_000)}))
+
+    for label, data in documents:
+        text = json_to_toon(data)
+        # Compare text: == on the decoded trees would itself recurse too deeply
+        assert json_to_toon(toon_to_json(text)) == text
+        print(f"  {label} ({text.count(chr(10)) + 1:,} lines, {len(text) / 1e6:.1f} MB)")
+        try:
+            assert legacy(data) == text
+            report('recursive flatten', best_of(lambda: legacy(data), repeat), len(text) / 1e6, 'MB')
+        except RecursionError:
+            print(f"  {'recursive flatten':<28} RecursionError")
+        report('json_to_toon', best_of(lambda: json_to_toon(data), repeat), len(text) / 1e6, 'MB')
+
+
+def token_count(text: str):
+    """Return the cl100k_base token count of ``text``, or None if the encoding cannot be loaded"""
+    try:
+        from token_counter import count_tokens
+        return count_tokens(text)
+    except Exception:
+        # tiktoken downloads its BPE files on first use
+        return None
+
+
+def bench_nested(repeat: int) -> None:
+    """Nested tabular blocks vs one path line per leaf on server_configs_huge.json"""
+    import json
+    from multi_converter import json_to_toon, toon_to_json
+    from toon_encoder import format_value
+
+    with open(os.path.join(BASE_DIR, '..', 'testfiles', 'server_configs_huge.json'), encoding='utf-8') as f:
+        data = {'servers': json.load(f)}
+    paths = "\n".join(f"{path}:{format_value(value)}" for path, value in _legacy_flatten_to_paths(data))
+    blocks = json_to_toon(data)
+    assert toon_to_json(blocks) == toon_to_json(paths) == data
+
+    for label, text in (('path lines', paths), ('nested blocks', blocks)):
+        tokens = token_count(text)
+        tokens = 'tokens unavailable' if tokens is None else f"{tokens:,} tokens"
+        print(f"  {label:<28} {len(text):12,} bytes  {tokens}")
+    print(f"  bytes saved: {1 - len(blocks) / len(paths):.1%}")
+    lines = blocks.count('\n') + 1
+    report('json_to_toon', best_of(lambda: json_to_toon(data), repeat), lines, 'lines')
+    report('toon_to_json (path lines)', best_of(lambda: toon_to_json(paths), repeat), paths.count('\n') + 1, 'lines')
+    report('toon_to_json (blocks)', best_of(lambda: toon_to_json(blocks), repeat), lines, 'lines')
+
+
+def iter_server_rows(source):
+    """
+    Load server rows as the analyzers' TOON loaders do, without importing
+    ``bedrock_analyzer`` (and boto3)
+    """
+    from toon_cells import parse_literal, split_top_level
+    from toon_decoder import iter_toon_rows, parse_dotted_leaves
+
+    for obj in iter_toon_rows(source, split=split_top_level, parse=str, strict=True):
+        parse_dotted_leaves(obj)
+        for key in ('metrics', 'tags'):
+            if isinstance(obj.get(key), str):
+                obj[key] = parse_literal(obj[key])
+        if 'uptime_seconds' in obj:
+            obj['uptime_seconds'] = int(obj['uptime_seconds'])
+        if 'health_score' in obj:
+            obj['health_score'] = float(obj['health_score'])
+        yield obj
+
+
+def bench_dotted(repeat: int) -> None:
+    """Dotted metrics.* columns vs str(dict) cells on server_metrics_large.toon"""
+    import io
+    from multi_converter import json_to_toon
+    from toon_cells import _decode_literal
+    from toon_encoder import format_value
+
+    rows = list(iter_server_rows(LARGE_TOON))
+    keys = list(rows[0])
+    literal = "\n".join(
+        [f"[{len(rows)}]{{{','.join(keys)}}}:"]
+        + ["  " + ",".join(format_value(row[key]) for key in keys) for row in rows]
+    )
+    dotted = json_to_toon(rows)
+    assert list(iter_server_rows(io.StringIO(literal))) == list(iter_server_rows(io.StringIO(dotted))) == rows
+
+    for label, text in (('str(dict) cells', literal), ('dotted columns', dotted)):
+        tokens = token_count(text)
+        tokens = 'tokens unavailable' if tokens is None else f"{tokens:,} tokens"
+        print(f"  {label:<28} {len(text):12,} bytes  {tokens}")
+    print(f"  bytes saved: {1 - len(dotted) / len(literal):.1%}")
+    def load_literal():
+        _decode_literal.cache_clear()
+        return list(iter_server_rows(io.StringIO(literal)))
+
+    report('load str(dict) cells', best_of(load_literal, repeat), len(rows))
+    report('load dotted columns', best_of(lambda: list(iter_server_rows(io.StringIO(dotted))), repeat), len(rows))
+
+
+def sparse_records(rows: int) -> List[dict]:
+    """API-style records where a few optional fields are missing from some objects"""
+    records = []
+    for i in range(rows):
+        record = {"id": i, "login": f"user{i}", "active": i % 5 != 0, "score": round(i % 997 / 9.7, 2)}
+        if i % 3:
+            record["email"] = f"user{i}@example.com"
+        if i % 7 == 0:
+            record["company"] = None if i % 2 else f"org-{i % 13}"
+        records.append(record)
+    return records
+
+
+def bench_union(repeat: int) -> None:
+    """Union-schema tables vs path notation for 100k records with optional fields"""
+    from multi_converter import json_to_toon, toon_to_json
+    from toon_encoder import format_value
+
+    data = sparse_records(100_000)
+    paths = "\n".join(f"{path}:{format_value(value)}" for path, value in _legacy_flatten_to_paths(data))
+    table = json_to_toon(data)
+    assert table.startswith(f"[{len(data)}]{{")
+    assert toon_to_json(table) == toon_to_json(paths) == data
+
+    for label, text in (('path notation', paths), ('union table', table)):
+        tokens = token_count(text)
+        tokens = 'tokens unavailable' if tokens is None else f"{tokens:,} tokens"
+        print(f"  {label:<28} {len(text):12,} bytes  {tokens}")
+    print(f"  bytes saved: {1 - len(table) / len(paths):.1%}")
+    report('encode path notation', best_of(lambda: "\n".join(
+        f"{path}:{format_value(value)}" for path, value in _legacy_flatten_to_paths(data)), repeat), len(data))
+    report('encode union table', best_of(lambda: json_to_toon(data), repeat), len(data))
+    report('decode path notation', best_of(lambda: toon_to_json(paths), repeat), len(data))
+    report('decode union table', best_of(lambda: toon_to_json(table), repeat), len(data))
+
+
+def bench_inline(repeat: int) -> None:
+    """Inline scalar arrays vs one path line per element on 20k hosts with small lists"""
+    from multi_converter import json_to_toon, toon_to_json
+    from toon_encoder import format_value
+
+    data = {
+        f"host{i}": {
+            "tags": [f"region-{i % 5}", "production" if i % 3 else "staging", f"rack-{i % 40}"],
+            "ports": [22, 80, 443, 8000 + i % 100][: 2 + i % 3],
+            "load": [round(i % 17 / 3, 2), round(i % 11 / 7, 2), round(i % 5 / 2, 2)],
+        }
+        for i in range(20_000)
+    }
+    paths = "\n".join(f"{path}:{format_value(value)}" for path, value in _legacy_flatten_to_paths(data))
+    inline = json_to_toon(data)
+    assert toon_to_json(inline) == toon_to_json(paths) == data
+
+    for label, text in (('one line per element', paths), ('inline arrays', inline)):
+        tokens = token_count(text)
+        tokens = 'tokens unavailable' if tokens is None else f"{tokens:,} tokens"
+        print(f"  {label:<28} {text.count(chr(10)) + 1:9,} lines {len(text):12,} bytes  {tokens}")
+    print(f"  bytes saved: {1 - len(inline) / len(paths):.1%}")
+    report('json_to_toon', best_of(lambda: json_to_toon(data), repeat), len(data), 'hosts')
+    report('toon_to_json (per element)', best_of(lambda: toon_to_json(paths), repeat), len(data), 'hosts')
+    report('toon_to_json (inline)', best_of(lambda: toon_to_json(inline), repeat), len(data), 'hosts')
+
+
+def _legacy_tabular_lines(data: List[dict]) -> List[str]:
+    """The two-pass tabular encoder: a key set per element, then a generator per row"""
+    first_keys = set(data[0].keys())
+    assert all(isinstance(item, dict) and set(item.keys()) == first_keys for item in data)
+    from toon_encoder import format_value
+
+    keys = list(data[0].keys())
+    lines = [f"[{len(data)}]{{{','.join(keys)}}}:"]
+    for item in data:
+        lines.append("  " + ",".join(format_value(item[key]) for key in keys))
+    return lines
+
+
+def bench_tabular(repeat: int) -> None:
+    """One-pass tabular encoding vs the two-pass encoder on 100k rows"""
+    from toon_encoder import iter_toon_lines
+
+    tables = {
+        '100k x 12 (int/float/bool/str)': wide_table(100_000),
+        '100k x 6 with nulls': [
+            {"id": i, "name": f"n{i}", "score": i / 8, "owner": None if i % 4 else "ops", "ok": i % 2 == 0, "rank": i % 10}
+            for i in range(100_000)
+        ],
+    }
+    mismatch = wide_table(100_000)
+    mismatch[-1] = dict(mismatch[-1], extra=1)
+
+    for label, data in tables.items():
+        assert list(iter_toon_lines(data)) == _legacy_tabular_lines(data)
+        print(f"  {label}")
+        report('two passes (legacy)', best_of(lambda: _legacy_tabular_lines(data), repeat), len(data))
+        report('one pass', best_of(lambda: list(iter_toon_lines(data)), repeat), len(data))
+    print("  100k x 12, last row breaks the schema")
+    report('one pass + fallback', best_of(lambda: list(iter_toon_lines(mismatch)), repeat), len(mismatch))
+
+
+def telemetry_records(rows: int) -> List[dict]:
+    """Server metrics with computed (full-precision) float readings"""
+    return [
+        {
+            "server_id": f"srv-{i:06d}",
+            "status": "active" if i % 9 else "degraded",
+            "metrics": {
+                "cpu_utilization_pct": (i * 37 % 1000) / 9.7,
+                "ram_usage_gb": (i * 53 % 2048) / 7.3,
+                "network_traffic": {"incoming_mbps": i % 977 / 1.3, "outgoing_mbps": i % 4999 / 3.1},
+            },
+            "uptime_seconds": i * 3607,
+            "health_score": (i % 101) / 101,
+        }
+        for i in range(rows)
+    ]
+
+
+def bench_precision(repeat: int) -> None:
+    """Bytes and tokens saved by rounding floats on 5k telemetry records"""
+    import json
+    from float_precision import precision_report, round_floats
+    from multi_converter import convert_format
+
+    data = telemetry_records(5_000)
+    content = json.dumps(data)
+    precision = {'*': 2, 'health_score': 3}
+    report_by_format = precision_report(convert_format(content, 'json', 'all'), convert_format(content, 'json', 'all', precision))
+    for name, entry in report_by_format.items():
+        tokens = 'tokens unavailable' if entry['tokens_saved'] is None else (
+            f"{entry['tokens_before']:,} -> {entry['tokens_after']:,} tokens"
+        )
+        saved = entry['bytes_saved'] / entry['bytes_before']
+        print(f"  {name:<6} {entry['bytes_before']:10,} -> {entry['bytes_after']:10,} bytes ({saved:.1%} saved)  {tokens}")
+    report('round_floats', best_of(lambda: round_floats(data, precision), repeat), len(data))
+
+
+def bench_aliases(repeat: int) -> None:
+    """Key aliases vs plain keys on server_configs_huge.json"""
+    import json
+    from multi_converter import json_to_toon, toon_to_json
+    from toon_encoder import choose_key_aliases
+
+    with open(os.path.join(BASE_DIR, '..', 'testfiles', 'server_configs_huge.json'), encoding='utf-8') as f:
+        servers = json.load(f)
+    for label, data in (('{"servers": [...]} (paths)', {'servers': servers}), ('[...] (root table)', servers)):
+        plain = json_to_toon(data)
+        aliased = json_to_toon(data, key_aliases=True)
+        assert toon_to_json(aliased) == toon_to_json(plain)
+        print(f"  {label}: {len(choose_key_aliases(data))} aliases, "
+              f"{'used' if aliased.startswith('@keys{') else 'not used'}")
+        for name, text in (('plain keys', plain), ('key aliases', aliased)):
+            tokens = token_count(text)
+            tokens = 'tokens unavailable' if tokens is None else f"{tokens:,} tokens"
+            print(f"  {name:<28} {len(text):12,} bytes  {tokens}")
+        print(f"  bytes saved: {1 - len(aliased) / len(plain):.1%}")
+    report('json_to_toon', best_of(lambda: json_to_toon(servers), repeat), len(servers))
+    report('json_to_toon (key_aliases)', best_of(lambda: json_to_toon(servers, key_aliases=True), repeat), len(servers))
+
+
+def bench_dedupe(repeat: int) -> None:
+    """Shared subtrees (TOON references, YAML anchors) on server_configs_huge.json"""
+    import json
+    from multi_converter import json_to_toon, json_to_yaml, toon_to_json
+    from shared_subtrees import share_subtrees
+
+    with open(os.path.join(BASE_DIR, '..', 'testfiles', 'server_configs_huge.json'), encoding='utf-8') as f:
+        data = {'servers': json.load(f)}
+    print(f"  {len(share_subtrees(data)[1]):,} shared subtrees")
+    for name, encode in (('toon', json_to_toon), ('yaml', json_to_yaml)):
+        plain = encode(data)
+        deduped = encode(data, dedupe=True)
+        if name == 'toon':
+            assert toon_to_json(deduped) == toon_to_json(plain)
+        for label, text in ((f'{name}', plain), (f'{name} (dedupe)', deduped)):
+            tokens = token_count(text)
+            tokens = 'tokens unavailable' if tokens is None else f"{tokens:,} tokens"
+            print(f"  {label:<28} {len(text):12,} bytes  {tokens}")
+        print(f"  bytes saved: {1 - len(deduped) / len(plain):.1%}")
+    servers = len(data['servers'])
+    report('share_subtrees', best_of(lambda: share_subtrees(data), repeat), servers)
+    report('json_to_toon', best_of(lambda: json_to_toon(data), repeat), servers)
+    report('json_to_toon (dedupe)', best_of(lambda: json_to_toon(data, dedupe=True), repeat), servers)
+    report('json_to_yaml', best_of(lambda: json_to_yaml(data), repeat), servers)
+    report('json_to_yaml (dedupe)', best_of(lambda: json_to_yaml(data, dedupe=True), repeat), servers)
+
+
+def bench_transcode(repeat: int) -> None:
+    """CSV <-> TOON directly vs through JSON on a 100k-row, 12-column table"""
+    import io
+    import tracemalloc
+    from multi_converter import (
+        csv_to_json,
+        json_to_csv,
+        json_to_toon,
+        toon_to_json,
+        transcode_csv_to_toon,
+        transcode_toon_to_csv,
+    )
+
+    rows = 100_000
+    data = wide_table(rows)
+    csv_text = json_to_csv(data)
+    toon_text = json_to_toon(data)
+    del data
+
+    def direct(transcode, text):
+        output = io.StringIO()
+        assert transcode(io.StringIO(text), output)
+        return output.getvalue()
+
+    assert direct(transcode_csv_to_toon, csv_text) == json_to_toon(csv_to_json(csv_text))
+    assert direct(transcode_toon_to_csv, toon_text) == json_to_csv(toon_to_json(toon_text))
+    cases = (
+        ('csv -> toon via json', lambda: json_to_toon(csv_to_json(csv_text))),
+        ('csv -> toon direct', lambda: direct(transcode_csv_to_toon, csv_text)),
+        ('toon -> csv via json', lambda: json_to_csv(toon_to_json(toon_text))),
+        ('toon -> csv direct', lambda: direct(transcode_toon_to_csv, toon_text)),
+    )
+    for label, fn in cases:
+        report(label, best_of(fn, repeat), rows)
+    # Peak memory allocated while converting, output string included
+    for label, fn in cases:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {label:<28} {peak / 2**20:9.1f} MiB peak")
+
+
+def bench_csv(repeat: int) -> None:
+    """Streaming CSV reader / writer vs whole-text conversion on 100k nested records"""
+    import io
+    import tempfile
+    import tracemalloc
+    from csv_stream import iter_csv_rows, write_csv
+    from multi_converter import csv_to_json, json_to_csv
+
+    rows = 100_000
+    data = telemetry_records(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'records.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            write_csv(data, f)
+
+        def read_text():
+            with open(path, encoding='utf-8') as f:
+                return csv_to_json(f.read())
+
+        def read_stream():
+            with open(path, encoding='utf-8') as f:
+                for _ in iter_csv_rows(f):
+                    pass
+
+        def write_text():
+            with open(os.devnull, 'w', encoding='utf-8') as f:
+                f.write(json_to_csv(data))
+
+        def write_stream():
+            with open(os.devnull, 'w', encoding='utf-8', newline='') as f:
+                write_csv(data, f)
+
+        assert read_text() == data
+        cases = (
+            ('csv_to_json(f.read())', read_text),
+            ('iter_csv_rows(f)', read_stream),
+            ('f.write(json_to_csv(data))', write_text),
+            ('write_csv(data, f)', write_stream),
+        )
+        for label, fn in cases:
+            report(label, best_of(fn, repeat), rows)
+        # Peak memory allocated while converting, beyond the records themselves
+        for label, fn in cases:
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {label:<28} {peak / 2**20:9.1f} MiB peak")
+
+
+def bench_yaml(repeat: int) -> None:
+    """Event-stream YAML reader vs yaml.safe_load on 20k nested records"""
+    import tempfile
+    import tracemalloc
+    import yaml
+    from yaml_stream import SafeLoader, YamlReader, dump_yaml
+
+    rows = 20_000
+    data = telemetry_records(rows)
+    print(f"  loader: {SafeLoader.__module__}.{SafeLoader.__name__}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'records.yaml')
+        with open(path, 'w', encoding='utf-8') as f:
+            dump_yaml(data, f)
+
+        def safe_load():
+            with open(path, encoding='utf-8') as f:
+                return yaml.safe_load(f.read())
+
+        def read_stream():
+            with open(path, encoding='utf-8') as f:
+                for _ in YamlReader(f):
+                    pass
+
+        assert safe_load() == data
+        cases = (
+            ('yaml.safe_load(f.read())', safe_load),
+            ('YamlReader(f)', read_stream),
+        )
+        for label, fn in cases:
+            report(label, best_of(fn, repeat), rows)
+        for label, fn in cases:
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {label:<28} {peak / 2**20:9.1f} MiB peak")
+
+
+def bench_emit(repeat: int) -> None:
+    """Flat-record YAML emitter vs yaml.dump on a 20k-row, 12-column table"""
+    import yaml
+    from yaml_stream import DUMP_OPTIONS, dump_yaml
+
+    rows = 20_000
+    data = wide_table(rows)
+    assert dump_yaml(data) == yaml.dump(data, **DUMP_OPTIONS)
+    report('yaml.dump', best_of(lambda: yaml.dump(data, **DUMP_OPTIONS), repeat), rows)
+    report('dump_yaml', best_of(lambda: dump_yaml(data), repeat), rows)
+
+
+def bench_detect(repeat: int) -> None:
+    """Format detection latency by input size: sampled prefix vs whole content"""
+    import json
+    from format_detector import _detect_whole, detect
+    from multi_converter import json_to_csv, json_to_toon, json_to_yaml
+
+    encoders = (('json', json.dumps), ('toon', json_to_toon), ('csv', json_to_csv), ('yaml', json_to_yaml))
+    for rows in (1_000, 10_000, 100_000):
+        data = wide_table(rows)
+        for name, encode in encoders:
+            text = encode(data)
+            assert detect(text).format == name
+            size = f"{name} {len(text) / 2**20:.1f} MiB"
+            report(f"detect ({size})", best_of(lambda: detect(text), repeat), rows)
+            if name == 'yaml' and rows > 1_000:
+                # Loading YAML takes about a second per thousand rows here
+                print(f"  {'whole (' + size + ')':<28} skipped")
+                continue
+            report(f"whole ({size})", best_of(lambda: _detect_whole(text.strip()), repeat), rows)
+
+
+def bench_tokens(repeat: int) -> None:
+    """Serial, batched and per-line cached token counting of all four formats of 20k telemetry records"""
+    import json
+    from multi_converter import convert_format
+    from token_counter import LineTokenCounter, count_tokens, count_tokens_batch, encoder_metrics, warm_up
+
+    warm_up()
+    if not encoder_metrics():
+        print("  tokenizer unavailable (tiktoken downloads its BPE files on first use)")
+        return
+    rows = 20_000
+    formats = convert_format(json.dumps(telemetry_records(rows)), 'json', 'all')
+    texts = list(formats.values())
+    print(f"  {sum(map(len, texts)) / 2**20:.1f} MiB in all, {os.cpu_count()} CPUs")
+    assert count_tokens_batch(texts) == [count_tokens(text) for text in texts]
+    report('count_tokens per format', best_of(lambda: [count_tokens(text) for text in texts], repeat), rows)
+    report('count_tokens_batch', best_of(lambda: count_tokens_batch(texts), repeat), rows)
+    report('count_tokens (json)', best_of(lambda: count_tokens(formats['json']), repeat), rows)
+    report('count_tokens_batch (json)', best_of(lambda: count_tokens_batch([formats['json']]), repeat), rows)
+
+    # Re-counting after one record changed, as the UI does on every edit
+    records = telemetry_records(rows)
+    versions = []
+    for version in range(repeat + 1):
+        records[rows // 2]['uptime_seconds'] = version
+        versions.append(list(convert_format(json.dumps(records), 'json', 'all').values()))
+    counter = LineTokenCounter()
+    counter.count_batch(texts)
+    assert counter.count_batch(versions[0]) == count_tokens_batch(versions[0])
+    edits = iter(versions[1:])
+    report('count_tokens_batch (edited)', best_of(lambda: count_tokens_batch(versions[0]), repeat), rows)
+    report('LineTokenCounter (edited)', best_of(lambda: counter.count_batch(next(edits)), repeat), rows)
+
+BENCHMARKS = {
+    'aliases': bench_aliases,
+    'columns': bench_columns,
+    'csv': bench_csv,
+    'dedupe': bench_dedupe,
+    'detect': bench_detect,
+    'dotted': bench_dotted,
+    'emit': bench_emit,
+    'flatten': bench_flatten,
+    'inline': bench_inline,
+    'paths': bench_paths,
+    'precision': bench_precision,
+    'literals': bench_literals,
+    'nested': bench_nested,
+    'splitter': bench_splitter,
+    'tabular': bench_tabular,
+    'tokens': bench_tokens,
+    'transcode': bench_transcode,
+    'union': bench_union,
+    'yaml': bench_yaml,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run converter micro-benchmarks.")
+    parser.add_argument('name', choices=sorted(BENCHMARKS) + ['all'], help="Benchmark to run")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    names = sorted(BENCHMARKS) if args.name == 'all' else [args.name]
+    for name in names:
+        print(f"{name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name](args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
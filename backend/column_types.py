@@ -0,0 +1,215 @@
+"""
+Column type inference for tabular TOON and CSV decoding.
+
+A tabular column almost always holds a single type, yet ``parse_value`` and
+``parse_csv_value`` re-detect the type of every cell with string replaces,
+``isdigit`` checks and try/except. Here a type is picked once per column,
+either from a sample of rows or from a typed header (``{id:int,name:str}``),
+and the whole column is then checked with one regex and converted with one
+builtin (``map(int, cells)`` and friends).
+
+Each type only claims cells whose parsed value is unambiguous, so the result
+is always identical to the generic parser: a column that does not fully match
+its type is converted cell by cell, and cells that break the type are handed
+to the generic ``parse`` function.
+"""
+import re
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Cell grammars for which parse_value and parse_csv_value agree on the result
+_INT = r'-?[0-9]+'
+_FLOAT = r'-?(?:[0-9]+\.[0-9]*|\.[0-9]+)'
+_BOOL = r'(?i:true|false)'
+
+# Anything a parser might turn into something other than the cell text: blank
+# or padded cells, cells built only from digits, signs, dots, exponents and
+# punctuation, and the boolean / null keywords
+_NOT_PLAIN = re.compile(r'\s.*|.*\s|(?:\W|[\d_eE])*|(?i:true|false|none|null)', re.DOTALL)
+
+# Columns are checked as one string with a newline in front of every cell
+_WHITESPACE = re.compile(r'[^\S\n]')
+# A cell that does not start with a letter, or is a boolean / null keyword.
+# Cells without whitespace that start with a letter are never numbers.
+_NOT_LETTER_LED = re.compile(r'\n(?:(?![^\W\d_])|(?i:true|false|none|null)(?![^\n]))')
+
+
+def _column(cell: str) -> "re.Pattern[str]":
+    """Match a joined column in which every cell matches ``cell``"""
+    return re.compile(rf'(?:\n{cell})+')
+
+
+_CELL_PATTERNS = {
+    'int': re.compile(_INT),
+    'float': re.compile(_FLOAT),
+    'bool': re.compile(_BOOL),
+}
+# Whole-column fast paths: (pattern for the joined column, converter for the column).
+# Booleans take the fast path only in the lowercase spelling the encoders write.
+_COLUMN_FAST_PATHS: Dict[str, Tuple["re.Pattern[str]", Callable[[Sequence[str]], List[Any]]]] = {
+    'int': (_column(_INT), lambda cells: list(map(int, cells))),
+    'float': (_column(_FLOAT), lambda cells: list(map(float, cells))),
+    'bool': (_column('(?:true|false)'), lambda cells: list(map('true'.__eq__, cells))),
+}
+
+_BUILTINS: Dict[str, Callable[[str], Any]] = {
+    'int': int,
+    'float': float,
+    'bool': lambda cell: cell.lower() == 'true',
+}
+
+# Types that can be declared in a header; ``any`` means "use the generic parser"
+COLUMN_TYPES = ('int', 'float', 'bool', 'str', 'any')
+
+# Rows looked at when inferring column types
+SAMPLE_ROWS = 100
+
+# Cell of an optional column (``{id,email?}``) for an object without that key
+ABSENT = '~'
+
+
+def split_typed_fields(names: Sequence[str]) -> Tuple[List[str], Optional[List[str]]]:
+    """
+    Split typed header entries such as ``id:int`` into names and types.
+
+    Types are only recognised when every entry carries one of ``COLUMN_TYPES``,
+    so untyped headers whose keys happen to contain ``:`` are left alone.
+    Returns ``(names, types)``; ``types`` is ``None`` for an untyped header.
+    """
+    names = list(names)
+    if not names:
+        return names, None
+    split = [name.rpartition(':') for name in names]
+    if not all(sep and kind in COLUMN_TYPES for _, sep, kind in split):
+        return names, None
+    return [name for name, _, _ in split], [kind for _, _, kind in split]
+
+
+def split_optional_fields(names: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """
+    Strip the ``?`` marking optional columns from header names.
+
+    Returns ``(names, optional names)``. In an optional column an ``ABSENT``
+    cell means the object has no such key, which is distinct from ``null``.
+    """
+    names = list(names)
+    optional = [name[:-1] for name in names if name.endswith('?')]
+    if not optional:
+        return names, optional
+    return [name[:-1] if name.endswith('?') else name for name in names], optional
+
+
+def drop_absent(optional: Sequence[str], row: dict) -> dict:
+    """Remove the optional keys of ``row`` whose cell was ``ABSENT``"""
+    for name in optional:
+        if row[name] == ABSENT:
+            del row[name]
+    return row
+
+
+def _join(cells: Sequence[str]) -> Optional[str]:
+    """Prefix every cell with a newline and join them, or return None if a cell contains one"""
+    joined = '\n' + '\n'.join(cells)
+    if joined.count('\n') != len(cells):
+        return None
+    return joined
+
+
+def _matches(type_name: str, cell: str) -> bool:
+    if type_name == 'str':
+        return _NOT_PLAIN.fullmatch(cell) is None
+    return _CELL_PATTERNS[type_name].fullmatch(cell) is not None
+
+
+def infer_column_type(cells: Sequence[str]) -> str:
+    """
+    Pick the type that fits most of ``cells``.
+
+    Returns ``'any'`` unless a single type covers more than half of the cells.
+    """
+    if not cells:
+        return 'any'
+    best, best_count = 'any', len(cells) // 2
+    for type_name in ('int', 'float', 'bool', 'str'):
+        count = sum(1 for cell in cells if _matches(type_name, cell))
+        if count > best_count:
+            best, best_count = type_name, count
+    return best
+
+
+def infer_column_types(rows: Sequence[Sequence[str]], width: int) -> List[str]:
+    """Infer one type per column from the first ``SAMPLE_ROWS`` rows of cells"""
+    sample = rows[:SAMPLE_ROWS]
+    return [infer_column_type([row[i] for row in sample]) for i in range(width)]
+
+
+def value_type(values: Sequence[Any]) -> str:
+    """Return the header type describing every Python value in ``values``"""
+    kinds = {type(value) for value in values}
+    if len(kinds) == 1:
+        kind = kinds.pop()
+        for type_name, builtin in (('int', int), ('float', float), ('bool', bool), ('str', str)):
+            if kind is builtin:
+                return type_name
+    return 'any'
+
+
+def convert_column(cells: Sequence[str], type_name: str, parse: Callable[[str], Any]) -> List[Any]:
+    """
+    Convert a column of cell strings to values.
+
+    The whole column is first checked against ``type_name`` in one regex
+    match and converted with a single builtin; otherwise cells are converted
+    one by one, falling back to ``parse`` for those that do not fit the type.
+    ``parse`` must agree with ``parse_value`` / ``parse_csv_value`` on cells
+    of the declared types (as both of those do).
+    """
+    if type_name == 'any':
+        return list(map(parse, cells))
+
+    joined = _join(cells)
+    if joined is not None:
+        if type_name == 'str':
+            if _WHITESPACE.search(joined) is None and _NOT_LETTER_LED.search(joined) is None:
+                return list(cells)
+        else:
+            pattern, convert = _COLUMN_FAST_PATHS[type_name]
+            if pattern.fullmatch(joined) is not None:
+                return convert(cells)
+
+    return list(map(cell_converter(type_name, parse), cells))
+
+
+def cell_converter(type_name: str, parse: Callable[[str], Any]) -> Callable[[str], Any]:
+    """Return a single-cell converter for ``type_name`` that falls back to ``parse``"""
+    if type_name == 'any':
+        return parse
+    if type_name == 'str':
+        not_plain = _NOT_PLAIN.fullmatch
+        return lambda cell: parse(cell) if not_plain(cell) else cell
+    builtin = _BUILTINS[type_name]
+    fits = _CELL_PATTERNS[type_name].fullmatch
+    return lambda cell: builtin(cell) if fits(cell) else parse(cell)
+
+
+def decode_rows(
+    fields: Sequence[str],
+    rows: Sequence[Sequence[str]],
+    types: Optional[Sequence[str]],
+    parse: Callable[[str], Any],
+) -> List[dict]:
+    """
+    Decode rows of cell strings column by column into dicts.
+
+    ``types`` gives one entry of ``COLUMN_TYPES`` per field; when it is
+    ``None`` the types are inferred from the first rows.
+    """
+    if not rows:
+        return []
+    width = len(fields)
+    if types is None:
+        types = infer_column_types(rows, width)
+    # Slicing the flattened rows is much cheaper than zip(*rows) on long batches
+    cells = list(chain.from_iterable(rows))
+    columns = [convert_column(cells[i::width], type_name, parse) for i, type_name in enumerate(types)]
+    return [dict(zip(fields, values)) for values in zip(*columns)]
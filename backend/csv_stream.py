@@ -0,0 +1,155 @@
+"""
+Streaming CSV reader and writer.
+
+``iter_csv_rows`` yields one row dict at a time, converting cells to values
+column by column in batches (see ``column_types``), and ``write_csv`` writes
+rows to a stream as they come. Neither holds more than a batch of rows, so
+files are converted without keeping the whole table (or its text) in memory.
+
+CSV has no nesting, so nested objects are spread over dotted columns on the
+way out (``{'metrics': {'cpu': 1}}`` becomes a ``metrics.cpu`` column) when
+every row fits the columns of the first, and rebuilt from dotted column
+names on the way in, as for tabular TOON.
+"""
+import csv
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, TextIO
+
+from column_types import decode_rows, infer_column_types, split_typed_fields
+from toon_paths import column_nester
+
+# Rows per column-wise decoding batch
+CSV_ROW_BATCH = 4096
+
+
+def parse_csv_value(value: str) -> Any:
+    """Parse CSV value to appropriate type"""
+    if not value:
+        return None
+    # Try number
+    try:
+        if '.' in value:
+            return float(value)
+        return int(value)
+    except ValueError:
+        pass
+    # Try boolean
+    if value.lower() == 'true':
+        return True
+    if value.lower() == 'false':
+        return False
+    return value
+
+
+def _decode_ragged(fields: List[str], rows: List[List[str]]) -> List[dict]:
+    """Decode rows cell by cell, filling the missing trailing cells of short rows with None"""
+    width = len(fields)
+    decoded = []
+    for row in rows:
+        if len(row) > width:
+            raise ValueError(f"CSV row has {len(row)} cells but header has {width} fields.")
+        values = [parse_csv_value(cell) for cell in row]
+        values.extend([None] * (width - len(row)))
+        decoded.append(dict(zip(fields, values)))
+    return decoded
+
+
+def iter_csv_rows(fp: Iterable[str], batch_size: int = CSV_ROW_BATCH) -> Iterator[dict]:
+    """
+    Yield one dict per data row of the CSV read from ``fp``.
+
+    The first row holds the column names, optionally typed (``id:int``, see
+    ``split_typed_fields``); blank rows are skipped. Cells are converted like
+    ``parse_csv_value`` would, but a column at a time with the type declared
+    in the header or inferred from the first batch of ``batch_size`` rows.
+    Short rows get ``None`` for their missing cells; a row with more cells
+    than the header raises ``ValueError``. Dotted column names are rebuilt
+    into nested objects when they form a tree.
+    """
+    reader = csv.reader(fp)
+    fields, types = split_typed_fields(next(reader, []))
+    nest = column_nester(fields)
+    width = len(fields)
+    rows = filter(None, reader)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        if all(len(row) == width for row in batch):
+            if types is None:
+                types = infer_column_types(batch, width)
+            decoded = decode_rows(fields, batch, types, parse_csv_value)
+        else:
+            decoded = _decode_ragged(fields, batch)
+        yield from decoded if nest is None else map(nest, decoded)
+
+
+def flatten_row(row: dict) -> dict:
+    """
+    Spread the nested objects of ``row`` over dotted keys.
+
+    ``{'id': 1, 'm': {'cpu': 0.5, 'net': {'in': 7}}}`` becomes
+    ``{'id': 1, 'm.cpu': 0.5, 'm.net.in': 7}``. Empty objects, and objects
+    with keys that are not strings or contain a dot, are kept as values.
+    Returns ``row`` itself when nothing is nested.
+    """
+    if dict not in map(type, row.values()):
+        return row
+    flat = {}
+    # (key prefix, remaining items of the object being spread)
+    stack = [('', iter(row.items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for key, value in items:
+            name = f"{prefix}{key}" if prefix else key
+            if type(value) is dict and value and all(type(k) is str and '.' not in k for k in value):
+                stack.append((f"{name}.", iter(value.items())))
+                break
+            flat[name] = value
+        else:
+            stack.pop()
+    return flat
+
+
+def write_csv(rows: Iterable[Any], fp: TextIO) -> None:
+    """
+    Write ``rows`` to the text stream ``fp`` as CSV, one row at a time.
+
+    Rows are dicts whose columns are taken from the first row, or scalars
+    written to a single ``value`` column. Nothing is written for no rows.
+    ``fp`` should be opened with ``newline=''``.
+
+    Nested objects are spread over dotted columns (see ``flatten_row``)
+    when the dotted keys of every row are columns of the first row;
+    otherwise no row is flattened and objects are written as values. When
+    the first row has nested objects, that is checked in a first pass over
+    ``rows``, which are then iterated again: a one-shot iterator is read
+    into a list for that, other iterables must give the same rows twice.
+    """
+    remaining = iter(rows)
+    for first in remaining:
+        break
+    else:
+        return
+    if not isinstance(first, dict):
+        writer = csv.writer(fp)
+        writer.writerow(['value'])
+        writer.writerow([first])
+        writer.writerows([item] for item in remaining)
+        return
+
+    flat = flatten_row(first)
+    if flat is not first:
+        if remaining is rows:
+            check = list(remaining)
+            remaining = iter(check)
+        else:
+            check = remaining
+            remaining = islice(iter(rows), 1, None)
+        columns = flat.keys()
+        if all(flatten_row(row).keys() <= columns for row in check):
+            first, remaining = flat, map(flatten_row, remaining)
+    writer = csv.DictWriter(fp, fieldnames=list(first))
+    writer.writeheader()
+    writer.writerow(first)
+    writer.writerows(remaining)
@@ -0,0 +1,120 @@
+"""
+Float rounding for encoded output.
+
+Telemetry fields such as ``cpu_utilization_pct`` or ``health_score`` are
+often computed values carrying 15+ significant digits, which every encoder
+writes out in full (``str`` / ``repr``). Rounding them once in the decoded
+document, before any encoder runs, shrinks JSON, TOON, CSV and YAML output
+alike and keeps every encoder's fast paths untouched.
+
+A precision is either an ``int`` (digits after the decimal point for every
+float) or a mapping of key names to digits, e.g.
+``{'cpu_utilization_pct': 1, 'metrics': 2, '*': 3}``. A float is rounded
+with the entry of the nearest enclosing key that has one, so ``metrics``
+covers everything below it and a list inherits the entry of its key;
+``'*'`` applies to floats no entry covers. Floats not covered at all are
+left as they are.
+"""
+from typing import Any, Dict, Mapping, Optional, Union
+
+Precision = Union[int, Mapping[str, int]]
+
+# Entry of a precision mapping used for floats below no listed key
+DEFAULT_KEY = '*'
+
+
+def _round(value: float, digits: int) -> float:
+    # ``or 0.0`` turns -0.0 (from rounding small negatives) into 0.0
+    return round(value, digits) or 0.0
+
+
+def round_floats(data: Any, precision: Optional[Precision]) -> Any:
+    """
+    Return a copy of ``data`` with its floats rounded to ``precision``.
+
+    Containers are copied, other values are shared; ``data`` is not
+    modified. Returns ``data`` itself when ``precision`` is ``None``.
+    Deeply nested documents are walked with an explicit stack.
+    """
+    if precision is None:
+        return data
+    if isinstance(precision, int):
+        columns: Mapping[str, int] = {}
+        default: Optional[int] = precision
+    else:
+        columns = precision
+        default = precision.get(DEFAULT_KEY)
+
+    if isinstance(data, float):
+        return data if default is None else _round(data, default)
+    if not isinstance(data, (dict, list)):
+        return data
+
+    result = {} if isinstance(data, dict) else []
+    # (source container, copy being filled, digits inherited from the enclosing key)
+    stack = [(data, result, default)]
+    while stack:
+        source, target, digits = stack.pop()
+        if isinstance(source, dict):
+            items = source.items()
+        else:
+            items = enumerate(source)
+        for key, value in items:
+            own = columns.get(key, digits) if columns and isinstance(key, str) else digits
+            if isinstance(value, float):
+                if own is not None:
+                    value = _round(value, own)
+            elif isinstance(value, (dict, list)):
+                copy = {} if isinstance(value, dict) else []
+                stack.append((value, copy, own))
+                value = copy
+            if isinstance(target, dict):
+                target[key] = value
+            else:
+                target.append(value)
+    return result
+
+
+def precision_report(
+    original: Dict[str, str],
+    rounded: Dict[str, str],
+    rounded_tokens: Optional[Dict[str, int]] = None,
+) -> Dict[str, Dict[str, Optional[int]]]:
+    """
+    Compare the encodings of a document before and after rounding.
+
+    Both arguments map format names to encoded text, as returned by
+    ``convert_format``. For every format in both, returns the UTF-8 size and
+    token count before and after plus what was saved; token entries are
+    ``None`` when no tokenizer is available. ``rounded_tokens`` are the
+    token counts of ``rounded`` when the caller already has them (see
+    ``count_tokens_for_formats``, which also counts the rest).
+    """
+    from token_counter import count_tokens_for_formats
+
+    def token_counts(texts: Dict[str, str]) -> Dict[str, Optional[int]]:
+        try:
+            return count_tokens_for_formats(texts)
+        except Exception:
+            # tiktoken could not load an encoding (e.g. offline)
+            return dict.fromkeys(texts)
+
+    names = [name for name in original if name in rounded]
+    counts_before = token_counts({name: original[name] for name in names})
+    if rounded_tokens is None:
+        rounded_tokens = token_counts({name: rounded[name] for name in names})
+
+    report = {}
+    for name in names:
+        before, after = original[name], rounded[name]
+        bytes_before, bytes_after = len(before.encode('utf-8')), len(after.encode('utf-8'))
+        tokens_before, tokens_after = counts_before[name], rounded_tokens.get(name)
+        report[name] = {
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_saved': bytes_before - bytes_after,
+            'tokens_before': tokens_before,
+            'tokens_after': tokens_after,
+            'tokens_saved': None if tokens_before is None or tokens_after is None else tokens_before - tokens_after,
+        }
+    return report
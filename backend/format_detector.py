@@ -1,42 +1,198 @@
 """
 Format detection utilities to identify JSON, TOON, CSV, and YAML formats
+
+``detect`` returns a ``Detection``: the format, how sure the check that
+matched is, and the document when that check had to parse the content
+anyway (JSON and YAML), so converting the content does not parse it again.
+``detect_format`` returns only the format name.
+
+Content longer than ``SAMPLE_SIZE`` is first checked for TOON and CSV
+from the first lines of a prefix of that size, as short content is, then
+classified from the prefix by one lexical scan (bracket and quote balance,
+colon spacing, commas per line, ``[N]{...}:`` headers), without parsing it;
+only when neither is conclusive is the whole content checked as for short
+content.
 """
 import json
-import csv
-import io
-import yaml
 import re
+from itertools import islice
+from typing import Any, List, NamedTuple, Optional, Tuple
 
+import yaml
 
-def detect_format(content: str) -> str:
+
+class Detection(NamedTuple):
+    """Result of ``detect``"""
+    # 'json', 'toon', 'csv', 'yaml', or 'unknown'
+    format: str
+    # From 0 (unknown) to 1 (parsed as JSON)
+    confidence: float
+    # Whether ``document`` holds the parsed content
+    parsed: bool = False
+    document: Any = None
+
+
+UNKNOWN = Detection('unknown', 0.0)
+
+# Characters of a long input that are classified without parsing it
+SAMPLE_SIZE = 16 * 1024
+# Confidence from which a classified sample is taken as the format
+CONFIDENT = 0.8
+
+_FIRST_TEXT = re.compile(r'\S')
+_LINE = re.compile(r'[^\n]+')
+# Double-quoted strings (JSON, CSV cells), which may hold any other token
+_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"')
+_BRACKET = re.compile(r'[\[\]{}]')
+# Header of a tabular TOON block: ``[N]{keys}:``, at the root or at a path
+_TOON_TABLE = re.compile(r'[^\s:]*\[\d+\]\{[^{}]*\}:$')
+_CLOSERS = {'[': ']', '{': '}'}
+# Starts of content that may be JSON, which is checked before TOON and CSV:
+# objects, strings and arrays that do not open with a TOON root path
+_JSON_START = re.compile(r'[{"]|\[(?!\d+\][.{:\[])')
+
+
+def detect(content: str) -> Detection:
     """
     Detect the format of the given content.
-    
-    Returns:
-        'json', 'toon', 'csv', 'yaml', or 'unknown'
+
+    Short content is checked whole: JSON and YAML are recognised by parsing
+    it, and their detections carry the document; TOON and CSV are
+    recognised from their first lines and are not parsed. Longer content is
+    checked for TOON and CSV from the first lines of its first
+    ``SAMPLE_SIZE`` characters in the same way unless it may be JSON, and
+    otherwise classified from them, and not parsed, when that gives at
+    least ``CONFIDENT``.
+    """
+    if not content:
+        return UNKNOWN
+    first = _FIRST_TEXT.search(content)
+    if first is None:
+        return UNKNOWN
+
+    if len(content) - first.start() > SAMPLE_SIZE:
+        sample = content[first.start():first.start() + SAMPLE_SIZE]
+        # Leave out the line the sample cuts through
+        sample = sample[:sample.rfind('\n')]
+        if not _JSON_START.match(sample):
+            # The first-lines checks give what they give for the whole content
+            confidence = _toon_confidence(sample)
+            if confidence:
+                return Detection('toon', confidence)
+            confidence = _csv_confidence(sample)
+            if confidence:
+                return Detection('csv', confidence)
+        detection = classify_sample(sample)
+        if detection.confidence >= CONFIDENT:
+            return detection
+
+    return _detect_whole(content.strip())
+
+
+def classify_sample(sample: str) -> Detection:
+    """
+    Classify the first lines of some content without parsing them.
+
+    The sample is scanned once with its quoted strings blanked out: the
+    brackets must nest, and every line gives its commas, how its first
+    colon is followed and whether it is a ``-`` item. The confidence says
+    how consistently the sample shows its format, from 0 (no format) up;
+    ``detect`` trusts it from ``CONFIDENT``.
     """
-    if not content or not content.strip():
-        return 'unknown'
-    
-    content = content.strip()
-    
+    text = _STRING.sub('""', sample)
+    lines = [line for line in text.split('\n') if line.strip()]
+    if not lines:
+        return UNKNOWN
+    first = lines[0].strip()
+
+    # Closing brackets expected, innermost last
+    closers = []
+    balanced = True
+    for bracket in _BRACKET.findall(text):
+        if bracket in _CLOSERS:
+            closers.append(_CLOSERS[bracket])
+        elif not closers or closers.pop() != bracket:
+            balanced = False
+            break
+    commas = [line.count(',') for line in lines]
+    colons = list(map(_colon_kind, lines))
+    tight = colons.count('tight')
+    spaced = colons.count('spaced')
+    dashed = any(line.lstrip().startswith('-') for line in lines)
+
+    if _TOON_TABLE.match(first):
+        return Detection('toon', 0.95)
+    if first[0] in '{[':
+        return Detection('json', 0.9 if balanced else 0.4)
+    if colons[0] == 'tight' and tight >= spaced and not dashed:
+        return Detection('toon', 0.85)
+    if commas[0] and len(lines) > 1 and spaced * 2 < len(lines):
+        same = commas.count(commas[0]) / len(commas)
+        return Detection('csv', 0.9 if same >= 0.9 else 0.6 * same)
+    if first.startswith('---') or first.startswith('-'):
+        return Detection('yaml', 0.9)
+    if colons[0] in ('spaced', 'end') and spaced >= tight:
+        return Detection('yaml', 0.85)
+    return UNKNOWN
+
+
+def _colon_kind(line: str) -> Optional[str]:
+    """Say what follows the first colon of a line: text ('tight'), a space ('spaced') or nothing ('end')"""
+    index = line.find(':')
+    if index < 0:
+        return None
+    if line[index + 1:index + 2].strip():
+        return 'tight'
+    return 'spaced' if line[index + 1:].strip() else 'end'
+
+
+def _detect_whole(content: str) -> Detection:
+    """Detect the format of stripped content from its first lines, parsing it as JSON or YAML"""
     # Try JSON detection
-    if is_json(content):
-        return 'json'
-    
+    try:
+        return Detection('json', 1.0, True, json.loads(content))
+    except ValueError:
+        pass
+
     # Try TOON detection
-    if is_toon(content):
-        return 'toon'
-    
+    confidence = _toon_confidence(content)
+    if confidence:
+        return Detection('toon', confidence)
+
     # Try CSV detection
-    if is_csv(content):
-        return 'csv'
-    
+    confidence = _csv_confidence(content)
+    if confidence:
+        return Detection('csv', confidence)
+
     # Try YAML detection
-    if is_yaml(content):
-        return 'yaml'
-    
-    return 'unknown'
+    confidence, document = _yaml_detection(content)
+    if confidence:
+        return Detection('yaml', confidence, True, document)
+
+    return UNKNOWN
+
+
+def detect_format(content: str) -> str:
+    """
+    Detect the format of the given content.
+
+    Returns:
+        'json', 'toon', 'csv', 'yaml', or 'unknown'
+    """
+    return detect(content).format
+
+
+def candidate_formats(detection: Detection, requested: str) -> List[str]:
+    """
+    Return the formats to try converting content as, best first.
+
+    The detected format comes first when it differs from the ``requested``
+    one, so content pasted in the wrong box still converts; the requested
+    format is tried after it.
+    """
+    if detection.format in ('unknown', requested):
+        return [requested]
+    return [detection.format, requested]
 
 
 def is_json(content: str) -> bool:
@@ -50,95 +206,101 @@ def is_json(content: str) -> bool:
 
 def is_toon(content: str) -> bool:
     """Check if content is TOON format"""
-    lines = content.strip().split('\n')
+    return _toon_confidence(content) > 0
+
+
+def _toon_confidence(content: str) -> float:
+    """Return how surely the first lines of ``content`` are TOON (0 if they are not)"""
+    lines = content.strip().split('\n', 2)
     if not lines:
-        return False
-    
+        return 0.0
+
     first_line = lines[0].strip()
-    
+
     # Check for array-of-objects format: [count]{keys}:
     if first_line.startswith('[') and ']{' in first_line and first_line.endswith(':'):
-        return True
-    
+        return 0.95
+
     # Check for path notation: key:value or key.path:value
     if ':' in first_line and not first_line.startswith('-'):
         # Check if it has TOON-style path notation (dots, brackets)
         if '.' in first_line or '[' in first_line:
-            return True
+            return 0.8
         # Check for TOON compact format: key:value (no space after colon)
-        if ':' in first_line:
-            parts = first_line.split(':', 1)
-            if len(parts) == 2 and not parts[1].startswith(' '):
-                # No space after colon is TOON format
-                if len(lines) > 1:
-                    second_line = lines[1].strip()
-                    # TOON typically has no indentation
-                    if not second_line.startswith('  ') and not second_line.startswith('-'):
-                        return True
-    
-    return False
+        parts = first_line.split(':', 1)
+        if len(parts) == 2 and not parts[1].startswith(' '):
+            # No space after colon is TOON format
+            if len(lines) > 1:
+                second_line = lines[1].strip()
+                # TOON typically has no indentation
+                if not second_line.startswith('  ') and not second_line.startswith('-'):
+                    return 0.6
+
+    return 0.0
 
 
 def is_csv(content: str) -> bool:
     """Check if content is CSV format"""
-    lines = [line.strip() for line in content.strip().split('\n') if line.strip()]
+    return _csv_confidence(content) > 0
+
+
+def _csv_confidence(content: str) -> float:
+    """Return how surely the first lines of ``content`` are CSV (0 if they are not)"""
+    # Only the first three lines are needed
+    lines = list(islice(filter(None, (match.group().strip() for match in _LINE.finditer(content))), 3))
     if len(lines) < 2:
-        return False
-    
+        return 0.0
+
     # Check if first line looks like headers (comma-separated)
     first_line = lines[0]
     if ',' not in first_line:
-        return False
-    
+        return 0.0
+
     # Count commas in first line
     comma_count = first_line.count(',')
-    if comma_count == 0:
-        return False
-    
+
     # Check if at least one other line has similar comma count
     for line in lines[1:3]:  # Check next 2 lines
         if line.count(',') == comma_count:
-            return True
-    
-    return False
+            return 0.7
+
+    return 0.0
 
 
 def is_yaml(content: str) -> bool:
     """Check if content is YAML format"""
+    return _yaml_detection(content)[0] > 0
+
+
+def _yaml_detection(content: str) -> Tuple[float, Any]:
+    """Parse ``content`` as YAML; return how surely it is YAML (0 if it is not) and the document"""
+    # yaml.safe_load rather than libyaml, whose scanner accepts other texts (see yaml_stream)
     try:
-        yaml.safe_load(content)
-        # Additional checks to distinguish from TOON
-        lines = content.strip().split('\n')
-        if not lines:
-            return False
-        
-        first_line = lines[0].strip()
-        
-        # YAML often starts with --- or has list items with -
-        if first_line.startswith('---') or first_line.startswith('-'):
-            return True
-        
-        # Check for YAML-style key: value (with space after colon)
-        if ':' in first_line:
-            parts = first_line.split(':', 1)
-            if len(parts) == 2 and parts[1].startswith(' '):
-                # Has space after colon - likely YAML
-                if len(lines) > 1:
-                    second_line = lines[1]
-                    # YAML typically has indentation
-                    if second_line.startswith('  ') or second_line.startswith('\t'):
-                        return True
-                    # Or it's a simple YAML with space after colon
-                    return True
-        
-        # YAML typically has indentation
-        if len(lines) > 1:
-            second_line = lines[1]
-            if second_line.startswith('  ') or second_line.startswith('\t'):
-                # Check if it's not TOON array format
-                if not first_line.startswith('[') or ']{' not in first_line:
-                    return True
-        
-        return False
+        document = yaml.safe_load(content)
     except yaml.YAMLError:
-        return False
+        return 0.0, None
+
+    # Additional checks to distinguish from TOON
+    lines = content.strip().split('\n', 2)
+    first_line = lines[0].strip()
+
+    # YAML often starts with --- or has list items with -
+    if first_line.startswith('---') or first_line.startswith('-'):
+        return 0.9, document
+
+    # Check for YAML-style key: value (with space after colon)
+    if ':' in first_line:
+        parts = first_line.split(':', 1)
+        if len(parts) == 2 and parts[1].startswith(' '):
+            # Has space after colon - likely YAML
+            return 0.8, document
+
+    # YAML typically has indentation
+    if len(lines) > 1:
+        second_line = lines[1]
+        if second_line.startswith('  ') or second_line.startswith('\t'):
+            # Check if it's not TOON array format
+            if not first_line.startswith('[') or ']{' not in first_line:
+                return 0.7, document
+
+    return 0.0, None
@@ -1,103 +1,63 @@
 """
 Multi-format converter: JSON, TOON, CSV, YAML
 """
+import argparse
 import json
 import csv
 import io
-import yaml
-from typing import Any, Dict, List
+import os
+from itertools import chain, islice
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
 
+from column_types import convert_column, infer_column_types, split_typed_fields
+from csv_stream import iter_csv_rows, parse_csv_value, write_csv
+from float_precision import DEFAULT_KEY, Precision, round_floats
+from format_detector import Detection, candidate_formats
+from shared_subtrees import share_subtrees
+from toon_decoder import ToonReader, parse_value
+from toon_encoder import choose_key_aliases, format_value, write_toon
+from toon_paths import PathAssembler, Reference, column_nester, quote_column
+from yaml_stream import YamlReader, dump_yaml, load_yaml
 
-def json_to_toon(json_data):
+# Rows per column-wise decoding batch for tabular TOON and CSV
+TOON_ROW_BATCH = 4096
+
+
+def json_to_toon(
+    json_data, precision: Optional[Precision] = None, key_aliases: bool = False, dedupe: bool = False
+):
     """
     Convert JSON data to TOON format - compact format with minimal whitespace.
     Special optimized format for arrays of objects: [count]{keys}:\n  values...
     Uses dot notation for nesting and bracket notation for arrays otherwise.
+    Floats are rounded to ``precision`` first (see ``float_precision``).
+    With ``key_aliases``, long repeated keys are replaced by short aliases
+    declared in an ``@keys{...}`` line, if that takes fewer tokens. With
+    ``dedupe``, repeated subtrees are written once and referenced after that
+    (see ``shared_subtrees``).
     """
-    def is_array_of_objects(obj):
-        """Check if list contains only dicts with same keys"""
-        if not isinstance(obj, list) or not obj:
-            return False
-        if not all(isinstance(item, dict) for item in obj):
-            return False
-        # Check if all objects have the same keys
-        if len(obj) == 0:
-            return False
-        first_keys = set(obj[0].keys())
-        return all(set(item.keys()) == first_keys for item in obj)
-    
-    def format_value(val):
-        """Format a value for TOON output"""
-        if val is None:
-            return "null"
-        elif isinstance(val, bool):
-            return "true" if val else "false"
-        else:
-            return str(val)
-    
-    # Handle root-level primitives
-    if not isinstance(json_data, (dict, list)):
-        return str(json_data)
-    
-    # Special case: array of objects with same structure
-    if is_array_of_objects(json_data):
-        count = len(json_data)
-        if count == 0:
-            return "[0]{}:"
-        
-        # Get keys from first object
-        keys = list(json_data[0].keys())
-        keys_str = ",".join(keys)
-        
-        # Build header
-        lines = [f"[{count}]{{{keys_str}}}:"]
-        
-        # Add rows with comma-separated values
-        for item in json_data:
-            values = [format_value(item[key]) for key in keys]
-            lines.append(f"  {','.join(values)}")
-        
-        return "\n".join(lines)
-    
-    # General case: use path notation
-    def flatten_to_paths(obj, prefix=""):
-        """Flatten nested structure to path-value pairs"""
-        items = []
-        
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                current_path = f"{prefix}.{key}" if prefix else key
-                if isinstance(value, (dict, list)):
-                    items.extend(flatten_to_paths(value, current_path))
-                else:
-                    items.append((current_path, value))
-        
-        elif isinstance(obj, list):
-            for i, item in enumerate(obj):
-                current_path = f"{prefix}[{i}]" if prefix else f"[{i}]"
-                if isinstance(item, (dict, list)):
-                    items.extend(flatten_to_paths(item, current_path))
-                else:
-                    items.append((current_path, item))
-        
-        else:
-            # Primitive value at root
-            items.append(("", obj))
-        
-        return items
-    
-    # Flatten to path-value pairs
-    paths = flatten_to_paths(json_data)
-    
-    # Format as compact TOON
-    lines = []
-    for path, value in paths:
-        if path:
-            lines.append(f"{path}:{format_value(value)}")
-        else:
-            lines.append(format_value(value))
-    
-    return "\n".join(lines)
+    json_data = round_floats(json_data, precision)
+    output = io.StringIO()
+    write_toon(json_data, output, references=dedupe)
+    text = output.getvalue()
+    if key_aliases:
+        aliases = choose_key_aliases(json_data, references=dedupe)
+        if aliases:
+            output = io.StringIO()
+            write_toon(json_data, output, aliases=aliases, references=dedupe)
+            if _fewer_tokens(output.getvalue(), text):
+                return output.getvalue()
+    return text
+
+
+def _fewer_tokens(text: str, baseline: str) -> bool:
+    """Whether ``text`` takes fewer tokens than ``baseline`` (fewer characters without a tokenizer)"""
+    from token_counter import count_tokens
+    try:
+        return count_tokens(text) < count_tokens(baseline)
+    except Exception:
+        # tiktoken could not load an encoding (e.g. offline)
+        return len(text) < len(baseline)
 
 
 def toon_to_json(toon_text: str) -> Any:
@@ -105,263 +65,257 @@ def toon_to_json(toon_text: str) -> Any:
     Convert TOON format to JSON.
     Parses compact TOON format with dot notation, bracket notation, and array-of-objects format.
     """
-    lines = [line.rstrip() for line in toon_text.strip().split('\n') if line.strip()]
-    if not lines:
-        return {}
-    
-    def parse_value(value_str):
-        """Parse a simple value string"""
-        if not value_str:
-            return None
-        value_str = value_str.strip()
-        # Try to parse as number
-        try:
-            # Check if it's a float (has decimal point and is numeric)
-            if '.' in value_str and value_str.replace('.', '').replace('-', '').isdigit():
-                return float(value_str)
-            # Check if it's an integer
-            if value_str.replace('-', '').isdigit():
-                return int(value_str)
-        except ValueError:
-            pass
-        # Try boolean
-        if value_str.lower() == 'true':
-            return True
-        if value_str.lower() == 'false':
-            return False
-        # Try null
-        if value_str.lower() == 'none' or value_str.lower() == 'null':
-            return None
-        # Return as string
-        return value_str
+    reader = ToonReader(io.StringIO(toon_text), batch_size=TOON_ROW_BATCH)
+    if reader.fields is not None:
+        return list(reader)
     
-    # Check for array-of-objects format: [count]{keys}:
-    first_line = lines[0].strip()
-    if first_line.startswith('[') and ']{' in first_line and first_line.endswith(':'):
-        # Parse header: [count]{key1,key2,...}:
-        count_end = first_line.index(']')
-        count = int(first_line[1:count_end])
-        keys_start = first_line.index('{') + 1
-        keys_end = first_line.index('}')
-        keys = [k.strip() for k in first_line[keys_start:keys_end].split(',')]
-        
-        # Parse data rows (they start with spaces or are just comma-separated values)
-        result = []
-        for line in lines[1:]:
-            line_stripped = line.strip()
-            if line_stripped and not line_stripped.startswith('['):  # Skip other format lines
-                # Remove leading spaces if present, then split by comma
-                values = [v.strip() for v in line_stripped.split(',')]
-                if len(values) == len(keys):  # Only process if we have the right number of values
-                    obj = {}
-                    for i, key in enumerate(keys):
-                        if i < len(values):
-                            obj[key] = parse_value(values[i])
-                    result.append(obj)
-        
-        return result
-    
-    def set_nested_value(obj, path, value):
-        """Set a value in nested structure using path notation"""
-        parts = []
-        i = 0
-        
-        # Parse path (handle dots and brackets)
-        while i < len(path):
-            if path[i] == '[':
-                # Array index
-                i += 1
-                idx_end = path.index(']', i)
-                idx = int(path[i:idx_end])
-                parts.append(('array', idx))
-                i = idx_end + 1
-            elif path[i] == '.':
-                i += 1
+    assembler = PathAssembler()
+    if reader.references:
+        for path, value in reader:
+            if not path:
+                return value
+            if type(value) is Reference:
+                assembler.add_reference(path, value.target)
             else:
-                # Key name
-                key_end = i
-                while key_end < len(path) and path[key_end] not in '.[':
-                    key_end += 1
-                key = path[i:key_end]
-                if key:
-                    parts.append(('key', key))
-                i = key_end
-        
-        # Navigate/create structure
-        current = obj
-        for i, (part_type, part_value) in enumerate(parts[:-1]):
-            if part_type == 'key':
-                if part_value not in current:
-                    # Check if next part is array
-                    if i + 1 < len(parts) and parts[i + 1][0] == 'array':
-                        current[part_value] = []
-                    else:
-                        current[part_value] = {}
-                current = current[part_value]
-            elif part_type == 'array':
-                idx = part_value
-                while len(current) <= idx:
-                    # Check if next part is array
-                    if i + 1 < len(parts) and parts[i + 1][0] == 'array':
-                        current.append([])
-                    else:
-                        current.append({})
-                current = current[idx]
-        
-        # Set the value
-        if parts:
-            last_type, last_value = parts[-1]
-            if last_type == 'key':
-                current[last_value] = value
-            elif last_type == 'array':
-                idx = last_value
-                while len(current) <= idx:
-                    current.append(None)
-                current[idx] = value
-        else:
-            # Root level - return the value directly
-            return value
-    
-    # Check if it's a simple root value (no colon)
-    if len(lines) == 1 and ':' not in lines[0]:
-        return parse_value(lines[0])
-    
-    # Build structure from path-value pairs
-    result = {}
-    is_array_root = False
-    
-    for line in lines:
-        if ':' not in line:
+                assembler.add(path, value)
+        return assembler.result
+
+    for path, value in reader:
+        if not path:
             # Root value without path
-            return parse_value(line)
-        
-        path, value_str = line.split(':', 1)
-        value = parse_value(value_str)
-        
-        # Check if root is array
-        if path.startswith('['):
-            is_array_root = True
-            if not isinstance(result, list):
-                result = []
-        
-        if is_array_root and path.startswith('['):
-            # Root-level array
-            idx_end = path.index(']')
-            idx = int(path[1:idx_end])
-            remaining_path = path[idx_end + 1:]
-            
-            while len(result) <= idx:
-                result.append({} if remaining_path or isinstance(value, (dict, list)) else None)
-            
-            if remaining_path:
-                set_nested_value(result[idx], remaining_path, value)
-            else:
-                result[idx] = value
-        else:
-            # Object structure
-            set_nested_value(result, path, value)
+            return value
+        assembler.add(path, value)
     
-    return result
+    return assembler.result
 
 
-def json_to_csv(json_data: Any) -> str:
-    """Convert JSON to CSV format"""
+def json_to_csv(json_data: Any, precision: Optional[Precision] = None) -> str:
+    """
+    Convert JSON to CSV format, rounding floats to ``precision`` first.
+    Nested objects are spread over dotted columns (see ``csv_stream``).
+    """
+    json_data = round_floats(json_data, precision)
     output = io.StringIO()
-    
-    # Handle different JSON structures
-    if isinstance(json_data, list):
-        if not json_data:
-            return ""
-        
-        # If list of objects, use keys as headers
-        if isinstance(json_data[0], dict):
-            fieldnames = json_data[0].keys()
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in json_data:
-                writer.writerow(row)
-        else:
-            # Simple list - single column
-            writer = csv.writer(output)
-            writer.writerow(['value'])
-            for item in json_data:
-                writer.writerow([item])
-    elif isinstance(json_data, dict):
-        # Single object - use keys as headers
-        writer = csv.DictWriter(output, fieldnames=json_data.keys())
-        writer.writeheader()
-        writer.writerow(json_data)
-    else:
-        # Primitive value
-        writer = csv.writer(output)
-        writer.writerow(['value'])
-        writer.writerow([json_data])
-    
+    write_csv(_csv_rows(json_data), output)
     return output.getvalue()
 
 
+def _csv_rows(json_data: Any) -> list:
+    """Return the rows a document is written as in CSV"""
+    # A single object or value is one row
+    return json_data if isinstance(json_data, list) else [json_data]
+
+
+class _YamlItems:
+    """
+    The items of the root sequence of a YAML stream, rounded to
+    ``precision``, read from the start of the stream on every iteration
+    (``write_csv`` may go over its rows twice)
+    """
+
+    def __init__(self, src: TextIO, precision: Optional[Precision]):
+        self.src = src
+        self.precision = precision
+
+    def __iter__(self) -> Iterator[Any]:
+        self.src.seek(0)
+        return (round_floats(item, self.precision) for item in YamlReader(self.src))
+
+
 def csv_to_json(csv_text: str) -> Any:
     """Convert CSV to JSON"""
     if not csv_text.strip():
         return {}
-    
-    reader = csv.DictReader(io.StringIO(csv_text))
-    rows = list(reader)
-    
-    if not rows:
+    return _csv_document(iter_csv_rows(io.StringIO(csv_text)))
+
+
+def _csv_document(rows: Iterator[dict]) -> Any:
+    """Return the document for the rows of a CSV file"""
+    result = list(rows)
+    if not result:
         return {}
     
     # If only one row, return as object
-    if len(rows) == 1:
-        # Convert values appropriately
-        result = {}
-        for key, value in rows[0].items():
-            result[key] = parse_csv_value(value)
-        return result
+    if len(result) == 1:
+        return result[0]
     
     # Multiple rows - return as array of objects
-    result = []
-    for row in rows:
-        obj = {}
-        for key, value in row.items():
-            obj[key] = parse_csv_value(value)
-        result.append(obj)
-    
     return result
 
 
-def parse_csv_value(value: str) -> Any:
-    """Parse CSV value to appropriate type"""
-    if not value:
-        return None
-    # Try number
-    try:
-        if '.' in value:
-            return float(value)
-        return int(value)
-    except ValueError:
-        pass
-    # Try boolean
-    if value.lower() == 'true':
-        return True
-    if value.lower() == 'false':
+def _toon_cells(values: List[Any]) -> List[str]:
+    """Format a column of values the way the TOON encoder writes table cells"""
+    kinds = set(map(type, values))
+    if kinds == {str}:
+        return values
+    if kinds <= {str, int, float}:
+        return list(map(str, values))
+    return list(map(format_value, values))
+
+
+def transcode_csv_to_toon(src: TextIO, dst: TextIO) -> bool:
+    """
+    Write the CSV table read from ``src`` to ``dst`` as tabular TOON.
+
+    No row objects are built: cells are converted column by column in
+    batches of ``TOON_ROW_BATCH`` rows and written straight back out, so
+    memory use does not grow with the table. Since the TOON header starts
+    with the row count, ``src`` is read twice and must be seekable.
+
+    The output is identical to ``json_to_toon(csv_to_json(...))``. Returns
+    False, having written nothing, for CSV that does not decode to an array
+    of flat objects (fewer than two rows, ragged rows, repeated or dotted
+    column names) or whose names TOON would not write as a plain header.
+    """
+    start = src.tell()
+    reader = csv.reader(src)
+    fields, types = split_typed_fields(next(reader, []))
+    if not fields or len(set(fields)) != len(fields) or any(name.endswith('?') for name in fields):
+        return False
+    if column_nester(fields) is not None:
+        # Dotted columns decode to nested objects, which TOON may lay out differently
+        return False
+    width = len(fields)
+    count = 0
+    for row in reader:
+        if row:
+            if len(row) != width:
+                return False
+            count += 1
+    if count < 2:
         return False
-    return value
 
+    src.seek(start)
+    rows = filter(None, csv.reader(src))
+    next(rows)
+    dst.write(f"[{count}]{{{','.join(map(quote_column, fields))}}}:")
+    while True:
+        batch = list(islice(rows, TOON_ROW_BATCH))
+        if not batch:
+            return True
+        if types is None:
+            types = infer_column_types(batch, width)
+        cells = list(chain.from_iterable(batch))
+        columns = [
+            _toon_cells(convert_column(cells[i::width], type_name, parse_csv_value))
+            for i, type_name in enumerate(types)
+        ]
+        dst.write("\n  ")
+        dst.write("\n  ".join(map(",".join, zip(*columns))))
 
-def json_to_yaml(json_data: Any) -> str:
-    """Convert JSON to YAML format"""
-    return yaml.dump(json_data, default_flow_style=False, allow_unicode=True, sort_keys=False)
+
+def transcode_toon_to_csv(src: TextIO, dst: TextIO) -> bool:
+    """
+    Write the tabular TOON read from ``src`` to ``dst`` as CSV.
+
+    Like ``transcode_csv_to_toon``, rows are converted column by column in
+    batches and never become objects. The output is identical to
+    ``json_to_csv(toon_to_json(...))``. Returns False, having written
+    nothing, for path notation and for tables with optional, dotted or
+    repeated columns; ``src`` has been read from then.
+    """
+    reader = ToonReader(src)
+    fields = reader.fields
+    if not reader.flat or len(set(fields)) != len(fields):
+        return False
+    types = reader.types
+    width = len(fields)
+    writer = csv.writer(dst)
+    cells = reader.iter_cells()
+    batch = list(islice(cells, TOON_ROW_BATCH))
+    if batch:
+        writer.writerow(fields)
+    while batch:
+        if types is None:
+            types = infer_column_types(batch, width)
+        flat = list(chain.from_iterable(batch))
+        # csv writes None as an empty cell and other values with str()
+        writer.writerows(zip(*[convert_column(flat[i::width], t, parse_value) for i, t in enumerate(types)]))
+        batch = list(islice(cells, TOON_ROW_BATCH))
+    return True
+
+
+# Direct transcoders between tabular formats, by (source, target) format
+TRANSCODERS = {
+    ('csv', 'toon'): transcode_csv_to_toon,
+    ('toon', 'csv'): transcode_toon_to_csv,
+}
+
+
+def json_to_yaml(json_data: Any, precision: Optional[Precision] = None, dedupe: bool = False) -> str:
+    """
+    Convert JSON to YAML format, rounding floats to ``precision`` first.
+
+    With ``dedupe``, repeated subtrees become one object, which PyYAML
+    writes once with an anchor (``&id001``) and then as aliases (``*id001``).
+    """
+    json_data = round_floats(json_data, precision)
+    if dedupe:
+        json_data = share_subtrees(json_data)[0]
+    return dump_yaml(json_data)
 
 
 def yaml_to_json(yaml_text: str) -> Any:
     """Convert YAML to JSON"""
     if not yaml_text.strip():
         return {}
-    return yaml.safe_load(yaml_text)
+    return load_yaml(yaml_text)
+
+
+def parse_content(content: str, from_format: str) -> Any:
+    """Parse content in ``from_format`` ('json', 'toon', 'csv', 'yaml') to a document"""
+    if from_format == 'json':
+        return json.loads(content)
+    elif from_format == 'toon':
+        return toon_to_json(content)
+    elif from_format == 'csv':
+        return csv_to_json(content)
+    elif from_format == 'yaml':
+        return yaml_to_json(content)
+    else:
+        raise ValueError(f"Unknown source format: {from_format}")
+
 
+def encode_document(
+    json_data: Any,
+    to_format: str,
+    precision: Optional[Precision] = None,
+    key_aliases: bool = False,
+    dedupe: bool = False,
+) -> Dict[str, str]:
+    """
+    Encode a document in ``to_format`` ('json', 'toon', 'csv', 'yaml') or
+    in every format ('all'). Options are as for ``convert_format``.
+    """
+    # Round once for every target format
+    json_data = round_floats(json_data, precision)
+    
+    # Convert to all target formats
+    results = {}
+    
+    if to_format == 'all' or to_format == 'json':
+        results['json'] = json.dumps(json_data, indent=2, ensure_ascii=False)
+    
+    if to_format == 'all' or to_format == 'toon':
+        results['toon'] = json_to_toon(json_data, key_aliases=key_aliases, dedupe=dedupe)
+    
+    if to_format == 'all' or to_format == 'csv':
+        results['csv'] = json_to_csv(json_data)
+    
+    if to_format == 'all' or to_format == 'yaml':
+        results['yaml'] = json_to_yaml(json_data, dedupe=dedupe)
+    
+    return results
 
-def convert_format(content: str, from_format: str, to_format: str) -> Dict[str, str]:
+
+def convert_format(
+    content: str,
+    from_format: str,
+    to_format: str,
+    precision: Optional[Precision] = None,
+    key_aliases: bool = False,
+    dedupe: bool = False,
+) -> Dict[str, str]:
     """
     Convert content from one format to all other formats
     
@@ -369,39 +323,208 @@ def convert_format(content: str, from_format: str, to_format: str) -> Dict[str,
         content: The content to convert
         from_format: Source format ('json', 'toon', 'csv', 'yaml')
         to_format: Target format ('json', 'toon', 'csv', 'yaml') or 'all'
+        precision: Digits to round floats to, globally (int) or per key
+            (mapping); see ``float_precision``
+        key_aliases: Let TOON output alias long keys when that saves tokens
+        dedupe: Write repeated subtrees once in TOON (references) and YAML
+            (anchors and aliases)
     
     Returns:
         Dictionary with all format conversions
     """
-    # First, convert to JSON (intermediate format)
     try:
+        # Tables go straight from CSV to TOON and back
+        transcode = TRANSCODERS.get((from_format, to_format))
+        if transcode is not None and precision is None and not key_aliases:
+            output = io.StringIO()
+            if transcode(io.StringIO(content), output):
+                return {to_format: output.getvalue()}
+
+        # Otherwise, convert to JSON (intermediate format)
+        json_data = parse_content(content, from_format)
+        return encode_document(json_data, to_format, precision, key_aliases, dedupe)
+    
+    except Exception as e:
+        raise ValueError(f"Conversion error: {str(e)}")
+
+
+def convert_detected(
+    content: str,
+    detection: Detection,
+    from_format: str,
+    to_format: str = 'all',
+    precision: Optional[Precision] = None,
+    key_aliases: bool = False,
+    dedupe: bool = False,
+) -> Tuple[Dict[str, str], str, Any]:
+    """
+    Convert content that ``format_detector.detect`` has looked at.
+
+    The formats of ``candidate_formats`` are tried in order until one
+    converts. The document the detection parsed is used rather than parsing
+    the content again, so content is parsed once when it converts as what
+    was detected. Options are as for ``convert_format``.
+
+    Returns:
+        The conversions, the format the content was read as, and the
+        document before rounding
+    Raises:
+        ValueError: for the first candidate's error when none converts
+    """
+    error = None
+    for candidate in candidate_formats(detection, from_format):
+        try:
+            if detection.parsed and candidate == detection.format:
+                json_data = detection.document
+            else:
+                json_data = parse_content(content, candidate)
+            return encode_document(json_data, to_format, precision, key_aliases, dedupe), candidate, json_data
+        except Exception as e:
+            if error is None:
+                error = e
+    raise ValueError(f"Conversion error: {str(error)}")
+
+
+FORMATS = ('json', 'toon', 'csv', 'yaml')
+
+
+def _format_from_path(path: str) -> str:
+    """Guess a format name from a file extension"""
+    ext = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'yaml' if ext == 'yml' else ext
+
+
+def convert_file(
+    src_path: str,
+    dst_path: str,
+    from_format: str,
+    to_format: str,
+    precision: Optional[Precision] = None,
+    key_aliases: bool = False,
+    dedupe: bool = False,
+) -> None:
+    """
+    Convert a file on disk from one format to another.
+
+    TOON output is streamed straight into the destination file row by row, so
+    large payloads never exist as one in-memory string. Tables go straight
+    from CSV to TOON and back without building the document (see
+    ``TRANSCODERS``) unless floats are rounded or keys aliased. Floats are
+    rounded to ``precision`` when it is given. ``key_aliases`` is as for ``json_to_toon``;
+    choosing between both encodings means TOON is built in memory then.
+    ``dedupe`` is as for ``convert_format``. YAML is read from the file's
+    event stream (see ``yaml_stream``): the items of a root sequence are
+    loaded one by one, and go straight to CSV without the whole list (the
+    file is read twice when nested items must be checked for flattening).
+    """
+    transcode = TRANSCODERS.get((from_format, to_format))
+    if transcode is not None and precision is None and not key_aliases:
+        with open(src_path, 'r', encoding='utf-8') as src, open(dst_path, 'w', encoding='utf-8', newline='') as dst:
+            if transcode(src, dst):
+                return
+
+    with open(src_path, 'r', encoding='utf-8') as src:
         if from_format == 'json':
-            json_data = json.loads(content)
+            json_data = json.load(src)
         elif from_format == 'toon':
-            json_data = toon_to_json(content)
+            json_data = toon_to_json(src.read())
         elif from_format == 'csv':
-            json_data = csv_to_json(content)
+            json_data = _csv_document(iter_csv_rows(src))
         elif from_format == 'yaml':
-            json_data = yaml_to_json(content)
+            reader = YamlReader(src)
+            if reader.sequence and to_format == 'csv':
+                # Items go from the YAML file to CSV rows one at a time
+                with open(dst_path, 'w', encoding='utf-8', newline='') as dst:
+                    write_csv(_YamlItems(src, precision), dst)
+                return
+            json_data = {} if reader.empty else reader.load()
         else:
             raise ValueError(f"Unknown source format: {from_format}")
-        
-        # Convert to all target formats
-        results = {}
-        
-        if to_format == 'all' or to_format == 'json':
-            results['json'] = json.dumps(json_data, indent=2, ensure_ascii=False)
-        
-        if to_format == 'all' or to_format == 'toon':
-            results['toon'] = json_to_toon(json_data)
-        
-        if to_format == 'all' or to_format == 'csv':
-            results['csv'] = json_to_csv(json_data)
-        
-        if to_format == 'all' or to_format == 'yaml':
-            results['yaml'] = json_to_yaml(json_data)
-        
-        return results
-    
-    except Exception as e:
-        raise ValueError(f"Conversion error: {str(e)}")
+    json_data = round_floats(json_data, precision)
+
+    with open(dst_path, 'w', encoding='utf-8', newline='') as dst:
+        if to_format == 'json':
+            json.dump(json_data, dst, indent=2, ensure_ascii=False)
+        elif to_format == 'toon':
+            if key_aliases:
+                dst.write(json_to_toon(json_data, key_aliases=True, dedupe=dedupe))
+            else:
+                write_toon(json_data, dst, references=dedupe)
+        elif to_format == 'csv':
+            write_csv(_csv_rows(json_data), dst)
+        elif to_format == 'yaml':
+            if dedupe:
+                json_data = share_subtrees(json_data)[0]
+            dump_yaml(json_data, dst)
+        else:
+            raise ValueError(f"Unknown target format: {to_format}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Convert a file between JSON, TOON, CSV and YAML."
+    )
+    parser.add_argument("input", help="Path to the source file")
+    parser.add_argument("output", help="Path to write the converted file to")
+    parser.add_argument(
+        "--from",
+        dest="from_format",
+        choices=FORMATS,
+        help="Source format (default: taken from the input file extension)",
+    )
+    parser.add_argument(
+        "--to",
+        dest="to_format",
+        choices=FORMATS,
+        help="Target format (default: taken from the output file extension)",
+    )
+    parser.add_argument(
+        "--precision",
+        type=int,
+        help="Round floats to this many digits after the decimal point",
+    )
+    parser.add_argument(
+        "--column-precision",
+        metavar="KEY=DIGITS",
+        action="append",
+        default=[],
+        help="Round floats below KEY to DIGITS (repeatable; overrides --precision)",
+    )
+    parser.add_argument(
+        "--key-aliases",
+        action="store_true",
+        help="Alias long repeated keys in TOON output when that saves tokens",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Write repeated subtrees once (TOON references, YAML anchors)",
+    )
+    args = parser.parse_args(argv)
+
+    from_format = args.from_format or _format_from_path(args.input)
+    to_format = args.to_format or _format_from_path(args.output)
+    for fmt in (from_format, to_format):
+        if fmt not in FORMATS:
+            parser.error(f"Cannot infer format '{fmt}'; pass --from/--to explicitly.")
+
+    precision: Optional[Precision] = args.precision
+    if args.column_precision:
+        columns = {} if args.precision is None else {DEFAULT_KEY: args.precision}
+        for entry in args.column_precision:
+            key, sep, digits = entry.rpartition('=')
+            if not sep or not key or not digits.lstrip('-').isdigit():
+                parser.error(f"Invalid --column-precision '{entry}'; expected KEY=DIGITS.")
+            columns[key] = int(digits)
+        precision = columns
+
+    if args.key_aliases:
+        # Aliases are kept by token count: load the tokenizer while the input is read
+        from token_counter import warm_up
+        warm_up(background=True)
+    convert_file(args.input, args.output, from_format, to_format, precision, args.key_aliases, args.dedupe)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+"""
+Detection of repeated subtrees.
+
+Generated fleet data repeats whole objects (the same ``metadata`` block, the
+same ``tags`` list) thousands of times. ``share_subtrees`` hashes every
+container bottom-up and returns a copy in which equal subtrees are one and the
+same object. Encoders can then write each repeat as a reference to the first
+occurrence: PyYAML already emits anchors and aliases (``&id001`` /
+``*id001``) for objects it meets twice, and the TOON encoder writes
+``path=target`` lines.
+
+Equality is exact: values are compared with their types, so ``1``, ``1.0``
+and ``True`` never share a subtree, and dicts with the same items in a
+different order are different subtrees.
+"""
+from typing import Any, Dict, List, Set, Tuple
+
+# Subtrees with fewer scalar values than this are never shared: a reference
+# would cost about as much as the values it replaces
+MIN_SHARED_ITEMS = 3
+
+
+def _scalar_part(value: Any) -> tuple:
+    if type(value) is float and not value:
+        # 0.0 == -0.0, but they are written differently
+        return float, str(value)
+    return type(value), value
+
+
+def share_subtrees(data: Any, min_items: int = MIN_SHARED_ITEMS) -> Tuple[Any, Set[int]]:
+    """
+    Return a copy of ``data`` in which equal subtrees are the same object.
+
+    Only dicts and lists holding at least ``min_items`` scalars (counted
+    through all their levels) are shared; smaller ones are copied. Also
+    returns the ids of the objects in the copy that occur more than once.
+    ``data`` is not modified. Containers are hashed through small integer
+    ids of their children, so each one is hashed once and deep documents
+    need no recursion.
+    """
+    if not isinstance(data, (dict, list)):
+        return data, set()
+
+    # Containers in pre-order; walked backwards, children come before parents
+    order: List[Any] = []
+    stack = [data]
+    visited: Set[int] = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        order.append(node)
+        children = node.values() if isinstance(node, dict) else node
+        stack.extend(child for child in children if isinstance(child, (dict, list)))
+
+    signatures: Dict[tuple, int] = {}
+    canonical: Dict[int, Any] = {}
+    # id of an input container -> (signature id, copy, number of scalars)
+    built: Dict[int, Tuple[int, Any, int]] = {}
+    shared: Set[int] = set()
+    for node in reversed(order):
+        items = 0
+        parts = []
+        if isinstance(node, dict):
+            copy: Any = {}
+            for key, value in node.items():
+                if isinstance(value, (dict, list)):
+                    part, value, count = built[id(value)]
+                else:
+                    part, count = _scalar_part(value), 1
+                parts.append((key, part))
+                copy[key] = value
+                items += count
+            signature = (dict, tuple(parts))
+        else:
+            copy = []
+            for value in node:
+                if isinstance(value, (dict, list)):
+                    part, value, count = built[id(value)]
+                else:
+                    part, count = _scalar_part(value), 1
+                parts.append(part)
+                copy.append(value)
+                items += count
+            signature = (list, tuple(parts))
+
+        try:
+            signature_id = signatures.setdefault(signature, len(signatures))
+        except TypeError:
+            # An unhashable scalar (such as a set loaded from YAML): never shared
+            signature_id = signatures.setdefault((id(node),), len(signatures))
+        if items >= min_items:
+            first = canonical.setdefault(signature_id, copy)
+            if first is not copy:
+                copy = first
+                shared.add(id(first))
+        built[id(node)] = (signature_id, copy, items)
+    return built[id(data)][1], shared
@@ -0,0 +1,67 @@
+"""
+Test cases for per-column type inference
+"""
+from column_types import convert_column, decode_rows, infer_column_type, split_optional_fields, split_typed_fields
+from multi_converter import csv_to_json, parse_csv_value
+from toon_decoder import parse_value
+
+
+class TestInference:
+    """Test picking a type per column"""
+
+    def test_infers_majority_type(self):
+        """Test that a column is typed by what most of its cells look like"""
+        assert infer_column_type(["1", "-2", "null"]) == "int"
+        assert infer_column_type(["1.5", ".5", "2."]) == "float"
+        assert infer_column_type(["true", "False"]) == "bool"
+        assert infer_column_type(["srv-1", "node b"]) == "str"
+        assert infer_column_type(["1", "a", "true", ""]) == "any"
+
+    def test_typed_header_fields(self):
+        """Test that types are split off only when every field declares one"""
+        assert split_typed_fields(["id:int", "name:str"]) == (["id", "name"], ["int", "str"])
+        assert split_typed_fields(["id:int", "name"]) == (["id:int", "name"], None)
+        assert split_typed_fields(["time:utc"]) == (["time:utc"], None)
+
+
+class TestExactFallback:
+    """Test that typed conversion always matches the generic parsers"""
+
+    def test_cells_breaking_the_type(self):
+        """Test that cells which do not fit the column type are parsed generically"""
+        cells = ["1", "null", "2.5", "-", "1-2", "007", "x"]
+        for parse in (parse_value, parse_csv_value):
+            expected = [parse(cell) for cell in cells]
+            for type_name in ("int", "float", "bool", "str", "any"):
+                assert convert_column(cells, type_name, parse) == expected
+
+    def test_string_column_with_lookalikes(self):
+        """Test that numbers, keywords and padded cells in a string column are not kept verbatim"""
+        cells = ["alpha", "12", "None", " pad", "e5", "beta"]
+        assert convert_column(cells, "str", parse_value) == [parse_value(c) for c in cells]
+        assert convert_column(cells, "str", parse_csv_value) == [parse_csv_value(c) for c in cells]
+
+    def test_decode_rows(self):
+        """Test column-wise decoding into row dicts"""
+        rows = [["1", "a", "true"], ["2", "b", "false"]]
+        assert decode_rows(["id", "name", "ok"], rows, None, parse_value) == [
+            {"id": 1, "name": "a", "ok": True},
+            {"id": 2, "name": "b", "ok": False},
+        ]
+
+    def test_csv_typed_header(self):
+        """Test that a typed CSV header names the columns without the types"""
+        assert csv_to_json("id:int,name:str\n1,a\n2,b\n") == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+
+    def test_csv_ragged_rows_keep_dictreader_handling(self):
+        """Test that short rows still fill missing columns with None"""
+        assert csv_to_json("a,b\n1,2\n3\n") == [{"a": 1, "b": 2}, {"a": 3, "b": None}]
+
+
+class TestOptionalFields:
+    """Test optional column markers in headers"""
+
+    def test_split_optional_fields(self):
+        """Test that the ``?`` suffix is stripped and reported"""
+        assert split_optional_fields(["id", "email?", "phone?"]) == (["id", "email", "phone"], ["email", "phone"])
+        assert split_optional_fields(["id", "name"]) == (["id", "name"], [])
@@ -0,0 +1,102 @@
+"""
+Tests for the streaming CSV reader and writer
+"""
+import io
+import json
+import pytest
+from csv_stream import flatten_row, iter_csv_rows, write_csv
+from multi_converter import convert_file, convert_format, csv_to_json, json_to_csv
+
+
+class TestIterCsvRows:
+    """Test reading CSV row by row"""
+
+    def test_typed_values(self):
+        """Test that cells are converted like ``parse_csv_value`` and blank rows skipped"""
+        rows = iter_csv_rows(io.StringIO("id,load,ok,name\n1,0.5,true,a\n\n2,,FALSE,007x\n"))
+        assert list(rows) == [
+            {"id": 1, "load": 0.5, "ok": True, "name": "a"},
+            {"id": 2, "load": None, "ok": False, "name": "007x"},
+        ]
+
+    def test_rows_are_lazy(self):
+        """Test that rows are decoded one batch at a time"""
+        lines = iter(["a,b\n", "1,2\n", "3,4\n", "5,6\n"])
+        rows = iter_csv_rows(lines, batch_size=2)
+        assert next(rows) == {"a": 1, "b": 2}
+        assert next(lines) == "5,6\n"
+
+    def test_ragged_rows(self):
+        """Test that short rows are padded with None and long rows rejected"""
+        assert list(iter_csv_rows(["a,b", "1", "2,3"])) == [{"a": 1, "b": None}, {"a": 2, "b": 3}]
+        with pytest.raises(ValueError, match="3 cells"):
+            list(iter_csv_rows(["a,b", "1,2,3"]))
+
+    def test_dotted_columns(self):
+        """Test that dotted column names are rebuilt into nested objects"""
+        rows = iter_csv_rows(["id,m.cpu,m.net.in", "1,0.5,7"])
+        assert list(rows) == [{"id": 1, "m": {"cpu": 0.5, "net": {"in": 7}}}]
+        assert list(iter_csv_rows(["m,m.cpu", "1,2"])) == [{"m": 1, "m.cpu": 2}]
+
+
+class TestWriteCsv:
+    """Test writing CSV row by row"""
+
+    def test_flatten_row(self):
+        """Test that nested objects become dotted keys and odd objects stay values"""
+        row = {"id": 1, "m": {"cpu": 0.5, "net": {"in": 7}}, "e": {}, "k": {"a.b": 1}}
+        assert flatten_row(row) == {"id": 1, "m.cpu": 0.5, "m.net.in": 7, "e": {}, "k": {"a.b": 1}}
+        flat = {"id": 1}
+        assert flatten_row(flat) is flat
+
+    def test_rows_and_scalars(self):
+        """Test dict rows, scalar rows and no rows"""
+        output = io.StringIO()
+        write_csv(iter([{"id": 1, "m": {"cpu": 0.5}}, {"id": 2, "m": {"cpu": None}}]), output)
+        assert output.getvalue() == "id,m.cpu\r\n1,0.5\r\n2,\r\n"
+        output = io.StringIO()
+        write_csv([1, "a,b", True], output)
+        assert output.getvalue() == 'value\r\n1\r\n"a,b"\r\nTrue\r\n'
+        output = io.StringIO()
+        write_csv([], output)
+        assert output.getvalue() == ""
+
+    @pytest.mark.parametrize("rows, expected", [
+        ([{"m": {"a": 1}}, {"m": {"b": 2}}], "m\r\n{'a': 1}\r\n{'b': 2}\r\n"),
+        ([{"a": {"x": 1}}, {"a": None}], "a\r\n{'x': 1}\r\n\"\"\r\n"),
+        ([{"id": 1, "meta": {"k": "v"}}, {"id": 2, "meta": {}}], "id,meta\r\n1,{'k': 'v'}\r\n2,{}\r\n"),
+    ])
+    def test_rows_off_the_first_columns(self, rows, expected):
+        """Test that rows whose dotted keys differ from the first row's are not flattened"""
+        for source in (rows, iter(rows)):
+            output = io.StringIO()
+            write_csv(source, output)
+            assert output.getvalue() == expected
+        assert json_to_csv(rows) == expected
+        assert convert_format(json.dumps(rows), 'json', 'all')['csv'] == expected
+
+    def test_nested_round_trip(self):
+        """Test that nested records survive a CSV round trip"""
+        data = [{"id": i, "metrics": {"cpu": i / 4, "net": {"in": i, "out": None}}} for i in range(3)]
+        assert json_to_csv(data).splitlines()[0] == "id,metrics.cpu,metrics.net.in,metrics.net.out"
+        assert csv_to_json(json_to_csv(data)) == data
+
+    def test_convert_file(self, tmp_path):
+        """Test that files are converted to and from CSV through the streaming API"""
+        data = [{"id": i, "m": {"cpu": i / 2}} for i in range(3)]
+        src = tmp_path / "in.json"
+        src.write_text(json.dumps(data), encoding="utf-8")
+        convert_file(str(src), str(tmp_path / "out.csv"), 'json', 'csv')
+        assert (tmp_path / "out.csv").read_bytes() == b"id,m.cpu\r\n0,0.0\r\n1,0.5\r\n2,1.0\r\n"
+        convert_file(str(tmp_path / "out.csv"), str(tmp_path / "back.json"), 'csv', 'json')
+        assert json.loads((tmp_path / "back.json").read_text(encoding="utf-8")) == data
+
+    def test_convert_yaml_file(self, tmp_path):
+        """Test that YAML items are checked and written from the file in two passes"""
+        src = tmp_path / "in.yaml"
+        src.write_text("- {id: 1, m: {cpu: 0.5}}\n- {id: 2, m: {cpu: 1.5}}\n", encoding="utf-8")
+        convert_file(str(src), str(tmp_path / "out.csv"), 'yaml', 'csv')
+        assert (tmp_path / "out.csv").read_bytes() == b"id,m.cpu\r\n1,0.5\r\n2,1.5\r\n"
+        src.write_text("- {m: {a: 1}}\n- {m: {b: 2}}\n", encoding="utf-8")
+        convert_file(str(src), str(tmp_path / "out.csv"), 'yaml', 'csv')
+        assert (tmp_path / "out.csv").read_bytes() == b"m\r\n{'a': 1}\r\n{'b': 2}\r\n"
@@ -0,0 +1,82 @@
+"""
+Tests for float rounding before encoding
+"""
+import json
+import pytest
+from float_precision import precision_report, round_floats
+from multi_converter import convert_format, json_to_csv, json_to_toon, main
+
+
+class TestRoundFloats:
+    """Test global and per-key rounding"""
+
+    def test_global_precision(self):
+        """Test that every float is rounded and other values are kept"""
+        data = {"cpu": 12.3456, "count": 7, "ok": True, "name": "a", "load": [0.123456, -0.0001]}
+        assert round_floats(data, 2) == {"cpu": 12.35, "count": 7, "ok": True, "name": "a", "load": [0.12, 0.0]}
+        assert data["cpu"] == 12.3456
+
+    def test_per_key_precision(self):
+        """Test that the nearest listed key wins and ``*`` covers the rest"""
+        data = [{"health_score": 0.987654, "metrics": {"cpu": 1.23456, "net": {"in": 9.87654}}, "other": 5.55555}]
+        assert round_floats(data, {"metrics": 1, "net": 3}) == [
+            {"health_score": 0.987654, "metrics": {"cpu": 1.2, "net": {"in": 9.877}}, "other": 5.55555}
+        ]
+        assert round_floats(data, {"metrics": 1, "*": 2})[0]["other"] == 5.56
+
+    def test_none_returns_input(self):
+        """Test that no precision leaves the document untouched"""
+        data = {"a": 1.23456}
+        assert round_floats(data, None) is data
+        assert round_floats(1.23456, 2) == 1.23
+
+    def test_deep_nesting(self):
+        """Test that deep documents do not hit the recursion limit"""
+        data = node = {}
+        for _ in range(5000):
+            node["child"] = {"v": 1.23456}
+            node = node["child"]
+        rounded = round_floats(data, 1)
+        for _ in range(5000):
+            rounded = rounded["child"]
+        assert rounded == {"v": 1.2}
+
+
+class TestConversionPrecision:
+    """Test precision options of the converters"""
+
+    rows = [{"id": i, "cpu": i / 7, "metrics": {"ram": i / 3}} for i in range(1, 4)]
+
+    def test_encoders_round(self):
+        """Test that the TOON and CSV encoders write rounded floats"""
+        assert json_to_toon(self.rows, 1).splitlines()[1] == "  1,0.1,0.3"
+        assert json_to_csv([{"cpu": 1 / 3}], {"cpu": 3}).splitlines()[1] == "0.333"
+
+    def test_convert_format_rounds_all_targets(self):
+        """Test that every target format is rounded and reports bytes saved"""
+        content = json.dumps(self.rows)
+        results = convert_format(content, 'json', 'all', 2)
+        assert json.loads(results['json'])[0] == {"id": 1, "cpu": 0.14, "metrics": {"ram": 0.33}}
+        assert "0.14" in results['toon'] and "0.14" in results['yaml'] and "0.14" in results['csv']
+        report = precision_report(convert_format(content, 'json', 'all'), results)
+        assert set(report) == {'json', 'toon', 'csv', 'yaml'}
+        assert all(entry['bytes_saved'] > 0 for entry in report.values())
+        assert report['toon']['bytes_before'] - report['toon']['bytes_after'] == report['toon']['bytes_saved']
+
+    def test_report_reuses_rounded_tokens(self):
+        """Test that token counts the caller has for the rounded output are not counted again"""
+        content = json.dumps(self.rows)
+        results = convert_format(content, 'json', 'all', 2)
+        counted = dict.fromkeys(results, 7)
+        report = precision_report(convert_format(content, 'json', 'all'), results, counted)
+        assert all(entry['tokens_after'] == 7 for entry in report.values())
+
+    def test_command_line(self, tmp_path):
+        """Test the ``--precision`` and ``--column-precision`` options"""
+        src = tmp_path / "in.json"
+        src.write_text(json.dumps(self.rows))
+        dst = tmp_path / "out.json"
+        assert main([str(src), str(dst), "--precision", "1", "--column-precision", "cpu=3"]) == 0
+        assert json.loads(dst.read_text())[0] == {"id": 1, "cpu": 0.143, "metrics": {"ram": 0.3}}
+        with pytest.raises(SystemExit):
+            main([str(src), str(dst), "--column-precision", "cpu"])
@@ -0,0 +1,120 @@
+"""
+Tests for format detection and detection-driven conversion
+"""
+import json
+import pytest
+import format_detector
+import multi_converter
+from format_detector import Detection, candidate_formats, classify_sample, detect, detect_format
+from multi_converter import convert_detected, convert_format, json_to_csv, json_to_toon, json_to_yaml
+
+
+class TestDetect:
+    """Test detecting formats and keeping what was parsed"""
+
+    def test_formats(self):
+        """Test that each format is detected, with the document when it was parsed"""
+        assert detect('{"a": [1, 2]}') == Detection('json', 1.0, True, {"a": [1, 2]})
+        assert detect("[2]{id,name}:\n  1,a\n  2,b") == Detection('toon', 0.95)
+        assert detect("id,name\n1,a\n2,b") == Detection('csv', 0.7)
+        assert detect("- id: 1\n  name: a\n") == Detection('yaml', 0.9, True, [{"id": 1, "name": "a"}])
+        assert detect("   ") == Detection('unknown', 0.0)
+
+    def test_parsed_null(self):
+        """Test that a document parsed to None is told apart from no document"""
+        detection = detect("null")
+        assert detection.parsed and detection.document is None
+        assert detect_format("null") == 'json'
+
+    def test_yaml_as_safe_load(self):
+        """Test that YAML is detected, and parsed, as yaml.safe_load reads it"""
+        text = "a: 1\n\ufeffb: 2\n"
+        assert detect(text) == Detection('yaml', 0.8, True, {"a": 1, "\ufeffb": 2})
+        assert not format_detector.is_yaml("key: 1\t")
+
+    def test_candidate_formats(self):
+        """Test that a mismatched detection is tried before the requested format"""
+        assert candidate_formats(detect("id,name\n1,a\n2,b"), 'json') == ['csv', 'json']
+        assert candidate_formats(detect('{"a": 1}'), 'json') == ['json']
+        assert candidate_formats(detect(""), 'yaml') == ['yaml']
+
+
+class TestSampledDetect:
+    """Test classifying long content from a prefix"""
+
+    RECORDS = [{"id": i, "name": f"node {i}", "tags": "a,b", "load": i / 3} for i in range(40)]
+
+    @pytest.fixture(autouse=True)
+    def small_sample(self, monkeypatch):
+        monkeypatch.setattr(format_detector, 'SAMPLE_SIZE', 256)
+
+    def test_formats_unparsed(self):
+        """Test that each format is told from the sample, without parsing"""
+        encoders = {
+            'json': lambda data: json.dumps(data, indent=2),
+            'toon': json_to_toon,
+            'csv': json_to_csv,
+            'yaml': json_to_yaml,
+        }
+        for name, encode in encoders.items():
+            text = encode(self.RECORDS)
+            assert len(text) > 256
+            detection = detect(text)
+            assert (detection.format, detection.parsed) == (name, False)
+            assert detection.confidence >= format_detector.CONFIDENT
+        assert detect(json_to_toon({"servers": self.RECORDS})).format == 'toon'
+        assert detect("name:John\naddress.city:NY\n" * 20).format == 'toon'
+
+    def test_first_lines_before_scan(self, monkeypatch):
+        """Test that TOON and CSV are told from their first lines without the lexical scan"""
+        monkeypatch.setattr(format_detector, 'classify_sample', None)
+        assert detect(json_to_toon(self.RECORDS)) == Detection('toon', 0.95)
+        assert detect(json_to_toon({"servers": self.RECORDS}).replace("servers[", "[0].servers[")).format == 'toon'
+        assert detect("id,load\n" + "1,0.5\n" * 100) == Detection('csv', 0.7)
+
+    def test_json_before_first_lines(self):
+        """Test that JSON whose first line reads as TOON is still detected as JSON"""
+        for data in ({"version": "1.0", "rows": self.RECORDS}, ["a:b.c"] * 40):
+            text = json.dumps(data, indent=1).replace("{\n ", "{", 1).replace("[\n ", "[", 1)
+            assert detect(text).format == 'json'
+
+    def test_classify_sample(self):
+        """Test the signals the lexical scan reads"""
+        assert classify_sample('{"a": "}"}') == Detection('json', 0.9)
+        assert classify_sample('[1, {"a": 2]}').confidence < format_detector.CONFIDENT
+        assert classify_sample('a,b\n"1,2",3\n4,5') == Detection('csv', 0.9)
+        assert classify_sample('a,b\n1\n2\n3').confidence < format_detector.CONFIDENT
+        assert classify_sample('name: John\naddress:\n  city: NY') == Detection('yaml', 0.85)
+        assert classify_sample('import os\nprint(os)') == Detection('unknown', 0.0)
+
+    def test_low_confidence_checks_whole(self):
+        """Test that an inconclusive sample falls back to checking the whole content"""
+        text = "a,b\n1,2\n" + "3\n" * 200
+        assert detect(text) == Detection('csv', 0.7)
+
+
+class TestConvertDetected:
+    """Test converting content with the help of its detection"""
+
+    def test_parsed_once(self, monkeypatch):
+        """Test that content parsed by the detection is not parsed again"""
+        calls = []
+        parse = multi_converter.parse_content
+        monkeypatch.setattr(multi_converter, 'parse_content', lambda *args: calls.append(args) or parse(*args))
+        content = "- id: 1\n  load: 0.123\n- id: 2\n  load: 0.5\n"
+        results, source, document = convert_detected(content, detect(content), 'json', precision=1)
+        assert calls == []
+        assert (source, document) == ('yaml', [{"id": 1, "load": 0.123}, {"id": 2, "load": 0.5}])
+        assert results == convert_format(content, 'yaml', 'all', precision=1)
+
+    def test_falls_back_to_requested(self):
+        """Test that the requested format is tried when the detected one fails"""
+        detection = Detection('xml', 0.5)
+        results, source, document = convert_detected('{"a": 1}', detection, 'json', 'json')
+        assert (source, document) == ('json', {"a": 1})
+        assert results == {'json': '{\n  "a": 1\n}'}
+
+    def test_first_error(self):
+        """Test that the first candidate's error is raised when none converts"""
+        with pytest.raises(ValueError, match="Conversion error: Unknown source format: xml"):
+            convert_detected("a", Detection('xml', 0.5), 'json')
@@ -0,0 +1,82 @@
+"""
+Tests for sharing repeated subtrees
+"""
+import json
+import yaml
+from multi_converter import convert_format, json_to_toon, json_to_yaml, toon_to_json
+from shared_subtrees import share_subtrees
+
+
+TAGS = {"env": "prod", "team": "core", "tier": "gold"}
+
+
+class TestShareSubtrees:
+    """Test detection of equal subtrees"""
+
+    def test_equal_subtrees_become_one_object(self):
+        """Test that equal containers are shared and the input is untouched"""
+        data = [{"tags": dict(TAGS), "id": i} for i in range(3)]
+        shared_data, shared = share_subtrees(data)
+        assert shared_data == data
+        assert shared_data[0]["tags"] is shared_data[1]["tags"] is shared_data[2]["tags"]
+        assert shared == {id(shared_data[0]["tags"])}
+        assert data[0]["tags"] is not data[1]["tags"]
+
+    def test_types_and_order_matter(self):
+        """Test that 1, 1.0 and True, 0.0 and -0.0, and key order are told apart"""
+        variants = [[1, 2, 3], [1.0, 2, 3], [True, 2, 3], [0.0, 2, 3], [-0.0, 2, 3]]
+        shared_data, shared = share_subtrees({"a": variants, "b": [list(v) for v in variants] + [[4, 5, 6]]})
+        assert len(shared) == 5
+        assert [type(v[0]) for v in shared_data["b"][:5]] == [int, float, bool, float, float]
+        assert str(shared_data["b"][4][0]) == "-0.0"
+        _, shared = share_subtrees([{"a": 1, "b": 2, "c": 3}, {"c": 3, "b": 2, "a": 1}])
+        assert not shared
+
+    def test_small_subtrees_are_not_shared(self):
+        """Test that containers below ``min_items`` scalars are copied"""
+        shared_data, shared = share_subtrees([[1, 2], [1, 2]])
+        assert not shared and shared_data[0] is not shared_data[1]
+        assert share_subtrees([[1, 2], [1, 2]], min_items=2)[1]
+
+    def test_deep_nesting(self):
+        """Test that deep documents do not hit the recursion limit"""
+        data = node = {}
+        for _ in range(5000):
+            node["child"] = {"v": 1, "w": 2, "x": 3}
+            node = node["child"]
+        shared_data, shared = share_subtrees(data)
+        assert not shared
+        for _ in range(5000):
+            shared_data = shared_data["child"]
+        assert shared_data == {"v": 1, "w": 2, "x": 3}
+
+
+class TestDedupeConversion:
+    """Test the ``dedupe`` option of the converters"""
+
+    data = {"a": {"tags": TAGS, "x": 1}, "b": {"tags": dict(TAGS), "x": 2}}
+
+    def test_toon_references(self):
+        """Test that TOON writes a repeat as a reference and decodes it back"""
+        text = json_to_toon(self.data, dedupe=True)
+        assert text.splitlines()[0] == "@refs"
+        assert "b.tags=a.tags" in text.splitlines()
+        assert toon_to_json(text) == self.data
+        assert "@refs" not in json_to_toon(self.data)
+        rows = [{"id": i, "tags": dict(TAGS)} for i in range(3)]
+        assert json_to_toon(rows, dedupe=True) == json_to_toon(rows)
+
+    def test_yaml_anchors(self):
+        """Test that YAML writes a repeat as an anchor and an alias"""
+        text = json_to_yaml(self.data, dedupe=True)
+        assert "&id001" in text and "*id001" in text
+        assert yaml.safe_load(text) == self.data
+
+    def test_convert_format(self):
+        """Test that deduplicated output is smaller and decodes to the input"""
+        data = [{"id": i, "tags": dict(TAGS)} for i in range(20)]
+        plain = convert_format(json.dumps(data), 'json', 'all')
+        deduped = convert_format(json.dumps(data), 'json', 'all', dedupe=True)
+        assert len(deduped['yaml']) < len(plain['yaml'])
+        assert deduped['json'] == plain['json']
+        assert toon_to_json(deduped['toon']) == data
@@ -0,0 +1,205 @@
+"""
+Tests for the tokenizer registry and batch token counting
+"""
+import threading
+import pytest
+import tiktoken
+import token_counter
+from token_counter import (
+    count_tokens,
+    count_tokens_batch,
+    count_tokens_for_formats,
+    encoder_metrics,
+    encoding_for_model,
+    chunk_boundary,
+    get_encoding,
+    LineTokenCounter,
+    split_chunks,
+    warm_up,
+)
+
+# The split pattern of cl100k_base
+CL100K_PATTERN = (
+    r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*"""
+    r"""|\s*[\r\n]+|\s+(?!\S)|\s+"""
+)
+# The split pattern of gpt2, r50k_base and p50k_base
+GPT2_PATTERN = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+
+
+def small_encoding(pattern=CL100K_PATTERN):
+    """A byte-level BPE with the given split pattern and merges that span line breaks"""
+    ranks = {bytes([i]): i for i in range(256)}
+    for merged in (b"\n\n", b"  ", b"}\n", b" \n", b"ab", b"abc", b"  \n"):
+        ranks[merged] = len(ranks)
+    return tiktoken.Encoding("small", pat_str=pattern, mergeable_ranks=ranks, special_tokens={})
+
+
+class FakeEncoding:
+    """Encoding with one token per word"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def encode(self, text):
+        return text.split()
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Start from an empty registry and record the encodings tiktoken is asked to load"""
+    calls = []
+
+    def load(name):
+        calls.append(name)
+        return FakeEncoding(name)
+
+    for cache in ('_encodings', '_model_encodings', '_load_seconds'):
+        monkeypatch.setattr(token_counter, cache, {})
+    monkeypatch.setattr(tiktoken, 'get_encoding', load)
+    return calls
+
+
+class TestRegistry:
+    """Test that encodings are loaded once per process"""
+
+    def test_loaded_once(self, loads):
+        """Test that encodings are memoized by name and by model"""
+        assert count_tokens("a b c") == 3
+        assert count_tokens("a b", "gpt-4") == 2
+        assert get_encoding("cl100k_base") is encoding_for_model("gpt-4")
+        assert loads == ["cl100k_base"]
+
+    def test_unknown_model(self, loads):
+        """Test that models tiktoken does not know use the fallback encoding"""
+        assert encoding_for_model("no-such-model").name == token_counter.FALLBACK_ENCODING
+        assert encoding_for_model("gpt2").name == "gpt2"
+
+    def test_failed_load_retried(self, loads, monkeypatch):
+        """Test that an encoding that failed to load is loaded by the next call"""
+        def offline(name):
+            raise ConnectionError(name)
+        monkeypatch.setattr(tiktoken, 'get_encoding', offline)
+        with pytest.raises(ConnectionError):
+            get_encoding("cl100k_base")
+        warm_up()
+        assert encoder_metrics() == {}
+
+    def test_warm_up(self, loads):
+        """Test warming up in the foreground and in a background thread, with metrics"""
+        warm_up(["gpt-4", "text-davinci-003"])
+        assert sorted(loads) == ["cl100k_base", "p50k_base"]
+        assert set(encoder_metrics()) == {"cl100k_base", "p50k_base"}
+        assert encoder_metrics()["cl100k_base"]["load_seconds"] >= 0
+        warm_up(["gpt2"], background=True)
+        for thread in threading.enumerate():
+            if thread.name == "tokenizer-warm-up":
+                thread.join()
+        assert "gpt2" in encoder_metrics()
+        assert len(loads) == 3
+
+
+class TestBatch:
+    """Test that batch counting matches counting each text whole"""
+
+    TEXTS = [
+        "",
+        "abc ab\n\n  abc}\n\n\nx",
+        "".join(f"row{i}: abc, ab  \n{'  ' * (i % 3)}}}\n\nabc\n\n" for i in range(300)),
+        "ab" * 5000,
+        "".join(f"ab{i} \ncd\nx  \n  y\r\n" for i in range(300)),
+    ]
+
+    @pytest.fixture(autouse=True, params=[CL100K_PATTERN, GPT2_PATTERN], ids=["cl100k", "gpt2"])
+    def small(self, request, monkeypatch):
+        encoding = small_encoding(request.param)
+        monkeypatch.setattr(token_counter, 'encoding_for_model', lambda model=None: encoding)
+        monkeypatch.setattr(token_counter, 'TOKEN_CHUNK_CHARS', 50)
+        monkeypatch.setattr(token_counter, 'PARALLEL_MIN_CHARS', 0)
+        monkeypatch.setattr(token_counter, '_line_counters', {})
+        return encoding
+
+    def test_split_chunks(self, small):
+        """Test that chunks cover the text and end before text that starts a line"""
+        boundary = chunk_boundary(small)
+        for text in self.TEXTS[2:]:
+            chunks = split_chunks(text, 50, boundary)
+            assert "".join(chunks) == text
+            assert sum(len(small.encode(chunk)) for chunk in chunks) == len(small.encode(text))
+            for chunk in chunks[:-1]:
+                assert chunk.endswith("\n") and len(chunk) >= 50
+        # Only encodings that take whitespace before a line break first split after trailing spaces
+        count = len(split_chunks(self.TEXTS[2], 50, boundary))
+        assert (count == 1) if small._pat_str == GPT2_PATTERN else (count > 10)
+        assert len(split_chunks(self.TEXTS[4], 50, boundary)) > 10
+        assert split_chunks(self.TEXTS[3], 50, boundary) == [self.TEXTS[3]]
+
+    def test_strict_boundary(self, small):
+        """Test that the default boundary needs text on both sides of the line break"""
+        text = "ab \ncd\nx"
+        assert split_chunks(text, 1) == ["ab \ncd\n", "x"]
+        assert len(small.encode("ab \ncd\n")) + len(small.encode("x")) == len(small.encode(text))
+
+    def test_counts_match(self, small):
+        """Test that chunked, threaded counts equal whole-text counts"""
+        expected = [len(small.encode(text)) for text in self.TEXTS]
+        assert count_tokens_batch(self.TEXTS, num_threads=4) == expected
+        assert count_tokens_batch(self.TEXTS[2:3]) == expected[2:3]
+        assert count_tokens_batch([]) == []
+
+    def test_formats(self, small):
+        """Test that formats are counted together and empty ones count 0"""
+        formats = {"json": self.TEXTS[1], "toon": "", "csv": self.TEXTS[2]}
+        assert count_tokens_for_formats(formats) == {
+            "json": len(small.encode(self.TEXTS[1])),
+            "toon": 0,
+            "csv": len(small.encode(self.TEXTS[2])),
+        }
+
+
+class TestLineTokenCounter:
+    """Test counting tokens with cached per-line counts"""
+
+    TEXT = "".join(f"id{i}: ab  \n  abc, {i % 7}}}\n\n\r\nab \ncd\n" for i in range(200))
+
+    @pytest.fixture(params=[CL100K_PATTERN, GPT2_PATTERN], ids=["cl100k", "gpt2"])
+    def small(self, request, monkeypatch):
+        encoding = small_encoding(request.param)
+        monkeypatch.setattr(token_counter, 'encoding_for_model', lambda model=None: encoding)
+        return encoding
+
+    def test_counts_match(self, small):
+        """Test that totals equal whole-text counts, cached or not"""
+        counter = LineTokenCounter()
+        texts = [self.TEXT, "", " \n\n", "ab \n", self.TEXT[:777], TestBatch.TEXTS[2]]
+        expected = [len(small.encode(text)) for text in texts]
+        assert counter.count_batch(texts) == expected
+        assert counter.count_batch(texts[::-1]) == expected[::-1]
+        assert counter.hits > 0
+
+    def test_edit_one_line(self, small):
+        """Test that changing one line re-encodes only the segments around it"""
+        counter = LineTokenCounter()
+        counter.count(self.TEXT)
+        misses = counter.misses
+        edited = self.TEXT.replace("id100:", "id100x:")
+        assert counter.count(edited) == len(small.encode(edited))
+        assert 1 <= counter.misses - misses <= 2
+
+    def test_eviction(self, small):
+        """Test that the cache keeps at most ``maxsize`` segments, least recently used first out"""
+        counter = LineTokenCounter(maxsize=3)
+        assert counter.count("a\nb\nc\nd\n") == len(small.encode("a\nb\nc\nd\n"))
+        assert len(counter._counts) == 3
+        counter.count("d\n")
+        assert counter.hits == 1
+        counter.count("a\n")
+        assert counter.hits == 1 and len(counter._counts) == 3
+
+    def test_keys_are_digests(self, small):
+        """Test that the cache keeps a fixed-size digest of each segment, not its text"""
+        counter = LineTokenCounter()
+        text = "x" * 100_000 + "\n" + "y\n"
+        assert counter.count(text) == len(small.encode(text))
+        assert counter.count(text) == len(small.encode(text)) and counter.hits == 2
+        assert all(type(key) is bytes and len(key) == 16 for key in counter._counts)
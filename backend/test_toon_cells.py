@@ -0,0 +1,76 @@
+"""
+Test cases for the shared TOON cell tokenizer and literal decoder
+"""
+import ast
+import pytest
+from toon_cells import parse_literal, split_top_level
+
+
+class TestSplitTopLevel:
+    """Test that commas only split at top level"""
+
+    def test_plain_row(self):
+        """Test a row without brackets or quotes"""
+        assert split_top_level("srv-1, 10 ,ok") == ["srv-1", "10", "ok"]
+
+    def test_brackets_and_quotes_are_kept_together(self):
+        """Test that commas inside dicts, lists, tuples and quotes do not split"""
+        line = "a,{'x': 1, 'y': [2, 3]},(4, 5),'p, q',\"r, s\""
+        assert split_top_level(line) == ["a", "{'x': 1, 'y': [2, 3]}", "(4, 5)", "'p, q'", '"r, s"']
+
+    def test_trailing_comma_is_dropped(self):
+        """Test that a line ending in a comma has no empty last cell"""
+        assert split_top_level("1,[2],") == ["1", "[2]"]
+
+    def test_empty_cells_in_the_middle_are_kept(self):
+        """Test that consecutive commas produce empty cells"""
+        assert split_top_level("1,,{}") == ["1", "", "{}"]
+
+    def test_unterminated_quote_swallows_the_rest(self):
+        """Test that nothing after an unmatched quote is split"""
+        assert split_top_level("a,'b,c") == ["a", "'b,c"]
+
+    def test_unbalanced_brackets(self):
+        """Test that unmatched closers are ignored and unclosed openers swallow the rest"""
+        assert split_top_level("a],b") == ["a]", "b"]
+        assert split_top_level("{a,b") == ["{a,b"]
+
+    def test_deep_nesting(self):
+        """Test nesting deeper than the single-regex fast path"""
+        assert split_top_level("[[[[[1, 2]]]]],x") == ["[[[[[1, 2]]]]]", "x"]
+
+    def test_empty_line(self):
+        """Test that an empty line has no cells"""
+        assert split_top_level("") == []
+
+
+class TestParseLiteral:
+    """Test the literal_eval replacement used for metrics / tags cells"""
+
+    def test_matches_literal_eval(self):
+        """Test dicts, lists, numbers, strings and keywords"""
+        for text in [
+            "{'cpu': 44.3, 'net': {'in': 720.17, 'conns': 47125}}",
+            "['eu-central-1', \"it's\", 'monitoring-enabled']",
+            "[True, False, None, -0, 1e3]",
+            "{'True': 'None of these are keywords'}",
+        ]:
+            assert parse_literal(text) == ast.literal_eval(text)
+
+    def test_falls_back_for_non_json_literals(self):
+        """Test tuples, sets, int keys and escapes"""
+        for text in ["(1, 2)", "{1, 2}", "{1: 'a'}", "'a\\nb'", "[1, 2,]"]:
+            value = parse_literal(text)
+            assert value == ast.literal_eval(text)
+            assert type(value) is type(ast.literal_eval(text))
+
+    def test_invalid_literal_raises_like_literal_eval(self):
+        """Test that names are rejected, including JSON spellings"""
+        with pytest.raises(ValueError):
+            parse_literal("[true]")
+
+    def test_cached_results_are_independent(self):
+        """Test that mutating one result does not affect the next"""
+        first = parse_literal("{'tags': ['a', 'b']}")
+        first['tags'].append('c')
+        assert parse_literal("{'tags': ['a', 'b']}") == {'tags': ['a', 'b']}
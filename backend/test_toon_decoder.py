@@ -0,0 +1,154 @@
+"""
+Test cases for the incremental TOON decoder
+"""
+import io
+import pytest
+from multi_converter import toon_to_json
+from toon_paths import Reference
+from toon_decoder import ToonReader, iter_toon, iter_toon_rows, parse_dotted_leaves
+
+
+TABULAR = "[3]{id,name,score}:\n  1,Alice,9.5\n  2,Bob,7\n  3,Carol,null\n"
+
+
+class TestIncrementalDecoder:
+    """Test row and event streaming from different sources"""
+
+    def test_rows_from_text_stream(self):
+        """Test that a tabular document yields one dict per row"""
+        rows = list(iter_toon(io.StringIO(TABULAR)))
+        assert rows == [
+            {"id": 1, "name": "Alice", "score": 9.5},
+            {"id": 2, "name": "Bob", "score": 7},
+            {"id": 3, "name": "Carol", "score": None},
+        ]
+
+    def test_rows_from_path(self, tmp_path):
+        """Test reading straight from a file path"""
+        path = tmp_path / "data.toon"
+        path.write_text(TABULAR, encoding="utf-8")
+        assert [row["name"] for row in iter_toon_rows(str(path))] == ["Alice", "Bob", "Carol"]
+
+    def test_rows_are_lazy(self):
+        """Test that rows are decoded as lines are consumed"""
+        lines = iter(["[2]{n}:", "  1", "  2"])
+        rows = iter_toon(lines)
+        assert next(rows) == {"n": 1}
+        assert list(lines) == ["  2"]
+
+    def test_path_events(self):
+        """Test that path notation yields (path, value) events"""
+        events = list(iter_toon(["user.name:Alice", "user.tags[0]:a", "active:true"]))
+        assert events == [("user.name", "Alice"), ("user.tags[0]", "a"), ("active", True)]
+
+    def test_nested_block_events(self):
+        """Test that rows of a nested block are reported as one event per row"""
+        lines = ["id:1", "disks[2]{type,gb}:", "  SSD,512", "", "  HDD,4000", "ok:true"]
+        assert list(iter_toon(lines)) == [
+            ("id", 1),
+            ("disks[0]", {"type": "SSD", "gb": 512}),
+            ("disks[1]", {"type": "HDD", "gb": 4000}),
+            ("ok", True),
+        ]
+
+    def test_nested_block_under_root_array(self):
+        """Test that a block path starting with an index is not taken for a root table"""
+        text = "[0].disks[2]{gb}:\n  1\n  2\n[1]:x"
+        assert toon_to_json(text) == [{"disks": [{"gb": 1}, {"gb": 2}]}, "x"]
+
+    def test_inline_array_events(self):
+        """Test that an inline array is one event and indexed lines stay element lines"""
+        events = list(iter_toon(["tags[]:a,b,7", "ids[2]: 1", "name:x"]))
+        assert events == [("tags", ["a", "b", 7]), ("ids[2]", 1), ("name", "x")]
+        assert toon_to_json("name: web\ntags[0]: a\ntags[1]: b") == {"name": "web", "tags": ["a", "b"]}
+        assert toon_to_json("a[0]:x\na[1]: lead") == {"a": ["x", "lead"]}
+
+    def test_key_aliases(self):
+        """Test that aliases are expanded in headers and paths but not in values"""
+        text = "@keys{a=network_traffic,b=active_connections}\na.b:a\na.hosts[2]{b,id}:\n  1,a\n  2,b"
+        assert toon_to_json(text) == {
+            "network_traffic": {"active_connections": "a", "hosts": [{"active_connections": 1, "id": "a"},
+                                                                     {"active_connections": 2, "id": "b"}]}
+        }
+        reader = ToonReader(["@keys{a=network_traffic}", "[1]{id:int,a.in:int}:", "  1,7"])
+        assert reader.fields == ["id", "network_traffic.in"]
+        assert list(reader) == [{"id": 1, "network_traffic": {"in": 7}}]
+
+    def test_lone_key_alias_line_is_a_value(self):
+        """Test that an ``@keys`` line without anything after it is a bare root value"""
+        assert toon_to_json("@keys{a=b}") == "@keys{a=b}"
+
+    def test_references(self):
+        """Test that ``@refs`` turns colon-less lines into references to earlier paths"""
+        events = list(iter_toon(["@refs", "a.x:1", "b=a", "c:d=e"]))
+        assert events == [("a.x", 1), ("b", Reference("a")), ("c", "d=e")]
+        result = toon_to_json("@keys{t=tags}\n@refs\na.t.env:prod\nb.t=a.t")
+        assert result == {"a": {"tags": {"env": "prod"}}, "b": {"tags": {"env": "prod"}}}
+        assert result["b"]["tags"] is result["a"]["tags"]
+        assert toon_to_json("@refs") == "@refs"
+        assert toon_to_json("a=b") == "a=b"
+
+    def test_optional_columns(self):
+        """Test that absent cells drop the key while null keeps it"""
+        reader = ToonReader(["[3]{id,email?}:", "  1,a@x.io", "  2,~", "  3,null"])
+        assert reader.fields == ["id", "email"]
+        assert list(reader) == [{"id": 1, "email": "a@x.io"}, {"id": 2}, {"id": 3, "email": None}]
+
+    def test_absent_marker_only_in_optional_columns(self):
+        """Test that the marker is a plain string in a required column"""
+        assert toon_to_json("[1]{a,b?}:\n  ~,~") == [{"a": "~"}]
+
+    def test_reader_exposes_header(self):
+        """Test that the reader reports the declared count and fields"""
+        reader = ToonReader(io.StringIO(TABULAR))
+        assert reader.count == 3
+        assert reader.fields == ["id", "name", "score"]
+
+    def test_typed_header(self):
+        """Test that declared column types are stripped from the field names"""
+        reader = ToonReader(["[2]{id:int,name:str}:", "  1,Alice", "  2,7"])
+        assert reader.types == ["int", "str"]
+        assert list(reader) == [{"id": 1, "name": "Alice"}, {"id": 2, "name": 7}]
+
+    def test_batches_match_row_by_row(self):
+        """Test that column-wise batches decode exactly like single rows"""
+        lines = ["[5]{a,b}:", "  1,x", "  2,null", "  3.5,true", "  -,y", "  5,"]
+        assert list(ToonReader(lines, batch_size=2)) == list(ToonReader(lines))
+
+    def test_empty_table_decodes_to_empty_list(self):
+        """Test that a header without rows is still an array"""
+        assert toon_to_json("[0]{a,b}:") == []
+
+
+class TestStrictMode:
+    """Test the validation used by the file loaders"""
+
+    def test_empty_file(self):
+        """Test that an empty document is rejected"""
+        with pytest.raises(ValueError, match="empty"):
+            list(iter_toon_rows(io.StringIO("\n\n"), strict=True))
+
+    def test_not_tabular(self):
+        """Test that path notation is rejected where rows are expected"""
+        with pytest.raises(ValueError, match="Unrecognized TOON header"):
+            list(iter_toon_rows(io.StringIO("a:1")))
+
+    def test_column_mismatch(self):
+        """Test that a short row raises instead of being skipped"""
+        with pytest.raises(ValueError, match="2 columns but header has 3 fields"):
+            list(iter_toon_rows(io.StringIO("[1]{a,b,c}:\n  1,2"), strict=True))
+
+    def test_trailing_comma_tolerated(self):
+        """Test that a trailing comma on a row is ignored"""
+        rows = list(iter_toon_rows(io.StringIO("[1]{a,b}:\n  1,2,"), parse=str, strict=True))
+        assert rows == [{"a": "1", "b": "2"}]
+
+    def test_string_cells_with_dotted_leaves(self):
+        """Test that loaders keep their own cells as strings and only type dotted leaves"""
+        text = "[1]{id,status,note,m.cpu,m.net.up,m.host}:\n  007,none,,1.5,true,web"
+        rows = [parse_dotted_leaves(row) for row in iter_toon_rows(io.StringIO(text), parse=str, strict=True)]
+        assert rows == [{"id": "007", "status": "none", "note": "", "m": {"cpu": 1.5, "net": {"up": True}, "host": "web"}}]
+
+    def test_lenient_mode_skips_bad_rows(self):
+        """Test that toon_to_json keeps skipping malformed rows"""
+        assert toon_to_json("[2]{a,b}:\n  1,2\n  3") == [{"a": 1, "b": 2}]
@@ -0,0 +1,315 @@
+"""
+Test cases for the streaming TOON encoder
+"""
+import io
+import pytest
+from multi_converter import json_to_toon, toon_to_json
+from toon_encoder import choose_key_aliases, iter_toon_lines, write_toon
+
+
+class TestStreamingEncoder:
+    """Test the line generator and file-like sink variants"""
+
+    def test_tabular_lines(self):
+        """Test that uniform arrays stream a header followed by one line per row"""
+        json_data = [{"id": 1, "ok": True}, {"id": 2, "ok": None}]
+        lines = list(iter_toon_lines(json_data))
+        assert lines == ["[2]{id,ok}:", "  1,true", "  2,null"]
+
+    def test_typed_header(self):
+        """Test that column types can be declared in the header and round-trip"""
+        json_data = [{"id": 1, "name": "a", "score": 1.5}, {"id": 2, "name": "b", "score": None}]
+        lines = list(iter_toon_lines(json_data, typed_header=True))
+        assert lines[0] == "[2]{id:int,name:str,score:any}:"
+        assert toon_to_json("\n".join(lines)) == json_data
+
+    def test_path_lines(self):
+        """Test that nested structures stream one path per leaf"""
+        json_data = {"user": {"name": "Alice", "tags": ["a", {"b": 1}]}}
+        lines = list(iter_toon_lines(json_data))
+        assert lines == ["user.name:Alice", "user.tags[0]:a", "user.tags[1].b:1"]
+
+    def test_generator_is_lazy(self):
+        """Test that rows are produced on demand rather than all at once"""
+        rows = [{"n": i} for i in range(1000)]
+        lines = iter_toon_lines(rows)
+        assert next(lines) == "[1000]{n}:"
+        assert next(lines) == "  0"
+
+    @pytest.mark.parametrize("json_data", [
+        {"name": "Bob", "age": 25},
+        [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}],
+        [1, [2, 3], {"k": None}],
+        "plain",
+        [],
+    ])
+    def test_write_toon_matches_json_to_toon(self, json_data):
+        """Test that writing to a sink produces exactly the string output"""
+        sink = io.StringIO()
+        write_toon(json_data, sink)
+        assert sink.getvalue() == json_to_toon(json_data)
+
+    def test_round_trip(self):
+        """Test that streamed output decodes back to the original data"""
+        json_data = [{"id": i, "name": f"node-{i}"} for i in range(5)]
+        sink = io.StringIO()
+        write_toon(json_data, sink)
+        assert toon_to_json(sink.getvalue()) == json_data
+
+    def test_deep_nesting_has_no_recursion_limit(self):
+        """Test that documents far deeper than the recursion limit are flattened"""
+        json_data = node = {}
+        for _ in range(5000):
+            node["c"] = node = {}
+        node["v"] = 1
+        lines = list(iter_toon_lines(json_data))
+        assert lines == ["c." * 5000 + "v:1"]
+
+    def test_empty_root_key(self):
+        """Test that a leaf without a path is written as a bare value"""
+        assert json_to_toon({"": 1, "a": {"b": True}}) == "1\na.b:true"
+
+
+class TestNestedTabularBlocks:
+    """Test tabular blocks for uniform arrays below the root"""
+
+    def test_nested_block_lines(self):
+        """Test that a nested uniform array is written as a header and indented rows"""
+        json_data = {"server": {"id": 7, "disks": [{"type": "SSD", "gb": 512}, {"type": "HDD", "gb": 4000}]}}
+        lines = list(iter_toon_lines(json_data))
+        assert lines == ["server.id:7", "server.disks[2]{type,gb}:", "  SSD,512", "  HDD,4000"]
+
+    def test_blocks_at_any_depth(self):
+        """Test that blocks inside arrays and deeper objects round-trip"""
+        json_data = {"servers": [
+            {"name": "a", "disks": [{"gb": 1}, {"gb": 2}], "meta": {"ports": [{"n": 80, "tls": False}]}},
+            {"name": "b", "disks": [{"gb": 3}], "meta": {"ports": [{"n": 443, "tls": True}]}},
+        ]}
+        text = json_to_toon(json_data)
+        assert "servers[1].meta.ports[1]{n,tls}:" in text.splitlines()
+        assert toon_to_json(text) == json_data
+
+    @pytest.mark.parametrize("items", [
+        [{"a": "x,y"}, {"a": "z"}],
+        [{"a": " padded"}, {"a": "z"}],
+        [{"a": 1, "b": [1, 2]}, {"a": 2, "b": [3]}],
+        [{"a": 1}, {"b": 2}, {"c": 3}],
+        [{"a.b": 1}, {"a.b": 2}],
+        [{"a": ""}],
+    ])
+    def test_falls_back_to_paths(self, items):
+        """Test that arrays whose cells or keys cannot be read back use path lines"""
+        lines = list(iter_toon_lines({"items": items}))
+        assert lines[0].startswith("items[0].")
+        assert not any(line.endswith("}:") for line in lines)
+
+
+class TestDottedColumns:
+    """Test spreading uniform nested objects over dotted tabular columns"""
+
+    ROWS = [
+        {"id": 1, "metrics": {"cpu": 44.3, "net": {"in_mbps": 720.17, "conns": 47}}, "tags": ["a", "b"]},
+        {"id": 2, "metrics": {"cpu": 15.8, "net": {"in_mbps": 393.29, "conns": 12}}, "tags": ["c"]},
+    ]
+
+    def test_dotted_header(self):
+        """Test that nested objects become one column per leaf"""
+        lines = list(iter_toon_lines(self.ROWS))
+        assert lines[0] == "[2]{id,metrics.cpu,metrics.net.in_mbps,metrics.net.conns,tags}:"
+        assert lines[1] == "  1,44.3,720.17,47,['a', 'b']"
+
+    def test_round_trip(self):
+        """Test that dotted columns decode back into nested objects"""
+        rows = [{k: v for k, v in row.items() if k != "tags"} for row in self.ROWS]
+        assert toon_to_json(json_to_toon(rows)) == rows
+        typed = list(iter_toon_lines(rows, typed_header=True))
+        assert typed[0] == "[2]{id:int,metrics.cpu:float,metrics.net.in_mbps:float,metrics.net.conns:int}:"
+        assert toon_to_json("\n".join(typed)) == rows
+
+    def test_nested_block_with_dotted_columns(self):
+        """Test that nested blocks use dotted columns too"""
+        json_data = {"fleet": {"servers": [{"id": 1, "net": {"in": 5}}, {"id": 2, "net": {"in": 6}}]}}
+        lines = list(iter_toon_lines(json_data))
+        assert lines[0] == "fleet.servers[2]{id,net.in}:"
+        assert toon_to_json("\n".join(lines)) == json_data
+
+    def test_literal_dotted_keys(self):
+        """Test that keys containing a dot are quoted in the header and not nested on decode"""
+        rows = [{"x.y": 1, "id": 2}, {"x.y": 3, "id": 4}]
+        assert next(iter_toon_lines(rows)) == '[2]{"x.y",id}:'
+        assert next(iter_toon_lines(rows, typed_header=True)) == '[2]{"x.y":int,id:int}:'
+        for data in ([{"x.y": 1}], rows, [{'"q"': 1, "a.b.c": "d"}]):
+            assert toon_to_json(json_to_toon(data)) == data
+        assert toon_to_json("[2]{m.a,\"x.y\"}:\n  1,2\n  3,4") == [{"m": {"a": 1}, "x.y": 2}, {"m": {"a": 3}, "x.y": 4}]
+
+    @pytest.mark.parametrize("rows", [
+        [{"m": {"a": 1}}, {"m": {"b": 2}}],
+        [{"m": {"a": 1}}, {"m": None}],
+        [{"m": {}}, {"m": {}}],
+        [{"m": {"a": 1}, "x.y": 2}, {"m": {"a": 2}, "x.y": 3}],
+    ])
+    def test_irregular_objects_are_not_flattened(self, rows):
+        """Test that only objects with the same keys in every row are flattened"""
+        assert "m." not in next(iter_toon_lines(rows))
+
+
+class TestUnionSchema:
+    """Test tables for arrays of objects whose keys differ"""
+
+    ROWS = [
+        {"id": 1, "login": "ann", "email": "ann@example.com"},
+        {"id": 2, "login": "bob", "company": None},
+        {"login": "cy", "id": 3, "email": "cy@example.com", "company": "acme"},
+    ]
+
+    def test_union_header(self):
+        """Test that missing keys become optional columns filled with the absent marker"""
+        lines = list(iter_toon_lines(self.ROWS))
+        assert lines == [
+            "[3]{id,login,email?,company?}:",
+            "  1,ann,ann@example.com,~",
+            "  2,bob,~,null",
+            "  3,cy,cy@example.com,acme",
+        ]
+
+    @pytest.mark.parametrize("rows", [
+        [{"id": 1, "tags": ["a", "b"]}, {"id": 2}],
+        [{"id": 1, "meta": {"k": "v"}}, {"id": 2, "meta": {"k": "w"}, "x": 3}],
+        [{"id": 1, "m": {"a": 1}, "x": 1}, {"id": 2, "m": {"b": [1, 2]}}],
+    ])
+    def test_nested_values_round_trip(self, rows):
+        """Test that mixed-key rows holding lists or objects round-trip, as dotted columns or path lines"""
+        assert toon_to_json(json_to_toon(rows)) == rows
+
+    def test_nested_list_cells(self):
+        """Test that a list in a mixed-key row is not written as a table cell"""
+        lines = list(iter_toon_lines([{"id": 1, "tags": ["a", "b"]}, {"id": 2}]))
+        assert lines == ["[0].id:1", "[0].tags[]:a,b", "[1].id:2"]
+
+    def test_absent_is_not_null(self):
+        """Test that missing keys and null values round-trip distinctly"""
+        assert toon_to_json(json_to_toon(self.ROWS)) == self.ROWS
+        typed = "\n".join(iter_toon_lines(self.ROWS, typed_header=True))
+        assert typed.startswith("[3]{id:int,login:str,email?:str,company?:any}:")
+        assert toon_to_json(typed) == self.ROWS
+
+    def test_nested_block(self):
+        """Test that nested blocks use the union schema too"""
+        json_data = {"users": [{"id": 1, "tag": "x"}, {"id": 2}]}
+        lines = list(iter_toon_lines(json_data))
+        assert lines == ["users[2]{id,tag?}:", "  1,x", "  2,~"]
+        assert toon_to_json("\n".join(lines)) == json_data
+
+    @pytest.mark.parametrize("rows", [
+        [{"a": 1}, {"b": 2}, {"c": 3}],
+        [{"a": "~"}, {"b": 1}],
+        [{"a?": 1}, {"a?": 2}],
+    ])
+    def test_falls_back_to_paths(self, rows):
+        """Test that sparse arrays, marker values and ``?`` keys stay in path notation"""
+        text = json_to_toon(rows)
+        assert text.startswith("[0].")
+        assert toon_to_json(text) == rows
+
+    @pytest.mark.parametrize("rows", [
+        [{"id": 1, "note": "a, b"}, {"id": 2}],
+        [{"note": "[0].a:x", "id": 1}, {"id": 2}],
+        [{"note": "[1]", "id": 1}, {"id": 2}],
+        [{"id": 1}, {"id": 2, "note": "x,y,z"}],
+    ])
+    def test_unsafe_cells_round_trip(self, rows):
+        """Test that cells a row split would misread keep mixed-key rows in path notation"""
+        text = json_to_toon(rows)
+        assert text.startswith("[0].")
+        assert toon_to_json(text) == rows
+
+
+class TestInlineArrays:
+    """Test writing arrays of scalars on one line"""
+
+    def test_inline_line(self):
+        """Test that scalar arrays are written as ``path[]:values``"""
+        json_data = {"server": {"tags": ["eu-west-1", "prod"], "ports": [22, 443], "flags": [True, None, 1.5]}}
+        lines = list(iter_toon_lines(json_data))
+        assert lines == ["server.tags[]:eu-west-1,prod", "server.ports[]:22,443", "server.flags[]:true,null,1.5"]
+        assert toon_to_json("\n".join(lines)) == json_data
+
+    @pytest.mark.parametrize("items", [["a,b", "c"], [" padded", "x"], [""], ["a", ["b"]]])
+    def test_falls_back_to_paths(self, items):
+        """Test that arrays whose values cannot be split back exactly use one line per element"""
+        lines = list(iter_toon_lines({"tags": items}))
+        assert lines[0].startswith("tags[0]")
+
+    def test_padded_values_stay_element_lines(self):
+        """Test that a value written with leading whitespace is not read as an inline array"""
+        assert json_to_toon({"tags": ["a", " b,c"]}) == "tags[0]:a\ntags[1]: b,c"
+        assert toon_to_json(json_to_toon({"tags": ["a", " b,c"]})) == {"tags": ["a", "b,c"]}
+
+
+class TestSinglePassTable:
+    """Test formatting flat tables while checking their keys"""
+
+    def test_mixed_value_types(self):
+        """Test that bools, nulls and ``%`` in strings are formatted like ``format_value``"""
+        rows = [
+            {"id": 1, "ok": True, "note": "50%s", "owner": None, "score": 0.5},
+            {"id": 2, "ok": False, "note": None, "owner": "ops", "score": 2},
+            {"id": 3, "ok": True, "note": [1, 2], "owner": {"a": 1}, "score": 1.0},
+        ]
+        lines = list(iter_toon_lines(rows))
+        assert lines[1:] == ["  1,true,50%s,null,0.5", "  2,false,null,ops,2", "  3,true,[1, 2],{'a': 1},1.0"]
+
+    def test_rows_are_streamed(self):
+        """Test that the header comes out before any row is formatted"""
+        rows = [{"id": i, "name": f"n{i}"} for i in range(3)]
+        lines = iter_toon_lines(rows)
+        assert next(lines) == "[3]{id,name}:"
+        rows[2]["name"] = "late"
+        assert list(lines) == ["  0,n0", "  1,n1", "  2,late"]
+
+    def test_mismatch_part_way_falls_back(self):
+        """Test that a row with other keys late in the array is encoded as if seen up front"""
+        rows = [{"id": i, "name": f"n{i}"} for i in range(50)] + [{"id": 50, "role": "x"}]
+        lines = list(iter_toon_lines(rows))
+        assert lines[0] == "[51]{id,name?,role?}:"
+        assert lines[1] == "  0,n0,~"
+        assert toon_to_json("\n".join(lines)) == rows
+
+
+class TestKeyAliases:
+    """Test aliasing long repeated keys"""
+
+    servers = {"servers": [
+        {"id": i, "metrics": {"network_traffic": {"active_connections": i, "peers": [{"cost_center": "a"}]}}}
+        for i in range(4)
+    ]}
+
+    def test_aliases_only_pay_off(self):
+        """Test that only keys whose uses outweigh their dictionary entry are aliased"""
+        aliases = choose_key_aliases(self.servers)
+        assert {"network_traffic", "active_connections", "cost_center"} <= set(aliases)
+        assert "id" not in aliases
+        assert choose_key_aliases({"network_traffic": 1}) == {}
+        assert choose_key_aliases([1, 2]) == {}
+
+    def test_aliases_avoid_existing_words(self):
+        """Test that an alias never spells a word already used in a key"""
+        data = {"a": 1, "b": 2, "c": {"long_key_name": {"w": 1, "x": 2, "y": 3, "z": 4}}}
+        aliases = choose_key_aliases(data)
+        assert aliases["long_key_name"] not in {"a", "b", "c", "w", "x", "y", "z"}
+
+    def test_round_trip(self):
+        """Test that the aliased encoding decodes like the plain one"""
+        aliases = choose_key_aliases(self.servers)
+        lines = list(iter_toon_lines(self.servers, aliases=aliases))
+        assert lines[0].startswith("@keys{")
+        assert "network_traffic" not in "\n".join(lines[1:])
+        assert toon_to_json("\n".join(lines)) == self.servers
+
+    def test_json_to_toon_picks_smaller_output(self):
+        """Test that the converter only uses aliases when they make the output smaller"""
+        text = json_to_toon(self.servers, key_aliases=True)
+        assert text.startswith("@keys{")
+        assert len(text) < len(json_to_toon(self.servers))
+        assert toon_to_json(text) == self.servers
+        assert json_to_toon({"a": 1}, key_aliases=True) == "a:1"
@@ -0,0 +1,112 @@
+"""
+Test cases for path-notation assembly
+"""
+import pytest
+from multi_converter import toon_to_json
+from toon_paths import PathAssembler, column_nester, parse_path
+
+
+def assemble(events):
+    assembler = PathAssembler()
+    for path, value in events:
+        assembler.add(path, value)
+    return assembler.result
+
+
+class TestParsePath:
+    """Test splitting paths into keys and indices"""
+
+    def test_keys_and_indices(self):
+        """Test that keys and indices are returned with their end offsets"""
+        assert parse_path("specs.storage[0].size") == (("specs", "storage", 0, "size"), (5, 13, 16, 21))
+
+    def test_empty_keys_are_skipped(self):
+        """Test that repeated and trailing dots do not create parts"""
+        assert parse_path("a..b.")[0] == ("a", "b")
+
+    def test_bad_index(self):
+        """Test that a non-integer index is rejected"""
+        with pytest.raises(ValueError):
+            parse_path("a[x]")
+
+
+class TestPathAssembler:
+    """Test rebuilding documents from path events"""
+
+    def test_shared_prefixes(self):
+        """Test that consecutive lines sharing a prefix land in the same containers"""
+        events = [
+            ("specs.storage[0].type", "SSD"),
+            ("specs.storage[0].size", 512),
+            ("specs.storage[1].type", "HDD"),
+            ("specs.cpu", 8),
+            ("name", "srv"),
+        ]
+        assert assemble(events) == {
+            "specs": {"storage": [{"type": "SSD", "size": 512}, {"type": "HDD"}], "cpu": 8},
+            "name": "srv",
+        }
+
+    def test_key_prefix_is_not_a_shared_segment(self):
+        """Test that ``a.b`` and ``a.bc`` are different keys"""
+        assert assemble([("a.b.x", 1), ("a.bc.y", 2)]) == {"a": {"b": {"x": 1}, "bc": {"y": 2}}}
+
+    def test_root_array(self):
+        """Test that root indices pad with objects below and nulls at leaves"""
+        assert assemble([("[1].a", 1), ("[3]", "x")]) == [{}, {"a": 1}, None, "x"]
+
+    def test_overwritten_container_is_not_reused(self):
+        """Test that a leaf replacing a container is seen by the next line"""
+        with pytest.raises(TypeError):
+            assemble([("a.b", 1), ("a", 2), ("a.c", 3)])
+
+    def test_deep_document(self):
+        """Test a path 1500 levels deep round-trips"""
+        path = ".".join(f"k{i}" for i in range(1500))
+        result = toon_to_json(f"{path}:1\n{path[:-1]}x:2")
+        node = result
+        for i in range(1499):
+            node = node[f"k{i}"]
+        assert node == {"k1499": 1, "k149x": 2}
+
+
+class TestReferences:
+    """Test paths that share an earlier subtree"""
+
+    def test_reference_shares_object(self):
+        """Test that a reference points at the earlier object instead of a copy"""
+        assembler = PathAssembler()
+        assembler.add("a.tags[0]", "x")
+        assembler.add_reference("b", "a.tags")
+        assembler.add_reference("c[1]", "a")
+        result = assembler.result
+        assert result == {"a": {"tags": ["x"]}, "b": ["x"], "c": [{}, {"tags": ["x"]}]}
+        assert result["b"] is result["a"]["tags"] and result["c"][1] is result["a"]
+
+    def test_unknown_target(self):
+        """Test that a reference to a path not written yet is an error"""
+        assembler = PathAssembler()
+        assembler.add("a.x", 1)
+        with pytest.raises(ValueError, match="unknown path"):
+            assembler.add_reference("b", "a.y")
+
+
+class TestColumnNester:
+    """Test rebuilding nested objects from dotted column names"""
+
+    def test_nests_dotted_columns(self):
+        """Test that dotted names become nested objects in header order"""
+        nest = column_nester(["id", "m.cpu", "m.net.in", "m.net.out"])
+        row = nest({"id": 1, "m.cpu": 0.5, "m.net.in": 2, "m.net.out": 3})
+        assert row == {"id": 1, "m": {"cpu": 0.5, "net": {"in": 2, "out": 3}}}
+
+    def test_literal_fields(self):
+        """Test that literal fields stay keys of the row, dotted or not"""
+        assert column_nester(["x.y", "id"], literal=["x.y"]) is None
+        nest = column_nester(["x.y", "m.a"], literal=["x.y"])
+        assert nest({"x.y": 1, "m.a": 2}) == {"x.y": 1, "m": {"a": 2}}
+
+    @pytest.mark.parametrize("fields", [["a", "b"], ["a", "a.b"], ["a.b", "a"], ["a..b"], [".a"]])
+    def test_flat_or_conflicting_names(self, fields):
+        """Test that headers without a consistent tree of dotted names are left flat"""
+        assert column_nester(fields) is None
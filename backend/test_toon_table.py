@@ -0,0 +1,149 @@
+"""
+Test cases for memory-mapped random access to TOON tables
+"""
+import struct
+import pytest
+from multi_converter import json_to_toon, toon_to_json
+from toon_cells import split_top_level
+from toon_decoder import iter_toon_rows, split_row
+from toon_table import ToonTable
+
+
+ROWS = [{"server_id": f"srv-{i:03d}", "cpu": i * 1.5, "active": i % 2 == 0} for i in range(50)]
+
+
+def toon_text_offset(path):
+    """Return the offset of the first data row of a file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return data.index(b"\n") + 1
+
+
+@pytest.fixture
+def toon_path(tmp_path):
+    """Write a tabular TOON file and return its path"""
+    path = tmp_path / "servers.toon"
+    path.write_text(json_to_toon(ROWS), encoding="utf-8")
+    return str(path)
+
+
+class TestToonTable:
+    """Test indexing, slicing and key lookup"""
+
+    def test_len_and_header(self, toon_path):
+        """Test that the index covers every data row"""
+        with ToonTable(toon_path) as table:
+            assert len(table) == 50
+            assert table.count == 50
+            assert table.fields == ["server_id", "cpu", "active"]
+
+    def test_positional_access(self, toon_path):
+        """Test integer, negative and slice indexing"""
+        with ToonTable(toon_path) as table:
+            assert table[0] == ROWS[0]
+            assert table[-1] == ROWS[-1]
+            assert table[10:13] == ROWS[10:13]
+            assert table[::25] == ROWS[::25]
+            with pytest.raises(IndexError):
+                table[50]
+
+    def test_matches_full_parse(self, toon_path):
+        """Test that iterating the table gives the same rows as toon_to_json"""
+        with open(toon_path, encoding="utf-8") as f:
+            expected = toon_to_json(f.read())
+        with ToonTable(toon_path) as table:
+            assert list(table) == expected
+
+    def test_key_lookup(self, toon_path):
+        """Test lookup by a chosen key column"""
+        with ToonTable(toon_path, key="server_id") as table:
+            assert table.get("srv-042") == ROWS[42]
+            assert table.get("srv-999") is None
+
+    def test_unknown_key_column(self, toon_path):
+        """Test that an unknown key column is rejected"""
+        with pytest.raises(ValueError, match="Key column"):
+            ToonTable(toon_path, key="missing")
+
+    def test_sidecar_round_trip(self, toon_path):
+        """Test that the offset index is saved and reused"""
+        with ToonTable(toon_path, sidecar=True) as table:
+            sidecar = table.sidecar_path
+            first = table[7]
+        with open(sidecar, "rb") as f:
+            data = f.read()
+        assert data[:8] == b"TOONIDX3" and data[24:32] == b"toplevel"
+        # Offsets are little-endian whatever the host's byte order
+        assert struct.unpack_from("<Q", data, 32)[0] == toon_text_offset(toon_path)
+        with ToonTable(toon_path, sidecar=True) as table:
+            assert table[7] == first
+            assert len(table) == 50
+
+    def test_stale_sidecar_is_rebuilt(self, toon_path):
+        """Test that a sidecar for an older version of the file is ignored"""
+        ToonTable(toon_path, sidecar=True).close()
+        with open(toon_path, "a", encoding="utf-8") as f:
+            f.write("\n  srv-050,0.0,true")
+        with ToonTable(toon_path, sidecar=True) as table:
+            assert len(table) == 51
+            assert table[-1]["server_id"] == "srv-050"
+
+    def test_sidecar_split(self, toon_path):
+        """Test that a sidecar is only reused with the split it was built with"""
+        with open(toon_path, "a", encoding="utf-8") as f:
+            f.write("\n  srv-050,{'a': 1, 'b': 2},true")
+        with ToonTable(toon_path, split=split_row, sidecar=True) as table:
+            assert len(table) == 50
+        with ToonTable(toon_path, sidecar=True) as table:
+            assert len(table) == 51
+        with pytest.raises(ValueError, match="sidecar"):
+            ToonTable(toon_path, split=lambda line: line.split(","), sidecar=True)
+
+    def test_object_cells(self, tmp_path):
+        """Test that rows with commas inside object and list cells are indexed"""
+        path = tmp_path / "metrics.toon"
+        path.write_text(
+            "[2]{server_id,metrics,tags,score}:\n"
+            "  srv-0,{'cpu': 1.5, 'net': {'in': 2}},['eu', 'prod'],0.5\n"
+            "  srv-1,{'cpu': 2.5, 'net': {'in': 3}},['us'],0.9",
+            encoding="utf-8",
+        )
+        with ToonTable(str(path), key="server_id") as table:
+            assert len(table) == 2
+            assert table.get("srv-1")["tags"] == "['us']"
+            assert list(table) == list(iter_toon_rows(str(path), split=split_top_level))
+
+    def test_malformed_rows_are_skipped(self, tmp_path):
+        """Test that rows with the wrong number of cells are skipped as ToonReader does"""
+        path = tmp_path / "broken.toon"
+        path.write_text("[4]{id,name}:\n  1,a\n  2\n  3,c,extra\n  4,d", encoding="utf-8")
+        for kwargs in ({}, {"split": split_row}, {"split": lambda line: line.split(",")}):
+            with ToonTable(str(path), key="id", **kwargs) as table:
+                assert list(table) == list(iter_toon_rows(str(path))) == [
+                    {"id": 1, "name": "a"}, {"id": 4, "name": "d"},
+                ]
+                assert table.get(4) == {"id": 4, "name": "d"} and table.get(2) is None
+
+    def test_not_tabular(self, tmp_path):
+        """Test that path-notation files are rejected"""
+        path = tmp_path / "doc.toon"
+        path.write_text("a:1\nb:2", encoding="utf-8")
+        with pytest.raises(ValueError, match="Unrecognized TOON header"):
+            ToonTable(str(path))
+
+    def test_dotted_columns_are_nested(self, tmp_path):
+        """Test that rows of a file with dotted columns come back as nested objects"""
+        rows = [{"id": i, "metrics": {"cpu": i / 2, "net": {"in": i}}} for i in range(3)]
+        path = tmp_path / "metrics.toon"
+        path.write_text(json_to_toon(rows), encoding="utf-8")
+        with ToonTable(str(path)) as table:
+            assert "metrics.net.in" in table.fields
+            assert table[1] == rows[1]
+
+    def test_key_aliases(self, tmp_path):
+        """Test that a file starting with an ``@keys`` line resolves aliased columns"""
+        path = tmp_path / "aliased.toon"
+        path.write_text("@keys{a=server_id}\n[2]{a,cpu}:\n  srv-0,1.5\n  srv-1,2.5", encoding="utf-8")
+        with ToonTable(str(path), key="server_id") as table:
+            assert len(table) == 2
+            assert table.get("srv-1") == {"server_id": "srv-1", "cpu": 2.5}
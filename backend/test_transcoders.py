@@ -0,0 +1,109 @@
+"""
+Tests for direct CSV <-> TOON transcoding
+"""
+import io
+import pytest
+from multi_converter import (
+    convert_file,
+    convert_format,
+    csv_to_json,
+    json_to_csv,
+    json_to_toon,
+    toon_to_json,
+    transcode_csv_to_toon,
+    transcode_toon_to_csv,
+)
+
+
+def transcode(function, text):
+    output = io.StringIO()
+    if not function(io.StringIO(text), output):
+        return None
+    return output.getvalue()
+
+
+class TestCsvToToon:
+    """Test CSV tables written straight to TOON"""
+
+    def test_matches_json_route(self):
+        """Test that cells come out as the JSON route would write them"""
+        text = "id,name,load,ok,note\r\n1,web,0.50,true,\r\n007,db,2,FALSE,\"x,y\"\r\n\r\n"
+        assert transcode(transcode_csv_to_toon, text) == json_to_toon(csv_to_json(text))
+        assert transcode(transcode_csv_to_toon, text).splitlines() == [
+            "[2]{id,name,load,ok,note}:",
+            "  1,web,0.5,true,null",
+            "  7,db,2,false,x,y",
+        ]
+
+    def test_typed_header(self):
+        """Test that typed CSV headers lose their types like in ``csv_to_json``"""
+        assert transcode(transcode_csv_to_toon, "id:int,n:str\n1,a\n2,b\n") == "[2]{id,n}:\n  1,a\n  2,b"
+
+    @pytest.mark.parametrize("text", [
+        "id,name\n1,a\n",
+        "id,name\n1,a\n2,b,c\n",
+        "id,id\n1,a\n2,b\n",
+        "id,email?\n1,a\n2,b\n",
+        "",
+    ])
+    def test_not_tabular(self, text):
+        """Test that single rows, ragged rows and odd headers are left to the JSON route"""
+        output = io.StringIO()
+        assert not transcode_csv_to_toon(io.StringIO(text), output)
+        assert output.getvalue() == ""
+
+    def test_batches(self, monkeypatch):
+        """Test that tables longer than a batch are written whole"""
+        monkeypatch.setattr("multi_converter.TOON_ROW_BATCH", 2)
+        text = "a,b\n" + "".join(f"{i},x{i}\n" for i in range(5))
+        assert transcode(transcode_csv_to_toon, text) == json_to_toon(csv_to_json(text))
+
+
+class TestToonToCsv:
+    """Test tabular TOON written straight to CSV"""
+
+    def test_matches_json_route(self):
+        """Test that values come out as the JSON route would write them"""
+        text = "[3]{id,name,ok}:\n  1,\"q\",TRUE\n  2,null,false\n  3,a b,x"
+        assert transcode(transcode_toon_to_csv, text) == json_to_csv(toon_to_json(text))
+        assert transcode(transcode_toon_to_csv, text).splitlines() == [
+            "id,name,ok", '1,"""q""",True', "2,,False", "3,a b,x"
+        ]
+
+    def test_empty_table(self):
+        """Test that a table without rows becomes empty CSV"""
+        assert transcode(transcode_toon_to_csv, "[0]{id}:") == ""
+
+    @pytest.mark.parametrize("text", [
+        "a:1",
+        "[2]{id,m.cpu}:\n  1,2\n  3,4",
+        "[2]{id,email?}:\n  1,~\n  3,4",
+        "[2]{id,id}:\n  1,2\n  3,4",
+    ])
+    def test_not_flat(self, text):
+        """Test that path notation and nested or optional columns are left to the JSON route"""
+        assert transcode(transcode_toon_to_csv, text) is None
+
+
+class TestConverters:
+    """Test that the converters pick the direct route"""
+
+    def test_convert_format(self, monkeypatch):
+        """Test that CSV -> TOON skips the JSON tree unless options need it"""
+        text = "id,cpu\n1,0.123\n2,0.456\n"
+        monkeypatch.setattr("multi_converter.csv_to_json", None)
+        assert convert_format(text, 'csv', 'toon') == {'toon': "[2]{id,cpu}:\n  1,0.123\n  2,0.456"}
+        with pytest.raises(ValueError):
+            convert_format(text, 'csv', 'toon', precision=1)
+
+    def test_convert_file(self, tmp_path):
+        """Test a file round trip through both transcoders"""
+        src = tmp_path / "in.csv"
+        src.write_text("id,name\n1,a\n2,b\n", encoding="utf-8")
+        convert_file(str(src), str(tmp_path / "t.toon"), 'csv', 'toon')
+        assert (tmp_path / "t.toon").read_text(encoding="utf-8") == "[2]{id,name}:\n  1,a\n  2,b"
+        convert_file(str(tmp_path / "t.toon"), str(tmp_path / "out.csv"), 'toon', 'csv')
+        assert (tmp_path / "out.csv").read_bytes() == b"id,name\r\n1,a\r\n2,b\r\n"
+        src.write_text("id,name\n1,a\n", encoding="utf-8")
+        convert_file(str(src), str(tmp_path / "t.toon"), 'csv', 'toon')
+        assert (tmp_path / "t.toon").read_text(encoding="utf-8") == "id:1\nname:a"
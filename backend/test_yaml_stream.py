@@ -0,0 +1,149 @@
+"""
+Tests for the event-stream YAML reader and the flat-record emitter
+"""
+import io
+import json
+import pytest
+import yaml
+from yaml_stream import DUMP_OPTIONS, YamlReader, _ItemLoader, dump_yaml, load_yaml
+from multi_converter import convert_file, json_to_yaml, yaml_to_json
+
+
+class TestYamlReader:
+    """Test reading YAML documents item by item"""
+
+    def test_sequence_items(self):
+        """Test that the items of a root sequence are yielded one at a time"""
+        reader = YamlReader(io.StringIO("- id: 1\n  tags: [a, b]\n- id: 2\n  ok: true\n- 3.5\n"))
+        assert reader.sequence and not reader.empty
+        items = iter(reader)
+        assert next(items) == {"id": 1, "tags": ["a", "b"]}
+        assert list(items) == [{"id": 2, "ok": True}, 3.5]
+
+    def test_load_any_root(self):
+        """Test that load() returns the same document as yaml.safe_load"""
+        for text in ("a: 1\nb: [1, 2]\n", "- 1\n- 2\n", "--- 42\n...\n", "[]", "!!seq [1]\n"):
+            reader = YamlReader(text)
+            assert reader.load() == yaml.safe_load(text)
+        reader = YamlReader("  \n")
+        assert reader.empty and reader.load() is None
+
+    def test_tagged_or_anchored_root(self):
+        """Test that a root sequence that is not a plain list is not iterated"""
+        for text in ("&top [1, 2]", "!!set {a: null}"):
+            reader = YamlReader(text)
+            assert not reader.sequence
+            with pytest.raises(ValueError, match="not a sequence"):
+                iter(reader).__next__()
+            assert YamlReader(text).load() == yaml.safe_load(text)
+
+    def test_aliases_across_items(self):
+        """Test that an alias to an earlier item loads as an equal value"""
+        items = list(YamlReader("- &base {cpu: 1}\n- *base\n"))
+        assert items == [{"cpu": 1}, {"cpu": 1}]
+
+    def test_single_document(self):
+        """Test that a second document is rejected like yaml.safe_load does"""
+        with pytest.raises(yaml.YAMLError, match="single document"):
+            list(YamlReader("- 1\n---\n- 2\n"))
+        with pytest.raises(yaml.YAMLError):
+            YamlReader("a: 1\n---\nb: 2\n").load()
+
+    def test_load_yaml(self):
+        """Test that load_yaml matches yaml.safe_load"""
+        text = "a: 2024-01-02\nb: !!binary aGk=\nc: [1, {d: null}]\n"
+        assert load_yaml(text) == yaml.safe_load(text)
+        assert yaml_to_json(" ") == {}
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason="PyYAML built without libyaml")
+class TestLibyamlReader:
+    """Test the reader when nodes are composed from libyaml's events"""
+
+    SEQUENCE = "- &base {id: 1, tags: [a, b]}\n- *base\n- {<<: *base, id: 2}\n- [&t x, *t]\n- 3.5\n"
+    MAPPING = "base: &base {cpu: 1}\ncopy: *base\nmerged: {<<: *base, mem: 2}\nlist: [*base]\n"
+
+    def test_loader(self):
+        """Test that the item loader parses with libyaml"""
+        from yaml.cyaml import CParser
+        assert issubclass(_ItemLoader, CParser)
+
+    def test_sequence_root(self):
+        """Test iterating and loading a root sequence with anchors and aliases"""
+        expected = yaml.load(self.SEQUENCE, Loader=yaml.SafeLoader)
+        reader = YamlReader(io.StringIO(self.SEQUENCE))
+        assert reader.sequence
+        assert list(reader) == expected
+        assert YamlReader(self.SEQUENCE).load() == expected
+
+    def test_mapping_root(self):
+        """Test loading a root mapping with anchors and aliases"""
+        reader = YamlReader(io.StringIO(self.MAPPING))
+        assert not reader.sequence
+        data = reader.load()
+        assert data == yaml.load(self.MAPPING, Loader=yaml.SafeLoader)
+        assert data["copy"] is data["base"]
+
+
+def pyyaml_dump(data):
+    # The call json_to_yaml made before dump_yaml, with PyYAML's default Dumper
+    return yaml.dump(data, **DUMP_OPTIONS)
+
+
+class TestDumpYaml:
+    """Test that the flat-record emitter writes what yaml.dump does"""
+
+    def test_scalars(self):
+        """Test plain, quoted and special scalars"""
+        values = [
+            "node-1", "a b", "", "123", "yes", "Null", "2024-01-02", "-x", "a: b", "#c", "it's",
+            "émoji 🚀", "tab\there", " lead", "trail ", "---", 0, -7, 10**20, 0.1, 1e17, 1e-7,
+            -0.0, float("nan"), float("inf"), -float("inf"), True, False, None,
+        ]
+        data = [{"id": i, "value": value} for i, value in enumerate(values)]
+        assert dump_yaml(data) == pyyaml_dump(data)
+
+    def test_wrapped_and_broken_values(self):
+        """Test that records with multi-line values or awkward keys match too"""
+        data = [
+            {"text": "word " * 30, "id": 1},
+            {"text": "x" * 100, "quoted": '"' + "y " * 40},
+            {"text": "line\nbreak", "nel": "a\x85b"},
+            {"a" * 122: 1, "b" * 123: 2, "k y": 3, "yes": 4, 5: 6, None: 7},
+            {"id": 2},
+        ]
+        assert dump_yaml(data) == pyyaml_dump(data)
+
+    def test_other_shapes(self):
+        """Test that other documents, and repeated records, are dumped by PyYAML"""
+        shared = {"a": 1}
+        nel = [{"a": {"b": "x\x85y"}}]
+        for data in ([], {}, [{}], [1, 2], [{"a": {"b": 1}}], [{"a": [1]}], "x", [shared, shared], nel):
+            assert dump_yaml(data) == pyyaml_dump(data)
+
+    def test_stream(self):
+        """Test writing to a stream and through json_to_yaml"""
+        data = [{"id": i, "name": f"n{i}", "load": i / 3} for i in range(5)]
+        output = io.StringIO()
+        assert dump_yaml(data, output) is None
+        assert output.getvalue() == pyyaml_dump(data) == json_to_yaml(data)
+        assert yaml.safe_load(output.getvalue()) == data
+
+
+class TestYamlFiles:
+    """Test converting YAML files through the event-stream reader"""
+
+    def test_list_to_csv(self, tmp_path):
+        """Test that a YAML list is written to CSV item by item, with rounding"""
+        src = tmp_path / "in.yaml"
+        src.write_text("- id: 1\n  m: {cpu: 0.123}\n- id: 2\n  m: {cpu: 0.5}\n", encoding="utf-8")
+        convert_file(str(src), str(tmp_path / "out.csv"), 'yaml', 'csv', precision=1)
+        assert (tmp_path / "out.csv").read_bytes() == b"id,m.cpu\r\n1,0.1\r\n2,0.5\r\n"
+
+    def test_documents_to_json(self, tmp_path):
+        """Test that other roots are loaded whole"""
+        for text, expected in (("a: [1, 2]\n", {"a": [1, 2]}), ("", {}), ("- x\n", ["x"])):
+            src = tmp_path / "in.yaml"
+            src.write_text(text, encoding="utf-8")
+            convert_file(str(src), str(tmp_path / "out.json"), 'yaml', 'json')
+            assert json.loads((tmp_path / "out.json").read_text(encoding="utf-8")) == expected
@@ -1,10 +1,122 @@
 """
 Token counting utilities using tiktoken for LLM token estimation
+
+Encodings are loaded once per process and kept by encoding name, and the
+encoding of each model is looked up once. Loading a BPE file takes seconds
+the first time (it may be downloaded), so servers and CLIs call
+``warm_up`` when they start; ``encoder_metrics`` reports the load times.
+
+``count_tokens_batch`` counts several texts at once with tiktoken's
+multi-threaded ``encode_batch``, splitting large texts into line-aligned
+chunks so a single big document is spread over every core as well.
+
+``LineTokenCounter`` keeps the counts of the line segments of texts it has
+seen in an LRU cache, so counting a document again after a small edit only
+encodes the lines that changed.
 """
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Dict, Iterable, List, Optional, Pattern, Sequence
+
 import tiktoken
+from tiktoken.model import encoding_name_for_model
+
+DEFAULT_MODEL = "gpt-4"
+# Encoding for models tiktoken does not know (used by GPT-4 and GPT-3.5)
+FALLBACK_ENCODING = "cl100k_base"
+
+_encodings: Dict[str, tiktoken.Encoding] = {}
+# Encoding name of each model looked up
+_model_encodings: Dict[str, str] = {}
+# Seconds each encoding took to load
+_load_seconds: Dict[str, float] = {}
+_load_lock = threading.Lock()
+
+# Characters per chunk when a large text is counted in parallel
+TOKEN_CHUNK_CHARS = 256 * 1024
+# Below this many characters in all, texts are encoded on the calling thread
+PARALLEL_MIN_CHARS = 64 * 1024
+# Places where text can be split and still count as many tokens as whole.
+# No split pattern makes a token across a line break that is followed by
+# text, but patterns ending in ``\s+(?!\S)`` (gpt2, r50k, p50k) split a
+# whitespace run differently at the end of a text, so the line break must
+# follow text too.
+_STRICT_BOUNDARY = re.compile(r'(?<=\S\n)(?=\S)')
+# Patterns that take every run of whitespace ending in a line break first
+# (``\s*[\r\n]+``: cl100k_base, o200k_base) can be split after any line
+# break that is followed by a line with text, indented or not
+_LINE_BOUNDARY = re.compile(r'(?<=\n)(?=[^\S\r\n]*\S)')
+# Line segments whose counts LineTokenCounter keeps
+LINE_CACHE_SIZE = 1 << 18
+# Bytes of the digest a segment's count is kept under
+_SEGMENT_DIGEST_SIZE = 16
+
+
+def get_encoding(name: str) -> tiktoken.Encoding:
+    """
+    Return the tiktoken encoding ``name``, loading it on first use.
+
+    Threads asking for an encoding that is being loaded wait for it rather
+    than load it again. A failed load (e.g. offline) raises and is retried
+    on the next call.
+    """
+    encoding = _encodings.get(name)
+    if encoding is None:
+        with _load_lock:
+            encoding = _encodings.get(name)
+            if encoding is None:
+                start = time.perf_counter()
+                encoding = tiktoken.get_encoding(name)
+                _load_seconds[name] = time.perf_counter() - start
+                _encodings[name] = encoding
+    return encoding
+
 
+def encoding_for_model(model: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """Return the encoding of ``model``, or ``FALLBACK_ENCODING`` for models tiktoken does not know"""
+    name = _model_encodings.get(model)
+    if name is None:
+        try:
+            name = encoding_name_for_model(model)
+        except KeyError:
+            name = FALLBACK_ENCODING
+        _model_encodings[model] = name
+    return get_encoding(name)
 
-def count_tokens(text: str, model: str = "gpt-4") -> int:
+
+def warm_up(models: Iterable[str] = (DEFAULT_MODEL,), background: bool = False) -> None:
+    """
+    Load the encodings of ``models`` now, so no request waits for them.
+
+    With ``background``, they are loaded in a daemon thread and this
+    returns at once. Encodings that cannot be loaded are left for the first
+    call that needs them.
+    """
+    models = list(models)
+
+    def load() -> None:
+        for model in models:
+            try:
+                encoding_for_model(model)
+            except Exception:
+                pass
+
+    if background:
+        threading.Thread(target=load, name="tokenizer-warm-up", daemon=True).start()
+    else:
+        load()
+
+
+def encoder_metrics() -> Dict[str, Dict[str, float]]:
+    """Return the loaded encodings with the seconds each took to load"""
+    return {name: {'load_seconds': round(seconds, 4)} for name, seconds in _load_seconds.items()}
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
     """
     Count tokens in text using tiktoken.
     
@@ -15,18 +127,149 @@ def count_tokens(text: str, model: str = "gpt-4") -> int:
     Returns:
         Number of tokens
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(text))
-    except Exception:
-        # Fallback to cl100k_base encoding (used by GPT-4 and GPT-3.5)
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
+    return len(encoding_for_model(model).encode(text))
+
+
+def chunk_boundary(encoding: tiktoken.Encoding) -> Pattern:
+    """Return the places where ``encoding`` counts text split there as whole"""
+    return _LINE_BOUNDARY if r'\s*[\r\n]+' in encoding._pat_str else _STRICT_BOUNDARY
+
+
+def split_chunks(text: str, size: int = TOKEN_CHUNK_CHARS, boundary: Pattern = _STRICT_BOUNDARY) -> List[str]:
+    """
+    Split ``text`` into chunks of about ``size`` characters whose token
+    counts add up to that of ``text``.
+
+    Chunks end at a ``boundary`` (see ``chunk_boundary``); the default one
+    holds for every encoding. A text with no boundary stays whole.
+    """
+    chunks = []
+    start = 0
+    while len(text) - start > size:
+        split = boundary.search(text, start + size)
+        if split is None:
+            break
+        chunks.append(text[start:split.start()])
+        start = split.start()
+    chunks.append(text[start:])
+    return chunks
+
+
+def _encode_counts(encoding: tiktoken.Encoding, chunks: List[str], num_threads: Optional[int] = None) -> List[int]:
+    """Return the token count of each chunk, encoding them in parallel when they are large enough"""
+    if sum(map(len, chunks)) < PARALLEL_MIN_CHARS or len(chunks) < 2:
+        return [len(encoding.encode(chunk)) for chunk in chunks]
+    threads = min(len(chunks), num_threads or os.cpu_count() or 1)
+    return list(map(len, encoding.encode_batch(chunks, num_threads=threads)))
+
+
+def count_tokens_batch(
+    texts: Sequence[str], model: str = DEFAULT_MODEL, num_threads: Optional[int] = None
+) -> List[int]:
+    """
+    Count tokens in several texts at once; the counts are those of
+    ``count_tokens`` for each text.
+
+    Texts longer than ``TOKEN_CHUNK_CHARS`` are split into line-aligned
+    chunks (``split_chunks``) and all chunks are encoded together with
+    ``encode_batch`` on ``num_threads`` threads (default: one per CPU).
+    Small batches are encoded on the calling thread.
+    """
+    encoding = encoding_for_model(model)
+    boundary = chunk_boundary(encoding)
+    chunks = []
+    # Chunks of each text, as the end index of its chunks in ``chunks``
+    ends = []
+    for text in texts:
+        chunks.extend(split_chunks(text, TOKEN_CHUNK_CHARS, boundary) if len(text) > TOKEN_CHUNK_CHARS else [text])
+        ends.append(len(chunks))
+    counts = _encode_counts(encoding, chunks, num_threads)
+    start = 0
+    totals = []
+    for end in ends:
+        totals.append(sum(counts[start:end]))
+        start = end
+    return totals
+
+
+class LineTokenCounter:
+    """
+    Token counter that remembers the counts of the lines it has encoded.
+
+    Texts are split into segments at every ``chunk_boundary`` of the
+    model's encoding (single lines for cl100k_base, which the encoding
+    counts the same apart as together), and the count of each segment is
+    kept in an LRU cache of ``maxsize`` segments. The cache is keyed on a
+    16-byte BLAKE2b digest of the segment rather than its text, so its size
+    does not grow with the length of the lines counted. Counting a text
+    encodes only the segments not in the cache, so the totals equal
+    ``count_tokens`` while an edit to one row of a large table re-encodes
+    a line or two. Instances can be shared between threads.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, maxsize: int = LINE_CACHE_SIZE):
+        self.encoding = encoding_for_model(model)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._boundary = chunk_boundary(self.encoding)
+        self._counts: 'OrderedDict[bytes, int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Count the tokens of ``text``"""
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: Sequence[str], num_threads: Optional[int] = None) -> List[int]:
+        """Count the tokens of several texts, encoding the segments not cached together (see ``count_tokens_batch``)"""
+        split = [[(_segment_key(segment), segment) for segment in self._boundary.split(text)] for text in texts]
+        counts = self._counts
+        with self._lock:
+            missing = {key: segment for segments in split for key, segment in segments if key not in counts}
+        found = dict(zip(missing, _encode_counts(self.encoding, list(missing.values()), num_threads)))
+        with self._lock:
+            totals = []
+            for segments in split:
+                total = 0
+                for key, segment in segments:
+                    count = counts.get(key)
+                    if count is None:
+                        count = found.get(key)
+                        if count is None:
+                            # Evicted by another thread since it was looked up
+                            count = found[key] = len(self.encoding.encode(segment))
+                        counts[key] = count
+                        self.misses += 1
+                    else:
+                        counts.move_to_end(key)
+                        self.hits += 1
+                    total += count
+                totals.append(total)
+            while len(counts) > self.maxsize:
+                counts.popitem(last=False)
+        return totals
+
+
+def _segment_key(segment: str) -> bytes:
+    """Return the key ``LineTokenCounter`` keeps the count of ``segment`` under"""
+    return blake2b(segment.encode('utf-8', 'surrogatepass'), digest_size=_SEGMENT_DIGEST_SIZE).digest()
+
+
+_line_counters: Dict[str, LineTokenCounter] = {}
+
+
+def line_counter(model: str = DEFAULT_MODEL) -> LineTokenCounter:
+    """Return the process-wide ``LineTokenCounter`` of ``model``"""
+    counter = _line_counters.get(model)
+    if counter is None:
+        counter = _line_counters.setdefault(model, LineTokenCounter(model))
+    return counter
 
 
-def count_tokens_for_formats(formats_dict: dict, model: str = "gpt-4") -> dict:
+def count_tokens_for_formats(formats_dict: dict, model: str = DEFAULT_MODEL) -> dict:
     """
-    Count tokens for all formats.
+    Count tokens for all formats, re-encoding only the lines not counted
+    before (see ``LineTokenCounter``).
     
     Args:
         formats_dict: Dictionary with format names as keys and content as values
@@ -35,12 +278,10 @@ def count_tokens_for_formats(formats_dict: dict, model: str = "gpt-4") -> dict:
     Returns:
         Dictionary with token counts for each format
     """
-    token_counts = {}
-    for format_name, content in formats_dict.items():
-        if content:
-            token_counts[format_name] = count_tokens(content, model)
-        else:
-            token_counts[format_name] = 0
+    token_counts = dict.fromkeys(formats_dict, 0)
+    names = [format_name for format_name, content in formats_dict.items() if content]
+    counts = line_counter(model).count_batch([formats_dict[format_name] for format_name in names]) if names else []
+    token_counts.update(zip(names, counts))
     
     return token_counts
 
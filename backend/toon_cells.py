@@ -0,0 +1,189 @@
+"""
+Cell-level tokenizing and decoding for TOON rows.
+
+Shared by every TOON row loader (the Flask backend and the CLI scripts under
+``llm/``) so there is exactly one implementation to keep fast and correct.
+"""
+import ast
+import json
+import re
+from functools import lru_cache
+from typing import Any, List, Optional
+
+# Characters that matter outside / inside a bracketed span
+_TOP_LEVEL_SPECIAL = re.compile(r"""[,'"{}\[\]()]""")
+_NESTED_SPECIAL = re.compile(r"""['"{}\[\]()]""")
+# Runs of text (including complete quoted strings) that cannot change state
+_TOP_LEVEL_SKIP = re.compile(r"""(?:[^,'"{}\[\]()]+|'[^']*'|"[^"]*")*""")
+_NESTED_SKIP = re.compile(r"""(?:[^'"{}\[\]()]+|'[^']*'|"[^"]*")*""")
+_BRACKETS = {'{': (0, 1), '}': (0, -1), '[': (1, 1), ']': (1, -1), '(': (2, 1), ')': (2, -1)}
+
+# Deepest bracket nesting matched by _CELL; deeper rows use the scanner
+_CELL_NESTING = 3
+
+
+def _compile_cell(nesting: int) -> "re.Pattern[str]":
+    """
+    Build a regex matching one whole top-level cell with properly nested
+    brackets up to ``nesting`` levels deep.
+
+    Inside brackets plain text is matched one character per repetition so
+    every position has exactly one viable alternative; this keeps a missing
+    closing bracket from triggering exponential backtracking.
+    """
+    quoted = r"""'[^']*'|"[^"]*["]"""
+    inner = rf"""[^'"{{}}\[\]()]|{quoted}"""
+    for _ in range(nesting):
+        group = rf"(?:{inner})*"
+        inner = rf"""[^'"{{}}\[\]()]|{quoted}|\{{{group}\}}|\[{group}\]|\({group}\)"""
+    group = rf"(?:{inner})*"
+    return re.compile(
+        rf"""(?:[^,'"{{}}\[\]()]+|{quoted}|\{{{group}\}}|\[{group}\]|\({group}\))*"""
+    )
+
+
+_CELL = _compile_cell(_CELL_NESTING)
+
+
+def split_top_level(line: str) -> List[str]:
+    """
+    Split a line on commas, but only at top level (not inside {...}, [...], (...), or quotes).
+
+    Instead of visiting every character, each cell is consumed by a single
+    regex match that skips plain text, quoted strings and bracketed spans in
+    one step. Rows the regex cannot handle fall back to a scanner that jumps
+    between state-changing characters. Quotes are not escapable and an
+    unmatched closing bracket is ignored, matching the character loop this
+    replaces. Cells are stripped; a trailing empty cell (line ending in ``,``)
+    is dropped.
+    """
+    match = _TOP_LEVEL_SPECIAL.search(line)
+    if match is None:
+        return [line.strip()] if line else []
+
+    if _NESTED_SPECIAL.search(line, match.start()) is None:
+        # Only plain commas: let str.split do the work
+        parts = line.split(',')
+        if not parts[-1]:
+            parts.pop()
+        return [part.strip() for part in parts]
+
+    # Common case: one regex match per cell
+    parts = []
+    pos = 0
+    end = len(line)
+    match_cell = _CELL.match
+    while True:
+        cell_end = match_cell(line, pos).end()
+        if cell_end == end:
+            if pos < end:
+                parts.append(line[pos:].strip())
+            return parts
+        if line[cell_end] != ',':
+            # Unbalanced brackets, unterminated quote or very deep nesting
+            return _scan_top_level(line)
+        parts.append(line[pos:cell_end].strip())
+        pos = cell_end + 1
+
+
+def _scan_top_level(line: str) -> List[str]:
+    """Slow path of ``split_top_level`` that tracks bracket depth explicitly"""
+    parts = []
+    start = 0
+    end = len(line)
+    depth = [0, 0, 0]
+    skip = _TOP_LEVEL_SKIP.match
+    pos = skip(line).end()
+
+    while pos < end:
+        ch = line[pos]
+        if ch == ',':
+            parts.append(line[start:pos].strip())
+            start = pos + 1
+        elif ch == "'" or ch == '"':
+            # Unterminated quote: nothing after it can split
+            break
+        else:
+            kind, step = _BRACKETS[ch]
+            if step > 0:
+                depth[kind] += 1
+                skip = _NESTED_SKIP.match
+            elif depth[kind]:
+                depth[kind] -= 1
+                if not any(depth):
+                    skip = _TOP_LEVEL_SKIP.match
+        pos = skip(line, pos + 1).end()
+
+    if start < end:
+        parts.append(line[start:].strip())
+    return parts
+
+
+# One token of the Python literal subset that has a direct JSON spelling:
+# quoted strings without escapes, JSON-shaped numbers, keywords, punctuation
+_LITERAL_TOKEN = r"""\s+|'[^'"\\]*'|"[^"\\]*"|-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?|True|False|None|[{}\[\]:,]"""
+_JSON_COMPATIBLE = re.compile(f"(?:{_LITERAL_TOKEN})*")
+_NEEDS_REWRITE = re.compile(r"""(True|False|None)|'([^'"\\]*)'|("[^"\\]*")""")
+_KEYWORDS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+_decode_json = json.JSONDecoder().decode
+
+
+def _rewrite_token(match: "re.Match[str]") -> str:
+    keyword, single, double = match.groups()
+    if keyword is not None:
+        return _KEYWORDS[keyword]
+    if single is not None:
+        return f'"{single}"'
+    return double
+
+
+def _literal_as_json(text: str) -> Optional[str]:
+    """Spell a Python literal as JSON, or return None if it has no direct equivalent"""
+    if _JSON_COMPATIBLE.fullmatch(text) is None:
+        return None
+    if '"' in text or 'True' in text or 'False' in text or 'None' in text:
+        return _NEEDS_REWRITE.sub(_rewrite_token, text)
+    # Only single-quoted strings (which contain no double quotes) to convert
+    return text.replace("'", '"')
+
+
+@lru_cache(maxsize=4096)
+def _decode_literal(text: str) -> Any:
+    as_json = _literal_as_json(text)
+    if as_json is not None:
+        try:
+            return _decode_json(as_json)
+        except ValueError:
+            # e.g. tuples, sets, non-string keys, trailing commas
+            pass
+    return ast.literal_eval(text)
+
+
+def _clone(value: Any) -> Any:
+    """Copy the mutable containers of a decoded literal, sharing the leaves"""
+    if isinstance(value, dict):
+        return {k: _clone(v) if isinstance(v, (dict, list, set)) else v for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) if isinstance(v, (dict, list, set)) else v for v in value]
+    if isinstance(value, set):
+        return set(value)
+    if isinstance(value, tuple):
+        return tuple(map(_clone, value))
+    return value
+
+
+def parse_literal(text: str) -> Any:
+    """
+    Drop-in replacement for ``ast.literal_eval`` on structured TOON cells.
+
+    The dict / list / string / number / ``True`` / ``False`` / ``None`` subset
+    used by the exported ``metrics`` and ``tags`` columns is rewritten into
+    JSON and handed to the C JSON decoder, which is much cheaper than building
+    an AST. Anything else (escapes, tuples, sets, non-string keys, ...) goes
+    through ``ast.literal_eval`` itself, so results and errors are unchanged.
+
+    Decoded cells are cached by text; every call returns fresh containers, so
+    callers may mutate the result.
+    """
+    return _clone(_decode_literal(text))
@@ -0,0 +1,434 @@
+"""
+Incremental TOON decoder.
+
+Reads TOON from a path, a text stream or any iterator of lines and yields the
+document piece by piece instead of materialising it: row dicts for the tabular
+``[count]{keys}:`` form, ``(path, value)`` events for path notation. Only the
+current line is held in memory, so large exports can be filtered or aggregated
+as they are read. ``multi_converter.toon_to_json`` is built on top of this.
+"""
+import os
+import re
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from column_types import (
+    cell_converter,
+    decode_rows,
+    drop_absent,
+    infer_column_types,
+    split_optional_fields,
+    split_typed_fields,
+)
+from toon_paths import (
+    REFERENCES,
+    column_nester,
+    parse_key_aliases,
+    parse_reference,
+    substitute_key_part,
+    substitute_keys,
+    unquote_column,
+)
+
+_WHITESPACE = re.compile(r'\s')
+# ``path[count]{keys}:`` opening a nested tabular block in path notation
+_BLOCK_HEADER = re.compile(r'([^:]+)\[(\d+)\]\{([^{}]*)\}:')
+
+ToonSource = Union[str, "os.PathLike[str]", Iterable[str]]
+
+
+def parse_value(value_str: str) -> Any:
+    """Parse a simple value string"""
+    if not value_str:
+        return None
+    value_str = value_str.strip()
+    # Try to parse as number
+    try:
+        # Check if it's a float (has decimal point and is numeric)
+        if '.' in value_str and value_str.replace('.', '').replace('-', '').isdigit():
+            return float(value_str)
+        # Check if it's an integer
+        if value_str.replace('-', '').isdigit():
+            return int(value_str)
+    except ValueError:
+        pass
+    # Try boolean
+    if value_str.lower() == 'true':
+        return True
+    if value_str.lower() == 'false':
+        return False
+    # Try null
+    if value_str.lower() == 'none' or value_str.lower() == 'null':
+        return None
+    # Return as string
+    return value_str
+
+
+def split_row(line: str) -> List[str]:
+    """Split a tabular row on commas"""
+    values = line.split(',')
+    if _WHITESPACE.search(line) is None:
+        # Nothing to strip
+        return values
+    return [v.strip() for v in values]
+
+
+def parse_typed_header(line: str) -> Optional[Tuple[int, List[str], Optional[List[str]]]]:
+    """
+    Parse a ``[count]{key1,key2,...}:`` header line, optionally typed as
+    ``[count]{key1:int,key2:str,...}:``.
+
+    Returns ``(count, keys, types)`` or ``None`` if the line is not a tabular
+    header; ``types`` is ``None`` unless every key declares a column type.
+    """
+    line = line.strip()
+    if not (line.startswith('[') and ']{' in line and line.endswith(':')):
+        return None
+    if line[line.index(']') + 1] != '{':
+        # A path such as ``[0].items[2]{a,b}:`` opening a nested block
+        return None
+    count = int(line[1:line.index(']')])
+    keys_start = line.index('{') + 1
+    keys_end = line.index('}')
+    keys, types = split_typed_fields(k.strip() for k in line[keys_start:keys_end].split(','))
+    return count, keys, types
+
+
+def parse_header(line: str) -> Optional[Tuple[int, List[str]]]:
+    """
+    Parse a ``[count]{key1,key2,...}:`` header line.
+
+    Returns ``(count, keys)`` or ``None`` if the line is not a tabular header.
+    Column types in a typed header are dropped.
+    """
+    header = parse_typed_header(line)
+    if header is None:
+        return None
+    return header[0], header[1]
+
+
+def resolve_columns(fields: List[str]) -> Tuple[List[str], Optional[Callable[[dict], dict]]]:
+    """
+    Resolve header names into row keys and a function finishing each row.
+
+    Optional columns (``email?``) lose their marker and their ``ABSENT``
+    cells, then dotted columns are rebuilt into nested objects; quoted names
+    (``"x.y"``) are keys as they are. The function is ``None`` when rows
+    need neither step.
+    """
+    names, optional = split_optional_fields(fields)
+    literal: List[str] = []
+    if any(name[:1] == '"' for name in names):
+        keys = list(map(unquote_column, names))
+        literal = [key for name, key in zip(names, keys) if key != name]
+        names = keys
+        optional = list(map(unquote_column, optional))
+    nest = column_nester(names, sparse=bool(optional), literal=literal)
+    if not optional:
+        return names, nest
+    drop = partial(drop_absent, optional)
+    if nest is None:
+        return names, drop
+    return names, lambda row: nest(drop(row))
+
+
+def iter_lines(source: ToonSource) -> Iterator[str]:
+    """Yield lines from a file path, a text stream or an iterable of lines"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from f
+    else:
+        yield from source
+
+
+class ToonReader:
+    """
+    Incremental reader over a TOON document.
+
+    The first non-blank line is read on construction to decide the layout:
+    ``fields`` holds the column names for a tabular document and is ``None``
+    for path notation. Iterating the reader then yields one row dict per data
+    line (tabular) or one ``(path, value)`` event per line (path notation; a
+    bare value without a path is reported with an empty path). Rows of a
+    nested ``path[count]{keys}:`` block are reported as ``(path[i], row)``.
+    An inline array ``tags[]:a,b,c`` is reported as ``('tags', [a, b, c])``.
+    Dotted column names (``metrics.cpu``) are rebuilt into nested objects, quoted
+    ones (``"x.y"``) are kept as keys, and keys whose optional column (``email?``)
+    holds the absent marker are left out.
+    Key aliases declared by a leading ``@keys{...}`` line are expanded in
+    headers and paths (``aliases`` maps each alias to its key). After a
+    leading ``@refs`` line (``references``), a ``path=target`` line is
+    reported as ``(path, Reference(target))``.
+
+    With the default ``parse``, tabular columns are converted with per-column
+    types (see ``column_types``) taken from a typed header or, when reading in
+    batches, inferred from the first batch. The values are the same either way.
+
+    Args:
+        source: File path, text stream or iterable of lines
+        split: Splits a tabular row into its stripped cell strings
+        parse: Converts a cell / value string into a Python value
+        strict: Raise ``ValueError`` on malformed input instead of skipping it.
+            Strict mode also requires the document to be tabular and tolerates
+            a trailing comma at the end of each row.
+        batch_size: Decode tabular rows column by column, this many at a time.
+            Rows are then read one batch ahead of the consumer. ``0`` decodes
+            each row as soon as its line is read.
+    """
+
+    def __init__(
+        self,
+        source: ToonSource,
+        split: Callable[[str], List[str]] = split_row,
+        parse: Callable[[str], Any] = parse_value,
+        strict: bool = False,
+        batch_size: int = 0,
+    ):
+        self.split = split
+        self.parse = parse
+        self.strict = strict
+        self.batch_size = batch_size
+        self.count: Optional[int] = None
+        self.fields: Optional[List[str]] = None
+        self.types: Optional[List[str]] = None
+        self._finish: Optional[Callable[[dict], dict]] = None
+        self.aliases: Optional[Dict[str, str]] = None
+        self.references = False
+        self._lines = iter_lines(source)
+        self._first = self._next_line()
+
+        # Leading @keys{...} / @refs lines
+        while self._first is not None:
+            aliases = parse_key_aliases(self._first)
+            if aliases is None and self._first != REFERENCES:
+                break
+            first = self._next_line()
+            if first is None:
+                # Nothing follows: the line is a bare root value
+                break
+            if aliases is None:
+                self.references = True
+            else:
+                self.aliases = aliases
+            self._first = first
+
+        if self._first is None:
+            if strict:
+                raise ValueError("TOON file is empty.")
+            return
+
+        first = self._first if self.aliases is None else substitute_keys(self.aliases, self._first)
+        header = parse_typed_header(first)
+        if header is not None:
+            self.count, self.fields, self.types = header
+            self._first = None
+        elif strict:
+            raise ValueError("Unrecognized TOON header format.")
+
+        if strict:
+            if self.types is not None:
+                self.types = [t for f, t in zip(self.fields, self.types) if f]
+            self.fields = [f for f in self.fields if f]
+            if not self.fields:
+                raise ValueError("No fields found in TOON header.")
+        if self.fields is not None:
+            self.fields, self._finish = resolve_columns(self.fields)
+
+    @property
+    def flat(self) -> bool:
+        """Whether the document is tabular with rows holding one value per field"""
+        return self.fields is not None and self._finish is None
+
+    def _next_line(self) -> Optional[str]:
+        """Return the next non-blank line, stripped"""
+        for line in self._lines:
+            if line.strip():
+                return line.strip()
+        return None
+
+    def __iter__(self) -> Iterator[Union[dict, Tuple[str, Any]]]:
+        if self.fields is not None:
+            if self._finish is not None:
+                return map(self._finish, self._iter_rows())
+            return self._iter_rows()
+        return self._iter_paths()
+
+    def __enter__(self) -> "ToonReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the underlying file when reading from a path"""
+        self._lines.close()
+
+    def _iter_rows(self) -> Iterator[dict]:
+        fields = self.fields
+        parse = self.parse
+        cells = self.iter_cells()
+
+        if parse is not parse_value:
+            # Column types describe parse_value's results only
+            for values in cells:
+                yield dict(zip(fields, map(parse, values)))
+            return
+
+        if self.batch_size > 0:
+            types = self.types
+            while True:
+                batch = list(islice(cells, self.batch_size))
+                if not batch:
+                    return
+                if types is None:
+                    # Infer once, from the first batch
+                    types = infer_column_types(batch, len(fields))
+                yield from decode_rows(fields, batch, types, parse)
+
+        if self.types is None:
+            for values in cells:
+                yield dict(zip(fields, map(parse, values)))
+            return
+
+        converters = [cell_converter(t, parse) for t in self.types]
+        for values in cells:
+            yield dict(zip(fields, [convert(v) for convert, v in zip(converters, values)]))
+
+    def iter_cells(self) -> Iterator[List[str]]:
+        """
+        Yield the cell strings of each valid data row of a tabular document,
+        in header order and without converting them to values.
+        """
+        fields = self.fields
+        split = self.split
+        strict = self.strict
+
+        for line in self._lines:
+            line = line.strip()
+            if not line:
+                continue
+            if strict:
+                if line.endswith(','):
+                    line = line[:-1]
+            elif line.startswith('['):
+                # Skip other format lines
+                continue
+
+            values = split(line)
+            if len(values) != len(fields):
+                if strict:
+                    raise ValueError(
+                        f"TOON row has {len(values)} columns but header has {len(fields)} fields."
+                    )
+                continue
+            yield values
+
+    def _iter_paths(self) -> Iterator[Tuple[str, Any]]:
+        parse = self.parse
+        aliases = self.aliases
+        references = self.references
+        lines = self._lines
+        if self._first is not None:
+            lines = _chain_first(self._first, lines)
+            self._first = None
+
+        for line in lines:
+            line = line.rstrip()
+            if not line:
+                continue
+            if ':' not in line:
+                if references:
+                    reference = parse_reference(line if aliases is None else substitute_keys(aliases, line))
+                    if reference is not None:
+                        yield reference
+                        continue
+                # Root value without path
+                yield '', parse(line)
+                return
+            if aliases is not None:
+                line = substitute_key_part(aliases, line)
+            if line.endswith('}:'):
+                block = _BLOCK_HEADER.fullmatch(line)
+                if block is not None:
+                    yield from self._iter_block(lines, *block.groups())
+                    continue
+            path, value_str = line.split(':', 1)
+            if path[-2:] == '[]' and len(path) > 2:
+                # Inline array
+                yield path[:-2], list(map(parse, self.split(value_str.strip())))
+                continue
+            yield path, parse(value_str)
+
+    def _iter_block(self, lines: Iterator[str], path: str, count: str, keys: str) -> Iterator[Tuple[str, dict]]:
+        """Yield ``(path[i], row)`` for the ``count`` rows following a nested block header"""
+        fields, finish = resolve_columns([k.strip() for k in keys.split(',')])
+        split = self.split
+        parse = self.parse
+        remaining = int(count)
+        index = 0
+        if not remaining:
+            return
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            values = split(line)
+            if len(values) == len(fields):
+                row = dict(zip(fields, map(parse, values)))
+                yield f"{path}[{index}]", row if finish is None else finish(row)
+                index += 1
+            remaining -= 1
+            if not remaining:
+                return
+
+
+def _chain_first(first: str, rest: Iterator[str]) -> Iterator[str]:
+    yield first
+    yield from rest
+
+
+def iter_toon(source: ToonSource, **kwargs) -> Iterator[Union[dict, Tuple[str, Any]]]:
+    """
+    Decode TOON incrementally.
+
+    Yields row dicts for the tabular form and ``(path, value)`` events for
+    path notation. Keyword arguments are passed to ``ToonReader``.
+    """
+    with ToonReader(source, **kwargs) as reader:
+        yield from reader
+
+
+def iter_toon_rows(source: ToonSource, **kwargs) -> Iterator[dict]:
+    """
+    Yield the rows of a tabular TOON document one at a time.
+
+    Raises ``ValueError`` if the document is not in the ``[count]{keys}:`` form.
+    Keyword arguments are passed to ``ToonReader``.
+    """
+    with ToonReader(source, **kwargs) as reader:
+        if reader.fields is None:
+            raise ValueError("Unrecognized TOON header format.")
+        yield from reader
+
+
+def parse_dotted_leaves(row: dict, parse: Callable[[str], Any] = parse_value) -> dict:
+    """
+    Convert the leaves of the objects rebuilt from dotted columns in a row
+    read with ``parse=str``.
+
+    Cells of the row's own columns are left as strings; the cells of
+    ``metrics.cpu``-style columns, which only exist to carry a nested
+    object, are converted with ``parse`` as the whole object would be.
+    """
+    for key, value in row.items():
+        if isinstance(value, dict):
+            row[key] = _parse_leaves(value, parse)
+    return row
+
+
+def _parse_leaves(obj: dict, parse: Callable[[str], Any]) -> dict:
+    return {
+        key: _parse_leaves(value, parse) if isinstance(value, dict) else parse(value)
+        for key, value in obj.items()
+    }
@@ -0,0 +1,579 @@
+"""
+Streaming TOON encoder.
+
+Produces TOON output one line at a time so large documents can be written to a
+file-like sink without building the whole string (or a list of every line) in
+memory first. ``multi_converter.json_to_toon`` is a thin wrapper around this.
+"""
+import re
+from collections import Counter
+from functools import partial
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from column_types import ABSENT, value_type
+from shared_subtrees import share_subtrees
+from toon_paths import REFERENCES, format_key_aliases, key_words, quote_column, substitute_keys
+
+# Characters that would break a column name in a nested block header
+_UNSAFE_KEY = re.compile(r'[,{}\[\]:."\'\n\r]|^\s|\s$|^$')
+# Block paths that would not read back as the same parts
+_UNSAFE_PATH = re.compile(r':|^\s|\s$|\.$')
+# Cells that would not survive a row split: separators, line breaks, padding
+_UNSAFE_CELL = re.compile(r'[,\n\r]|^\s|\s$')
+# The same for union-table cells, which may also start a row: a leading
+# ``[`` would read as a path line
+_UNSAFE_UNION_CELL = re.compile(r'[,\n\r]|^\s|\s$|^\[')
+# The same for a whole joined row, once separators have been counted
+_UNSAFE_ROW = re.compile(r'[\n\r]|(?:^|,)\s|\s(?:,|$)')
+# Paths that cannot appear on either side of a ``path=target`` line
+_UNSAFE_REFERENCE = re.compile(r'[:=\n\r]|^\s|\s$|\.$|^$')
+
+
+def format_value(val: Any) -> str:
+    """Format a scalar value for TOON output"""
+    if val is None:
+        return "null"
+    elif isinstance(val, bool):
+        return "true" if val else "false"
+    else:
+        return str(val)
+
+
+# Types whose values always format to a cell a row split reads back
+_SAFE_TYPES = frozenset((int, float, bool, type(None)))
+
+# format_value, dispatched on the exact type of the common scalars
+_FORMATTERS: Dict[type, Callable[[Any], str]] = {
+    str: str,
+    int: str,
+    float: str,
+    bool: lambda val: "true" if val else "false",
+    type(None): lambda val: "null",
+}
+# Types that ``%s`` formats like format_value, and spellings for the values of the others
+_PLAIN_TYPES = (str, int, float)
+_SPELLED_TYPES = (bool, type(None))
+_SPELLINGS = {True: "true", False: "false", None: "null"}
+
+
+def is_array_of_objects(obj: Any) -> bool:
+    """Check if list contains only dicts with same keys"""
+    if not isinstance(obj, list) or not obj:
+        return False
+    if not all(isinstance(item, dict) for item in obj):
+        return False
+    first_keys = set(obj[0].keys())
+    return all(set(item.keys()) == first_keys for item in obj)
+
+
+def iter_toon_lines(
+    json_data: Any,
+    typed_header: bool = False,
+    aliases: Optional[Dict[str, str]] = None,
+    references: bool = False,
+) -> Iterator[str]:
+    """
+    Yield the lines of the TOON encoding of ``json_data``.
+
+    Arrays of objects are emitted as a ``[count]{keys}:`` header followed by
+    one row per object (see ``table_schema`` and ``table_columns``);
+    everything else uses path notation, in which arrays of flat objects
+    become nested tabular blocks (``path[count]{keys}:`` plus indented rows)
+    and arrays of scalars are written inline (``tags[]:a,b,c``). Only the
+    current row, path or nested block is held in memory at any time.
+
+    With ``typed_header`` the header declares each column's type
+    (``{id:int,name:str}``) so decoders can skip type inference. With
+    ``aliases`` (key -> alias, see ``choose_key_aliases``) an ``@keys{...}``
+    line comes first and the keys in headers and paths use the aliases.
+    With ``references``, a subtree of path notation that repeats an earlier
+    one (see ``shared_subtrees``) is written as a ``path=target`` line after
+    an ``@refs`` line.
+    """
+    # Handle root-level primitives
+    if not isinstance(json_data, (dict, list)):
+        yield str(json_data)
+        return
+
+    shared = None
+    if references:
+        json_data, shared = _share_subtrees(json_data)
+    rename = None
+    if aliases:
+        yield format_key_aliases(aliases)
+        rename = partial(substitute_keys, aliases)
+    if shared:
+        yield REFERENCES
+    yield from _iter_lines(json_data, typed_header, rename, shared)
+
+
+def _share_subtrees(json_data: Any) -> Tuple[Any, Optional[Set[int]]]:
+    """Share the repeated subtrees of a document written in path notation"""
+    if table_schema(json_data) is not None:
+        # Root tables write every row in full, so there is nothing to refer to
+        return json_data, None
+    json_data, shared = share_subtrees(json_data)
+    return json_data, shared or None
+
+
+def _iter_lines(
+    json_data: Any,
+    typed_header: bool,
+    rename: Optional[Callable[[str], str]],
+    shared: Optional[Set[int]] = None,
+) -> Iterator[str]:
+    """
+    Yield the lines of a dict or list, passing the key part of each line
+    through ``rename`` and referencing repeats of the objects in ``shared``.
+    """
+
+    # Common case: array of flat objects with the same keys, checked while encoding
+    if not typed_header and type(json_data) is list and json_data:
+        table = _flat_table(json_data)
+        if table is not None:
+            keys, rows = table
+            header = f"[{len(json_data)}]{{{','.join(map(quote_column, keys))}}}:"
+            yield header if rename is None else rename(header)
+            yield from rows
+            return
+
+    # Special case: array of objects with the same (or overlapping) keys
+    schema = table_schema(json_data)
+    if schema is not None:
+        columns = table_columns(json_data, *schema)
+        if typed_header:
+            header = [f"{name}:{value_type(_column_values(json_data, path))}" for name, path in columns]
+        else:
+            header = [name for name, _ in columns]
+        header = f"[{len(json_data)}]{{{','.join(header)}}}:"
+        yield header if rename is None else rename(header)
+        paths = [path for _, path in columns]
+        if paths and all(len(path) == 1 for path in paths):
+            keys, optional = schema
+            values_of = _key_getter(keys)
+            if optional:
+                absent = dict.fromkeys(optional, ABSENT)
+                get_values = values_of
+                values_of = lambda item: get_values({**absent, **item})
+            yield from _iter_rows(json_data, values_of)
+        else:
+            for item in json_data:
+                yield "  " + ",".join(_cell(item, path) for path in paths)
+        return
+
+    # General case: use path notation
+    yield from _iter_path_lines(json_data, "", rename, shared)
+
+
+def choose_key_aliases(json_data: Any, typed_header: bool = False, references: bool = False) -> Dict[str, str]:
+    """
+    Pick short aliases for the keys that repeat most in the encoding of ``json_data``.
+
+    Words of the key parts (paths and headers) are counted in one encoding
+    pass. A word gets an alias (``a``, ``b``, ..., ``aa``, ...) only if its
+    uses save more characters than its ``@keys`` entry costs; aliases never
+    coincide with a word already in a key part, so decoding is exact.
+    ``references`` must match the encoding the aliases are meant for.
+    Returns ``{}`` when nothing is worth aliasing.
+    """
+    uses: Counter = Counter()
+
+    def count(text: str) -> str:
+        uses.update(key_words(text))
+        return text
+
+    if not isinstance(json_data, (dict, list)):
+        return {}
+    shared = None
+    if references:
+        json_data, shared = _share_subtrees(json_data)
+    for _ in _iter_lines(json_data, typed_header, count, shared):
+        pass
+
+    names = _alias_names(uses)
+    aliases: Dict[str, str] = {}
+    alias = next(names)
+    for word, n in sorted(uses.items(), key=lambda entry: -entry[1] * len(entry[0])):
+        if word.isdigit():
+            continue
+        if n * (len(word) - len(alias)) > len(alias) + len(word) + 2:
+            aliases[word] = alias
+            alias = next(names)
+    return aliases
+
+
+def _alias_names(taken: Dict[str, int]) -> Iterator[str]:
+    """Yield ``a`` to ``z``, then ``aa``, ``ab``, ... skipping words in ``taken``"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    names = list(letters)
+    while True:
+        for name in names:
+            if name not in taken:
+                yield name
+        names = [name + letter for name in names for letter in letters]
+
+
+def _key_getter(keys: List[Any]) -> Callable[[dict], tuple]:
+    """``itemgetter(*keys)``, always returning a tuple"""
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda item: (item[key],)
+    return itemgetter(*keys)
+
+
+def _iter_rows(items: List[dict], values_of: Callable[[dict], tuple]) -> Iterator[str]:
+    """
+    Yield one formatted row per element from the value tuples ``values_of`` returns.
+
+    Rows are formatted with a single ``%`` template per combination of value
+    types (bools and nulls spelled first), other rows value by value with
+    per-type dispatch.
+    """
+    # value types -> positions to spell before applying the template, or None
+    plans: Dict[tuple, Optional[List[int]]] = {}
+    template = None
+    formatters = _FORMATTERS
+    spellings = _SPELLINGS
+    for item in items:
+        values = values_of(item)
+        signature = tuple(map(type, values))
+        try:
+            spelled = plans[signature]
+        except KeyError:
+            if all(kind in _PLAIN_TYPES or kind in _SPELLED_TYPES for kind in signature):
+                spelled = [i for i, kind in enumerate(signature) if kind in _SPELLED_TYPES]
+            else:
+                spelled = None
+            plans[signature] = spelled
+            template = "  " + ",".join(["%s"] * len(values))
+        if spelled is None:
+            yield "  " + ",".join([formatters.get(type(val), format_value)(val) for val in values])
+            continue
+        if spelled:
+            values = list(values)
+            for i in spelled:
+                values[i] = spellings[values[i]]
+            values = tuple(values)
+        yield template % values
+
+
+def _flat_table(items: list) -> Optional[Tuple[List[str], Iterator[str]]]:
+    """
+    Return the keys and a generator of formatted rows for an array of flat
+    objects with the same keys, or None.
+
+    Each element's keys are compared with the first element's (no per-row
+    sets) before any row is formatted, so the rows can be yielded as they
+    are formatted. An element that breaks the schema, or a first row that
+    needs dotted columns, makes this return None and the caller falls back
+    to ``table_schema``.
+    """
+    first = items[0]
+    if type(first) is not dict or not first:
+        return None
+    keys = list(first)
+    if not all(type(key) is str and not key.endswith('?') for key in keys):
+        return None
+    values_of = _key_getter(keys)
+    if dict in map(type, values_of(first)):
+        return None
+    first_keys = first.keys()
+    for item in items:
+        if type(item) is not dict or item.keys() != first_keys:
+            return None
+    return keys, _iter_rows(items, values_of)
+
+
+def table_schema(items: Any) -> Optional[Tuple[List[Any], List[Any]]]:
+    """
+    Return ``(keys, optional keys)`` if ``items`` can be written as a table.
+
+    Uniform arrays of objects use the keys of the first object. Objects with
+    differing keys use the union of their keys in first-seen order; keys some
+    objects lack become optional columns (``email?``) whose missing cells
+    hold ``ABSENT``. That is only done while at least half of the cells are
+    filled, every cell is a scalar (or a leaf of a dotted column) that
+    survives a row split, no row is blank and no optional value would read
+    back as the marker; otherwise the array stays in path notation. Keys
+    ending in ``?`` always do.
+    """
+    if not isinstance(items, list) or not items:
+        return None
+    if not all(isinstance(item, dict) for item in items):
+        return None
+    if is_array_of_objects(items):
+        keys = list(items[0].keys())
+        if any(isinstance(key, str) and key.endswith('?') for key in keys):
+            return None
+        return keys, []
+
+    keys = list(dict.fromkeys(key for item in items for key in item))
+    if not all(isinstance(key, str) and not _UNSAFE_KEY.search(key) and not key.endswith('?') for key in keys):
+        return None
+    if 2 * sum(map(len, items)) < len(keys) * len(items):
+        return None
+    optional = [key for key in keys if not all(key in item for item in items)]
+    for key in optional:
+        for item in items:
+            value = item.get(key)
+            if isinstance(value, str) and value.strip() == ABSENT:
+                return None
+    # Cells must be scalars (or leaves of dotted columns) to read back as values
+    # and to survive a row split
+    paths = [path for _, path in table_columns(items, keys, optional)]
+    unsafe = _UNSAFE_UNION_CELL.search
+    single = len(paths) == 1
+    for item in items:
+        for path in paths:
+            if path[0] not in item:
+                continue
+            value = _lookup(item, path)
+            if type(value) in _SAFE_TYPES:
+                continue
+            if isinstance(value, (dict, list)):
+                return None
+            cell = format_value(value)
+            if unsafe(cell) or (single and not cell):
+                # A lone empty cell would read back as a blank line
+                return None
+    return keys, optional
+
+
+def table_columns(
+    items: List[dict],
+    keys: Optional[List[Any]] = None,
+    optional: List[Any] = (),
+) -> List[Tuple[Any, Tuple[Any, ...]]]:
+    """
+    Return ``(header name, key path)`` for each column of an array of objects.
+
+    ``keys`` defaults to the keys of the first object; names of ``optional``
+    keys get a ``?`` suffix. A required key whose value is, in every row, a
+    non-empty object with the same keys is replaced by one dotted column per
+    leaf (``metrics.network.in_mbps``), recursively, so the rows stay purely
+    columnar instead of carrying ``str(dict)`` cells. Decoders split the
+    dotted names back into objects, so nothing is flattened when a top-level
+    key already contains a dot, and such keys are named as JSON strings
+    (``"x.y"``, see ``quote_column``) that decoders keep whole.
+    """
+    if keys is None:
+        keys = list(items[0].keys())
+    if optional:
+        optional = set(optional)
+    if not all(isinstance(key, str) and '.' not in key for key in keys):
+        return [(quote_column(key) if isinstance(key, str) else key, (key,)) for key in keys]
+    columns = []
+    for key in keys:
+        if key in optional:
+            columns.append((f"{key}?", (key,)))
+            continue
+        nested = None if _UNSAFE_KEY.search(key) else _nested_columns([item[key] for item in items])
+        if nested is None:
+            columns.append((key, (key,)))
+        else:
+            columns.extend((f"{key}.{name}", (key,) + path) for name, path in nested)
+    return columns
+
+
+def _nested_columns(values: List[Any]) -> Optional[List[Tuple[str, Tuple[str, ...]]]]:
+    """Return the dotted leaf columns of ``values`` if they are all objects with the same safe keys"""
+    first = values[0]
+    if not isinstance(first, dict) or not first:
+        return None
+    keys = first.keys()
+    if not all(isinstance(key, str) and not _UNSAFE_KEY.search(key) for key in keys):
+        return None
+    if not all(isinstance(value, dict) and value.keys() == keys for value in values):
+        return None
+    columns = []
+    for key in keys:
+        nested = _nested_columns([value[key] for value in values])
+        if nested is None:
+            columns.append((key, (key,)))
+        else:
+            columns.extend((f"{key}.{name}", (key,) + path) for name, path in nested)
+    return columns
+
+
+def _lookup(item: dict, path: Tuple[Any, ...]) -> Any:
+    for key in path:
+        item = item[key]
+    return item
+
+
+def _cell(item: dict, path: Tuple[Any, ...]) -> str:
+    """Format the value at ``path``, or ``ABSENT`` when an optional key is missing"""
+    if path[0] not in item:
+        return ABSENT
+    return format_value(_lookup(item, path))
+
+
+def _column_values(items: List[dict], path: Tuple[Any, ...]) -> List[Any]:
+    return [_lookup(item, path) for item in items if path[0] in item]
+
+
+def _iter_path_lines(
+    obj: Any,
+    prefix: str,
+    rename: Optional[Callable[[str], str]] = None,
+    shared: Optional[Set[int]] = None,
+) -> Iterator[str]:
+    """
+    Yield ``path:value`` lines for every leaf under ``obj``.
+
+    Walks the tree with an explicit stack instead of recursion, so nesting
+    depth is not limited by the interpreter's recursion limit and each line
+    is yielded straight to the caller rather than through one generator per
+    level. Every container's path is built once and shared by its children.
+    ``rename`` is applied to the text before the first ``:`` of every line
+    except block rows. Objects in ``shared`` are written in full at their
+    first safe path and as ``path=target`` lines after that.
+    """
+    # id of a shared object -> path it was first written at
+    targets: Dict[int, str] = {}
+    stack = [_iter_children(obj, prefix)]
+    while stack:
+        for path, value in stack[-1]:
+            kind = type(value)
+            if kind is str or kind is int or kind is float:
+                # Formatted as str() would; skips format_value for the common leaves
+                text = value
+            elif isinstance(value, (dict, list)):
+                if shared is not None and id(value) in shared and type(path) is str and not _UNSAFE_REFERENCE.search(path):
+                    target = targets.setdefault(id(value), path)
+                    if target is not path:
+                        line = f"{path}={target}"
+                        yield line if rename is None else rename(line)
+                        continue
+                if kind is list and value:
+                    if isinstance(value[0], dict):
+                        block = _tabular_block(path, value)
+                        if block is not None:
+                            if rename is not None:
+                                block[0] = _rename_key_part(rename, block[0])
+                            yield from block
+                            continue
+                    else:
+                        inline = _inline_array(path, value)
+                        if inline is not None:
+                            yield inline if rename is None else _rename_key_part(rename, inline)
+                            continue
+                stack.append(_iter_children(value, path))
+                break
+            else:
+                text = format_value(value)
+            if not path:
+                # Decoders read a bare value containing ``:`` as a path line
+                text = str(text)
+                yield text if rename is None or ':' not in text else _rename_key_part(rename, text)
+            elif rename is None:
+                yield f"{path}:{text}"
+            else:
+                yield _rename_key_part(rename, f"{path}:{text}")
+        else:
+            stack.pop()
+
+
+def _rename_key_part(rename: Callable[[str], str], line: str) -> str:
+    head, sep, tail = line.partition(':')
+    return rename(head) + sep + tail
+
+
+def _tabular_block(path: Any, items: list) -> Optional[List[str]]:
+    """
+    Return the lines of a nested tabular block for ``items``, or None.
+
+    Only arrays of objects accepted by ``table_schema`` whose values are all
+    scalars (or uniform objects spread over dotted columns) qualify, and only
+    when the column names and formatted cells can be read back exactly: no
+    separators or line breaks, no surrounding whitespace, no blank rows.
+    """
+    if not (isinstance(path, str) and path and not _UNSAFE_PATH.search(path)):
+        return None
+    schema = table_schema(items)
+    if schema is None:
+        return None
+    keys = schema[0]
+    if not keys or not all(isinstance(key, str) and not _UNSAFE_KEY.search(key) for key in keys):
+        return None
+    columns = table_columns(items, *schema)
+
+    lines = [f"{path}[{len(items)}]{{{','.join(name for name, _ in columns)}}}:"]
+    paths = [key_path for _, key_path in columns]
+    unsafe = _UNSAFE_CELL.search
+    for item in items:
+        cells = []
+        for key_path in paths:
+            if key_path[0] not in item:
+                cells.append(ABSENT)
+                continue
+            value = _lookup(item, key_path)
+            if isinstance(value, (dict, list)):
+                return None
+            cell = format_value(value)
+            if unsafe(cell):
+                return None
+            cells.append(cell)
+        row = ",".join(cells)
+        if not row:
+            # A lone empty cell would read back as a blank line
+            return None
+        lines.append("  " + row)
+    return lines
+
+
+def _inline_array(path: Any, items: list) -> Optional[str]:
+    """
+    Return ``path[]:a,b,c`` for a non-empty array of scalars, or None.
+
+    The empty index marks the line: a path never holds ``[]``, so it cannot
+    be taken for the element line of an array (``tags[1]:b``).
+
+    Like block rows, the formatted values must read back exactly: no
+    separators, line breaks or surrounding whitespace, and not a lone empty
+    value.
+    """
+    if not (isinstance(path, str) and path and not _UNSAFE_PATH.search(path) and items):
+        return None
+    for item in items:
+        if isinstance(item, (dict, list)):
+            return None
+    row = ",".join(map(format_value, items))
+    # Checked once on the joined row: a comma inside a value adds a separator
+    if not row or row.count(',') != len(items) - 1 or _UNSAFE_ROW.search(row):
+        return None
+    return f"{path}[]:{row}"
+
+
+def _iter_children(obj: Any, prefix: Any) -> Iterator[Tuple[Any, Any]]:
+    """Yield ``(path, value)`` for the direct children of a dict or list"""
+    if isinstance(obj, dict):
+        if prefix:
+            return ((f"{prefix}.{key}", value) for key, value in obj.items())
+        return iter(obj.items())
+    if prefix:
+        return ((f"{prefix}[{i}]", item) for i, item in enumerate(obj))
+    return ((f"[{i}]", item) for i, item in enumerate(obj))
+
+
+def write_toon(
+    json_data: Any,
+    fp: TextIO,
+    typed_header: bool = False,
+    aliases: Optional[Dict[str, str]] = None,
+    references: bool = False,
+) -> None:
+    """
+    Write the TOON encoding of ``json_data`` to the text stream ``fp``.
+
+    The output is identical to ``json_to_toon`` (lines joined with ``\\n``,
+    no trailing newline) but is written incrementally.
+    """
+    lines = iter_toon_lines(json_data, typed_header, aliases, references)
+    for line in lines:
+        fp.write(line)
+        break
+    for line in lines:
+        fp.write("\n")
+        fp.write(line)
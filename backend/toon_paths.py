@@ -0,0 +1,419 @@
+"""
+Path notation for TOON documents.
+
+Non-tabular TOON writes one ``path:value`` line per leaf, e.g.
+``specs.storage[0].size_gb:512``. ``PathAssembler`` rebuilds the document
+from those lines. Instead of re-parsing every path and walking from the root
+each time, it keeps a cursor on the containers reached by the previous path:
+consecutive lines share long prefixes, so only the segments after the shared
+prefix are parsed (with a cache for suffixes repeated across array elements)
+and walked.
+
+Tabular headers use the same dots for columns of nested objects
+(``metrics.network_traffic.incoming_mbps``); ``column_nester`` rebuilds
+those objects from each row. A key that itself contains a dot is written
+as a JSON string (``"x.y"``, see ``quote_column``) and is never nested.
+
+Long keys can be replaced by short aliases declared in a first line such as
+``@keys{a=network_traffic,b=active_connections}``. Aliases replace whole
+words (``\\w+`` runs) of a line's key part: the text before the first ``:``
+of a path line or block header, or the whole root table header. They are
+chosen so that no other word of a key part is ever an alias.
+
+After an ``@refs`` line, a line ``path=target`` gives ``path`` the subtree
+already decoded at ``target`` (see ``shared_subtrees``).
+"""
+import json
+import re
+from functools import lru_cache, partial
+from typing import Any, Callable, Collection, Dict, List, NamedTuple, Optional, Tuple, Union
+
+# A key (str) or an array index (int)
+PathPart = Union[str, int]
+
+_KEY = re.compile(r'[^.\[]+')
+_WORD = re.compile(r'\w+')
+_KEY_ALIASES = re.compile(r'@keys\{(\w+=\w+(?:,\w+=\w+)*)\}')
+_REFERENCE = re.compile(r'([^=]+)=([^=]+)')
+
+# Line declaring that ``path=target`` lines follow
+REFERENCES = '@refs'
+
+
+class Reference(NamedTuple):
+    """Value of a path that repeats the subtree decoded at ``target``"""
+    target: str
+
+
+def parse_reference(line: str) -> Optional[Tuple[str, Reference]]:
+    """Split a ``path=target`` line into ``(path, Reference(target))``, or return None"""
+    match = _REFERENCE.fullmatch(line)
+    if match is None:
+        return None
+    return match.group(1), Reference(match.group(2))
+
+
+@lru_cache(maxsize=4096)
+def parse_path(path: str) -> Tuple[Tuple[PathPart, ...], Tuple[int, ...]]:
+    """
+    Split a path such as ``specs.storage[0].size_gb`` into its parts.
+
+    Keys are returned as strings and array indices as ints, together with
+    the offset just past each part. Dots only separate parts, so empty keys
+    are skipped. Raises ``ValueError`` for an unclosed or non-integer index.
+    """
+    parts: List[PathPart] = []
+    ends: List[int] = []
+    i = 0
+    n = len(path)
+    while i < n:
+        ch = path[i]
+        if ch == '[':
+            idx_end = path.index(']', i + 1)
+            parts.append(int(path[i + 1:idx_end]))
+            i = idx_end + 1
+        elif ch == '.':
+            i += 1
+            continue
+        else:
+            match = _KEY.match(path, i)
+            parts.append(match.group())
+            i = match.end()
+        ends.append(i)
+    return tuple(parts), tuple(ends)
+
+
+def set_path(obj: Any, path: str, value: Any) -> None:
+    """
+    Set ``value`` at ``path`` below ``obj``, creating containers on the way.
+
+    A missing container is created as a list when the next part is an index
+    and as a dict otherwise. Lists are padded with new containers (or
+    ``None`` for the final part) up to the index being set.
+    """
+    parts = parse_path(path)[0]
+    if not parts:
+        return
+
+    current = obj
+    for i, part in enumerate(parts[:-1]):
+        make = list if isinstance(parts[i + 1], int) else dict
+        if isinstance(part, str):
+            if part not in current:
+                current[part] = make()
+            current = current[part]
+        else:
+            while len(current) <= part:
+                current.append(make())
+            current = current[part]
+
+    last = parts[-1]
+    if isinstance(last, str):
+        current[last] = value
+    else:
+        while len(current) <= last:
+            current.append(None)
+        current[last] = value
+
+
+class PathAssembler:
+    """
+    Rebuild a document from ``(path, value)`` events.
+
+    A path starting with ``[`` turns the root into a list whose elements
+    are padded with empty dicts when the path continues below them.
+
+    Lines that follow the layout written by the encoder take the fast path:
+    the previous path's parts and containers are reused up to the longest
+    shared prefix. Anything unusual (conflicting paths, negative indices,
+    paths without parts) is handed to ``set_path`` from the root, so the
+    result, or the error raised, is the same as walking every line in full.
+    """
+
+    def __init__(self):
+        self.result: Any = {}
+        self._array_root = False
+        self._reset_cursor()
+
+    def _reset_cursor(self) -> None:
+        self._path = ''
+        self._parts: Tuple[PathPart, ...] = ()
+        self._ends: Tuple[int, ...] = ()
+        # _stack[i] is the container reached by the previous path's first i parts
+        self._stack: List[Any] = [self.result]
+
+    def add(self, path: str, value: Any) -> None:
+        """Set ``value`` at ``path``"""
+        if path.startswith('['):
+            self._array_root = True
+            if not isinstance(self.result, list):
+                self.result = []
+                self._reset_cursor()
+        elif self._array_root:
+            # Keyed path below a root array
+            self._add_slow(path, value)
+            return
+
+        if not self._add_fast(path, value):
+            self._add_slow(path, value)
+
+    def add_reference(self, path: str, target: str) -> None:
+        """
+        Set ``path`` to the value already assembled at ``target``.
+
+        The value is shared rather than copied, like a YAML alias, so a
+        reference costs the same whatever the size of its subtree. List
+        items this pads in front of it become empty containers of the same
+        kind, as they would for the subtree's own lines.
+        """
+        value = self.lookup(target)
+        parts, ends = parse_path(path)
+        if len(parts) < 2 or type(parts[-1]) is not int or not isinstance(value, (dict, list)):
+            self.add(path, value)
+            return
+        parent_path = path[:ends[-2]]
+        try:
+            parent = self.lookup(parent_path)
+            start = len(parent) if isinstance(parent, list) else 0
+        except ValueError:
+            start = 0
+        self.add(path, value)
+        parent = self.lookup(parent_path)
+        for i in range(start, parts[-1]):
+            parent[i] = type(value)()
+
+    def lookup(self, path: str) -> Any:
+        """Return the value assembled at ``path``; raise ``ValueError`` if there is none"""
+        current = self.result
+        for part in parse_path(path)[0]:
+            try:
+                current = current[part]
+            except (KeyError, IndexError, TypeError):
+                raise ValueError(f"TOON reference to unknown path '{path}'.")
+        return current
+
+    def _add_slow(self, path: str, value: Any) -> None:
+        self._reset_cursor()
+        result = self.result
+        if not (self._array_root and path.startswith('[')):
+            set_path(result, path, value)
+            return
+
+        idx_end = path.index(']')
+        idx = int(path[1:idx_end])
+        remaining_path = path[idx_end + 1:]
+        while len(result) <= idx:
+            result.append({} if remaining_path or isinstance(value, (dict, list)) else None)
+        if remaining_path:
+            set_path(result[idx], remaining_path, value)
+        else:
+            result[idx] = value
+
+    def _shared_parts(self, path: str) -> int:
+        """Count the leading parts of the previous path that ``path`` repeats"""
+        prev_path, prev_parts, prev_ends = self._path, self._parts, self._ends
+        # The previous leaf is not on the stack, so at most len - 1 parts are reusable
+        shared = len(prev_parts) - 1
+        if shared <= 0:
+            return 0
+        if not path.startswith(prev_path[:prev_ends[shared - 1]]):
+            # Binary search: a prefix shorter than a matching one matches too
+            lo, hi = 0, shared - 1
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if path.startswith(prev_path[:prev_ends[mid - 1]]):
+                    lo = mid
+                else:
+                    hi = mid - 1
+            shared = lo
+        if shared and isinstance(prev_parts[shared - 1], str):
+            # The last shared key must also end here (``a.b`` is not a prefix of ``a.bc``)
+            end = prev_ends[shared - 1]
+            if path[end:end + 1] not in ('', '.', '['):
+                shared -= 1
+        return shared
+
+    def _add_fast(self, path: str, value: Any) -> bool:
+        """Set the value using the cursor; return False to fall back to the full walk"""
+        shared = self._shared_parts(path)
+        offset = self._ends[shared - 1] if shared else 0
+        try:
+            suffix_parts, suffix_ends = parse_path(path[offset:])
+        except ValueError:
+            # Let the full walk raise (or not) in its own order
+            return False
+        parts = self._parts[:shared] + suffix_parts
+        ends = self._ends[:shared] + tuple(map(offset.__add__, suffix_ends))
+        if not parts:
+            return False
+        last = len(parts) - 1
+        depth = min(shared, last)
+
+        stack = self._stack
+        del stack[depth + 1:]
+        current = stack[depth]
+        i = depth
+
+        if i == 0 and self._array_root:
+            idx = parts[0]
+            if not isinstance(idx, int) or idx < 0:
+                return False
+            if last == 0:
+                if len(path) != ends[0]:
+                    # e.g. ``[0].`` pads the root but sets nothing
+                    return False
+                while len(current) <= idx:
+                    current.append({} if isinstance(value, (dict, list)) else None)
+                current[idx] = value
+                self._path, self._parts, self._ends = path, parts, ends
+                return True
+            while len(current) <= idx:
+                current.append({})
+            current = current[idx]
+            stack.append(current)
+            i = 1
+
+        while i < last:
+            part = parts[i]
+            make = list if isinstance(parts[i + 1], int) else dict
+            if isinstance(part, str):
+                if not isinstance(current, dict):
+                    return False
+                if part not in current:
+                    current[part] = make()
+            else:
+                if not isinstance(current, list) or part < 0:
+                    return False
+                while len(current) <= part:
+                    current.append(make())
+            current = current[part]
+            stack.append(current)
+            i += 1
+
+        part = parts[last]
+        if isinstance(part, str):
+            if not isinstance(current, dict):
+                return False
+            current[part] = value
+        else:
+            if not isinstance(current, list) or part < 0:
+                return False
+            while len(current) <= part:
+                current.append(None)
+            current[part] = value
+
+        self._path, self._parts, self._ends = path, parts, ends
+        return True
+
+
+# A nested column plan: (key, source field) for a leaf, (key, sub-plan) for an object
+ColumnPlan = List[Tuple[str, Union[str, "ColumnPlan"]]]
+
+
+def quote_column(key: str) -> str:
+    """
+    Return the header name of a key that is not a dotted column.
+
+    Keys containing a dot, or starting with a quote, are written as JSON
+    strings so that decoders keep them as they are; others are unchanged.
+    """
+    if '.' in key or key[:1] == '"':
+        return json.dumps(key, ensure_ascii=False)
+    return key
+
+
+def unquote_column(name: str) -> str:
+    """Return the key of a header name written by ``quote_column``"""
+    if len(name) > 1 and name[0] == '"' == name[-1]:
+        try:
+            key = json.loads(name)
+        except ValueError:
+            return name
+        if isinstance(key, str):
+            return key
+    return name
+
+
+def column_nester(
+    fields: List[str],
+    sparse: bool = False,
+    literal: Collection[str] = (),
+) -> Optional[Callable[[dict], dict]]:
+    """
+    Return a function rebuilding nested objects from a row with dotted column names.
+
+    ``{'id': 1, 'metrics.cpu': 0.5, 'metrics.net.in': 7}`` becomes
+    ``{'id': 1, 'metrics': {'cpu': 0.5, 'net': {'in': 7}}}``. The plan is
+    worked out once per header, so each row only pays for building its dicts.
+    Returns ``None`` when no name is dotted, or when the names do not form a
+    tree (empty segments, a name that is also the parent of another), in
+    which case rows keep their flat keys. With ``sparse``, columns missing
+    from a row (dropped optional columns) are skipped. Fields in ``literal``
+    are keys of the row itself, dotted or not.
+    """
+    if not any('.' in field and field not in literal for field in fields):
+        return None
+    tree: dict = {}
+    for field in fields:
+        parts = [field] if field in literal else field.split('.')
+        if '' in parts:
+            return None
+        node = tree
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                return None
+        leaf = node.get(parts[-1], field)
+        if leaf != field:
+            return None
+        node[parts[-1]] = field
+
+    def plan(node: dict) -> ColumnPlan:
+        return [(key, source if isinstance(source, str) else plan(source)) for key, source in node.items()]
+
+    return partial(_build_sparse if sparse else _build_nested, plan(tree))
+
+
+def _build_nested(plan: ColumnPlan, row: dict) -> dict:
+    return {
+        key: row[source] if source.__class__ is str else _build_nested(source, row)
+        for key, source in plan
+    }
+
+
+def _build_sparse(plan: ColumnPlan, row: dict) -> dict:
+    return {
+        key: row[source] if source.__class__ is str else _build_sparse(source, row)
+        for key, source in plan
+        if source.__class__ is not str or source in row
+    }
+
+
+def format_key_aliases(aliases: Dict[str, str]) -> str:
+    """Return the ``@keys{alias=key,...}`` line declaring ``aliases`` (key -> alias)"""
+    return "@keys{" + ",".join(f"{alias}={key}" for key, alias in aliases.items()) + "}"
+
+
+def parse_key_aliases(line: str) -> Optional[Dict[str, str]]:
+    """Return the alias -> key mapping declared by an ``@keys{...}`` line, or None"""
+    match = _KEY_ALIASES.fullmatch(line.strip())
+    if match is None:
+        return None
+    return dict(entry.split('=') for entry in match.group(1).split(','))
+
+
+def substitute_keys(mapping: Dict[str, str], text: str) -> str:
+    """Replace the words of ``text`` found in ``mapping``"""
+    get = mapping.get
+    return _WORD.sub(lambda match: get(match.group(), match.group()), text)
+
+
+def substitute_key_part(mapping: Dict[str, str], line: str) -> str:
+    """``substitute_keys`` on the text before the first ``:`` of ``line``"""
+    head, sep, tail = line.partition(':')
+    return substitute_keys(mapping, head) + sep + tail
+
+
+def key_words(text: str) -> List[str]:
+    """Return the words of a key part that aliases may replace"""
+    return _WORD.findall(text)
@@ -0,0 +1,234 @@
+"""
+Random access to tabular TOON files.
+
+``ToonTable`` memory-maps a ``[count]{keys}:`` file and keeps only a compact
+index of row start offsets (an ``array('Q')``), optionally persisted next to
+the file as a ``.idx`` sidecar. Rows are parsed when they are accessed, so
+looking up a handful of servers in a large snapshot does not pay for a full
+parse. Like ``ToonReader``, rows without one cell per field are skipped: they
+are left out of the index. Cells are split at top-level commas by default
+(``toon_cells.split_top_level``), so object and list cells stay whole.
+"""
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from toon_cells import split_top_level
+from toon_decoder import parse_header, parse_value, resolve_columns, split_row
+from toon_paths import parse_key_aliases, substitute_keys
+
+# Start of a data line: first non-blank character that is not another '[' header
+_ROW_START = re.compile(rb'^[ \t]*[^\s\[]', re.MULTILINE)
+_FIRST_CONTENT = re.compile(rb'\S')
+# Bytes that make split_top_level keep a comma inside a cell
+_NESTED_BYTES = re.compile(rb'''['"{}\[\]()]''')
+
+# Version 3: the split the index was built with is recorded
+_SIDECAR_MAGIC = b'TOONIDX3'
+# Magic, file size, mtime and split; offsets follow, little-endian like it
+_SIDECAR_HEADER = struct.Struct('<8sQQ8s')
+# The splits a sidecar can be written for, by the name recorded in it
+_SIDECAR_SPLITS = {split_top_level: b'toplevel', split_row: b'row'}
+
+
+class ToonTable:
+    """
+    Lazily parsed, memory-mapped view of a tabular TOON file.
+
+    Supports ``len()``, integer and slice indexing, iteration and lookup by a
+    key column via ``get()``.
+
+    Args:
+        path: Path to the ``.toon`` file
+        key: Optional column name used by ``get()``
+        split: Splits a row into its stripped cell strings
+        parse: Converts a cell string into a Python value
+        sidecar: Load the row index from ``<path>.idx`` when it is up to date,
+            and write it there after building it otherwise. The index depends
+            on ``split``, which is recorded in the sidecar, so only
+            ``split_top_level`` and ``split_row`` can be used with it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        key: Optional[str] = None,
+        split: Callable[[str], List[str]] = split_top_level,
+        parse: Callable[[str], Any] = parse_value,
+        sidecar: bool = False,
+    ):
+        if sidecar and split not in _SIDECAR_SPLITS:
+            raise ValueError("A row index sidecar needs split_top_level or split_row as split.")
+        self.path = os.fspath(path)
+        self.split = split
+        self.parse = parse
+        self._key_index: Optional[Dict[Any, int]] = None
+
+        self._file = open(self.path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self._file.close()
+            raise ValueError("TOON file is empty.")
+
+        try:
+            header_end = self._read_header()
+            if key is not None and key not in self.fields:
+                raise ValueError(f"Key column '{key}' is not in the TOON header.")
+            self.key = key
+
+            self._offsets = self._load_sidecar() if sidecar else None
+            if self._offsets is None:
+                self._offsets = array('Q', self._row_offsets(header_end))
+                if sidecar:
+                    self._save_sidecar()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self) -> int:
+        """Parse the header line and return the offset just past it"""
+        match = _FIRST_CONTENT.search(self._mm)
+        if match is None:
+            raise ValueError("TOON file is empty.")
+        end = self._mm.find(b'\n', match.start())
+        if end < 0:
+            end = len(self._mm)
+        line = self._mm[match.start():end].decode('utf-8')
+        aliases = parse_key_aliases(line)
+        if aliases is not None:
+            # Key aliases: the header follows on the next non-blank line
+            match = _FIRST_CONTENT.search(self._mm, end)
+            if match is None:
+                raise ValueError("Unrecognized TOON header format.")
+            end = self._mm.find(b'\n', match.start())
+            if end < 0:
+                end = len(self._mm)
+            line = substitute_keys(aliases, self._mm[match.start():end].decode('utf-8'))
+        header = parse_header(line)
+        if header is None:
+            raise ValueError("Unrecognized TOON header format.")
+        self.count, fields = header
+        self.fields, self._finish = resolve_columns(fields)
+        return end
+
+    def _row_offsets(self, start: int) -> Iterator[int]:
+        """Yield the offset of every data line after ``start`` that has one cell per field"""
+        mm = self._mm
+        split = self.split
+        fields = len(self.fields)
+        for match in _ROW_START.finditer(mm, start):
+            offset = match.start()
+            end = mm.find(b'\n', offset)
+            if end < 0:
+                end = len(mm)
+            line = mm[offset:end]
+            if split is split_row:
+                # split_row cuts at every comma
+                valid = line.count(b',') == fields - 1
+            elif split is split_top_level and _NESTED_BYTES.search(line) is None:
+                # So does split_top_level without brackets or quotes, dropping a trailing empty cell
+                valid = line.count(b',') + 1 - line.rstrip().endswith(b',') == fields
+            else:
+                valid = len(split(line.decode('utf-8').strip())) == fields
+            if valid:
+                yield offset
+
+    @property
+    def sidecar_path(self) -> str:
+        return self.path + '.idx'
+
+    def _load_sidecar(self) -> Optional[array]:
+        """Return the saved row index if it matches the current file"""
+        try:
+            with open(self.sidecar_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        stat = os.stat(self.path)
+        if len(data) < _SIDECAR_HEADER.size:
+            return None
+        magic, size, mtime_ns, split = _SIDECAR_HEADER.unpack_from(data)
+        if magic != _SIDECAR_MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        if split.rstrip(b'\0') != _SIDECAR_SPLITS[self.split]:
+            return None
+
+        offsets = array('Q')
+        offsets.frombytes(data[_SIDECAR_HEADER.size:])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        return offsets
+
+    def _save_sidecar(self) -> None:
+        stat = os.stat(self.path)
+        with open(self.sidecar_path, 'wb') as f:
+            f.write(_SIDECAR_HEADER.pack(_SIDECAR_MAGIC, stat.st_size, stat.st_mtime_ns, _SIDECAR_SPLITS[self.split]))
+            offsets = self._offsets
+            if sys.byteorder == 'big':
+                offsets = array('Q', offsets)
+                offsets.byteswap()
+            offsets.tofile(f)
+
+    def close(self) -> None:
+        """Unmap the file"""
+        mm = getattr(self, '_mm', None)
+        if mm is not None:
+            mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "ToonTable":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self._offsets)))]
+        if index < 0:
+            index += len(self._offsets)
+        if not 0 <= index < len(self._offsets):
+            raise IndexError("TOON row index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(len(self._offsets)):
+            yield self._row(i)
+
+    def get(self, key_value: Any, default: Any = None) -> Any:
+        """Return the first row whose key column equals ``key_value``"""
+        if self.key is None:
+            raise ValueError("ToonTable was opened without a key column.")
+        if self._key_index is None:
+            self._key_index = self._build_key_index()
+        i = self._key_index.get(key_value)
+        return default if i is None else self._row(i)
+
+    def _build_key_index(self) -> Dict[Any, int]:
+        column = self.fields.index(self.key)
+        index: Dict[Any, int] = {}
+        for i in range(len(self._offsets)):
+            index.setdefault(self.parse(self.split(self._line(i))[column]), i)
+        return index
+
+    def _line(self, i: int) -> str:
+        start = self._offsets[i]
+        end = self._mm.find(b'\n', start)
+        if end < 0:
+            end = len(self._mm)
+        return self._mm[start:end].decode('utf-8').strip()
+
+    def _row(self, i: int) -> dict:
+        # The index only holds rows with one cell per field
+        row = dict(zip(self.fields, map(self.parse, self.split(self._line(i)))))
+        return row if self._finish is None else self._finish(row)
@@ -0,0 +1,266 @@
+"""
+YAML loading and dumping with libyaml when available.
+
+``yaml.safe_load`` runs PyYAML's pure-Python scanner and parser, the
+slowest steps of any conversion from YAML. ``SafeLoader`` here is the
+libyaml-backed class when PyYAML was built with libyaml, and the
+pure-Python one otherwise. Values are constructed in Python either way,
+but libyaml's scanner does not accept exactly the same texts: it loads
+some the pure-Python one rejects (``'1\\t'``), rejects a byte order mark
+in the middle of a stream and reads a few texts differently (``'\\n\\ufeff'``
+loads as None, not ``'\\ufeff'``). Format detection therefore keeps
+``yaml.safe_load`` (see ``format_detector``). ``Dumper`` stays the
+pure-Python ``yaml.Dumper`` that ``yaml.dump`` uses, because the C emitter
+quotes a few unusual strings differently (it escapes a NEL as ``"\\N"``).
+
+``YamlReader`` reads a document from PyYAML's event stream instead of
+composing it whole: the items of a root sequence are composed and
+constructed one at a time, so a big YAML list can be converted without ever
+holding all of it, or its text, in memory.
+
+``dump_yaml`` writes lists of flat records (the shape converted most) line
+by line instead of going through the representer and emitter, with the
+output of ``yaml.dump`` byte for byte; any other document is dumped by
+PyYAML.
+"""
+import re
+import sys
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Union
+
+import yaml
+from yaml.composer import Composer, ComposerError
+from yaml.constructor import SafeConstructor
+from yaml.events import DocumentEndEvent, SequenceEndEvent, SequenceStartEvent, StreamEndEvent
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+# Tags a root sequence may carry and still load to a plain list
+_LIST_TAGS = (None, '!', 'tag:yaml.org,2002:seq')
+
+# The output of ``yaml.dump``, whether or not libyaml is there
+Dumper = yaml.Dumper
+
+if yaml.__with_libyaml__:
+    from yaml.cyaml import CParser
+
+    SafeLoader = yaml.CSafeLoader
+
+    class _ItemLoader(Composer, CParser, SafeConstructor, Resolver):
+        """Safe loader composing nodes in Python from libyaml's events"""
+
+        def __init__(self, stream: Union[str, TextIO]):
+            CParser.__init__(self, stream)
+            Composer.__init__(self)
+            SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+else:
+    SafeLoader = yaml.SafeLoader
+    _ItemLoader = yaml.SafeLoader
+
+
+def load_yaml(source: Union[str, TextIO]) -> Any:
+    """``yaml.safe_load`` with the fastest available loader"""
+    return yaml.load(source, Loader=SafeLoader)
+
+
+class YamlReader:
+    """
+    Incremental reader over a single YAML document.
+
+    The start of the document is read on construction: ``empty`` tells
+    whether the stream holds no document and ``sequence`` whether the root
+    is a plain sequence. Iterating the reader then yields the items of that
+    sequence one by one; ``load()`` returns the whole document whatever its
+    root. Either can be used once. An alias to an anchor in an earlier item
+    loads as an equal copy rather than the same object.
+
+    Args:
+        source: YAML text or a text stream
+    """
+
+    def __init__(self, source: Union[str, TextIO]):
+        self._loader = loader = _ItemLoader(source)
+        loader.get_event()  # StreamStartEvent
+        self.empty = loader.check_event(StreamEndEvent)
+        self.sequence = False
+        if not self.empty:
+            self._document = loader.get_event()  # DocumentStartEvent
+            event = loader.peek_event()
+            self.sequence = (
+                isinstance(event, SequenceStartEvent) and event.anchor is None and event.tag in _LIST_TAGS
+            )
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self.sequence:
+            raise ValueError("YAML document root is not a sequence.")
+        loader = self._loader
+        loader.get_event()  # SequenceStartEvent
+        index = 0
+        while not loader.check_event(SequenceEndEvent):
+            yield loader.construct_document(loader.compose_node(None, index))
+            index += 1
+        loader.get_event()
+        self._end_document()
+
+    def load(self) -> Any:
+        """Return the whole document (``None`` for an empty stream)"""
+        if self.sequence:
+            return list(self)
+        if self.empty:
+            return None
+        node = self._loader.compose_node(None, None)
+        self._end_document()
+        return self._loader.construct_document(node)
+
+    def _end_document(self) -> None:
+        """Drop the document end and check that no other document follows"""
+        loader = self._loader
+        if loader.check_event(DocumentEndEvent):
+            loader.get_event()
+        if not loader.check_event(StreamEndEvent):
+            event = loader.get_event()
+            raise ComposerError(
+                "expected a single document in the stream", self._document.start_mark,
+                "but found another document", event.start_mark,
+            )
+        loader.dispose()
+
+
+# Options every YAML output is dumped with
+DUMP_OPTIONS = {'default_flow_style': False, 'allow_unicode': True, 'sort_keys': False}
+
+# Strings the emitter writes plain in any block context, unless they resolve
+# to another type (``yes``, ``null``): a letter first, then nothing YAML
+# treats as an indicator, and no trailing space
+_PLAIN = re.compile(r'[A-Za-z][A-Za-z0-9_ ./@-]*(?<! )')
+_STR_TAG = 'tag:yaml.org,2002:str'
+_resolver = Resolver()
+# The emitter's default line width, past which it breaks scalars at spaces
+_LINE_WIDTH = 80
+# Keys this long or longer (128 with their ``!!str`` tag) are written as
+# complex (``? key``) keys
+_SIMPLE_KEY_LENGTH = 123
+# Characters the emitter takes for line breaks
+_BREAKS = re.compile('[\n\r\x85\u2028\u2029]')
+_SPELLINGS = {True: 'true', False: 'false', None: 'null'}
+_INF = float('inf')
+
+
+def _is_plain(text: str) -> bool:
+    """Whether the emitter writes ``text`` as it is, unquoted"""
+    return _PLAIN.fullmatch(text) is not None and _resolver.resolve(ScalarNode, text, (True, False)) == _STR_TAG
+
+
+def _float_scalar(value: float) -> str:
+    """Write a float the way PyYAML's representer does"""
+    if value != value:
+        return '.nan'
+    if value == _INF:
+        return '.inf'
+    if value == -_INF:
+        return '-.inf'
+    text = repr(value).lower()
+    # ``1e17`` is no valid YAML float, ``1.0e+17`` is
+    if '.' not in text and 'e' in text:
+        text = text.replace('e', '.0e', 1)
+    return text
+
+
+def _string_scalar(text: str) -> Optional[str]:
+    """
+    Write a string the way the emitter does as a block mapping value, or
+    return None if it holds line breaks, which are written over several lines.
+    """
+    if _is_plain(text):
+        return text
+    if _BREAKS.search(text):
+        return None
+    # Quoting does not depend on the context, so dump it as a (never wrapped) document
+    out = yaml.dump(text, Dumper=Dumper, allow_unicode=True, width=sys.maxsize)
+    return out[:-5] if out.endswith('\n...\n') else out[:-1]
+
+
+def _key_scalar(key: Any) -> Optional[str]:
+    """Write a mapping key, or return None if the emitter would quote it or make it complex"""
+    if type(key) is str and len(key) < _SIMPLE_KEY_LENGTH and _is_plain(key):
+        return key
+    return None
+
+
+def _record_yaml(record: dict, keys: Dict[Any, Optional[str]], strings: Dict[str, Optional[str]]) -> Optional[str]:
+    """
+    Write a flat record as a block sequence item, or return None if
+    ``yaml.dump`` would wrap or break one of its values or quote a key.
+    ``keys`` and ``strings`` cache the written form of keys and string
+    values (None for those this cannot write).
+    """
+    lines = []
+    indent = '- '
+    for key, value in record.items():
+        kind = type(value)
+        if kind is str:
+            if value in strings:
+                cell = strings[value]
+            else:
+                cell = strings[value] = _string_scalar(value)
+            if cell is None:
+                return None
+        elif kind is int:
+            cell = str(value)
+        elif kind is float:
+            cell = _float_scalar(value)
+        else:
+            cell = _SPELLINGS[value]
+        if key in keys:
+            name = keys[key]
+        else:
+            name = keys[key] = _key_scalar(key)
+        if name is None:
+            return None
+        line = f"{indent}{name}: {cell}"
+        if len(line) > _LINE_WIDTH and (' ' in cell or cell[0] == '"'):
+            return None
+        lines.append(line)
+        indent = '  '
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def _records_yaml(data: list) -> Optional[List[str]]:
+    """
+    Write a list of distinct, non-empty dicts of scalars as block YAML, one
+    chunk per record, or return None for a list of any other shape.
+    """
+    scalars = (str, int, float, bool, type(None))
+    if not data or len(set(map(id, data))) != len(data):
+        # Objects that appear twice are written with anchors
+        return None
+    keys: Dict[Any, Optional[str]] = {}
+    strings: Dict[str, Optional[str]] = {}
+    chunks = []
+    for record in data:
+        if type(record) is not dict or not record or not all(type(v) in scalars for v in record.values()):
+            return None
+        chunk = _record_yaml(record, keys, strings)
+        if chunk is None:
+            chunk = yaml.dump([record], Dumper=Dumper, **DUMP_OPTIONS)
+        chunks.append(chunk)
+    return chunks
+
+
+def dump_yaml(data: Any, stream: Optional[TextIO] = None) -> Optional[str]:
+    """
+    Write ``data`` as block-style YAML to ``stream``, or return it without one.
+
+    Same output as ``yaml.dump(data, stream, Dumper=Dumper, **DUMP_OPTIONS)``.
+    Lists of flat records are written directly; a record with a value that
+    would be wrapped over several lines (long strings with spaces, strings
+    with line breaks) or a key that needs quoting is dumped on its own.
+    """
+    chunks = _records_yaml(data) if type(data) is list else None
+    if chunks is None:
+        return yaml.dump(data, stream, Dumper=Dumper, **DUMP_OPTIONS)
+    if stream is None:
+        return ''.join(chunks)
+    stream.writelines(chunks)
+    return None
@@ -0,0 +1,13 @@
+"""
+Make the converter backend importable from the scripts in this directory.
+
+The TOON decoder and row tokenizer live in ``../backend``, which is not an
+installed package; import this module before importing from there.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend"))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
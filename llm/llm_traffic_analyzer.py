@@ -1,108 +1,28 @@
 import argparse
-import ast
 import json
 import os
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from openai import OpenAI
 
+import backend_path  # noqa: F401  (puts ../backend on sys.path)
+from toon_cells import parse_literal, split_top_level
+from toon_decoder import iter_toon_rows, parse_dotted_leaves
 
-def _split_top_level_csv(line: str) -> List[str]:
-    """
-    Split a line on commas, but only at top level (not inside {...}, [...], (...), or quotes).
-    This is enough for our TOON mock where some columns are Python-literal dict/list strings.
-    """
-    parts: List[str] = []
-    buf: List[str] = []
-    depth_curly = 0
-    depth_square = 0
-    depth_paren = 0
-    in_single = False
-    in_double = False
-
-    for ch in line:
-        if ch == "'" and not in_double:
-            in_single = not in_single
-        elif ch == '"' and not in_single:
-            in_double = not in_double
-        elif not in_single and not in_double:
-            if ch == "{":
-                depth_curly += 1
-            elif ch == "}":
-                depth_curly = max(0, depth_curly - 1)
-            elif ch == "[":
-                depth_square += 1
-            elif ch == "]":
-                depth_square = max(0, depth_square - 1)
-            elif ch == "(":
-                depth_paren += 1
-            elif ch == ")":
-                depth_paren = max(0, depth_paren - 1)
-
-        if (
-            ch == ","
-            and not in_single
-            and not in_double
-            and depth_curly == 0
-            and depth_square == 0
-            and depth_paren == 0
-        ):
-            parts.append("".join(buf).strip())
-            buf = []
-        else:
-            buf.append(ch)
-
-    if buf:
-        parts.append("".join(buf).strip())
-    return parts
 
-
-def _load_server_metrics_toon(path: str) -> List[Dict[str, Any]]:
+def _iter_server_metrics_toon(path: str) -> Iterator[Dict[str, Any]]:
     """
-    Parse the mock TOON file format that looks like:
+    Stream rows from the mock TOON file format that looks like:
       [1000]{field1,field2,...}:
         v1,v2,...,{...},[...],...
     """
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        # Use splitlines() to handle all line ending types (\n, \r\n, \r) cross-platform
-        content = f.read()
-        lines = content.splitlines()
-
-    lines = [ln for ln in lines if ln.strip()]
-    if not lines:
-        raise ValueError("TOON file is empty.")
-
-    header = lines[0].strip()
-    # Example: [1000]{server_id,hostname,...}:
-    if "{" not in header or "}" not in header:
-        raise ValueError("Unrecognized TOON header format.")
-    fields_blob = header.split("{", 1)[1].rsplit("}", 1)[0]
-    fields = [f.strip() for f in fields_blob.split(",") if f.strip()]
-    if not fields:
-        raise ValueError("No fields found in TOON header.")
-
-    rows: List[Dict[str, Any]] = []
-    for ln in lines[1:]:
-        ln = ln.strip()
-        if not ln:
-            continue
-        if ln.endswith(","):
-            ln = ln[:-1]
-        cols = _split_top_level_csv(ln)
-        if len(cols) != len(fields):
-            raise ValueError(
-                f"TOON row has {len(cols)} columns but header has {len(fields)} fields."
-            )
-
-        obj: Dict[str, Any] = {}
-        for k, v in zip(fields, cols):
-            obj[k] = v
-
-        # Convert known structured fields
+    for obj in iter_toon_rows(path, split=split_top_level, parse=str, strict=True):
+        # Convert known structured fields; dotted metrics.* columns arrive nested, with string leaves
+        parse_dotted_leaves(obj)
         if "metrics" in obj and isinstance(obj["metrics"], str):
-            obj["metrics"] = ast.literal_eval(obj["metrics"])
+            obj["metrics"] = parse_literal(obj["metrics"])
         if "tags" in obj and isinstance(obj["tags"], str):
-            obj["tags"] = ast.literal_eval(obj["tags"])
+            obj["tags"] = parse_literal(obj["tags"])
         if "uptime_seconds" in obj:
             try:
                 obj["uptime_seconds"] = int(obj["uptime_seconds"])
@@ -114,9 +34,14 @@ def _load_server_metrics_toon(path: str) -> List[Dict[str, Any]]:
             except Exception:
                 pass
 
-        rows.append(obj)
+        yield obj
+
 
-    return rows
+def _load_server_metrics_toon(path: str) -> List[Dict[str, Any]]:
+    """
+    Parse the mock TOON file format into a list of server rows.
+    """
+    return list(_iter_server_metrics_toon(path))
 
 
 def _load_input(path: str) -> Any: